@@ -0,0 +1,313 @@
+print("--- OFFLINE INGESTION BENCHMARK ---")
+
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+# 1. ISOLATE FROM REAL SERVICES
+# Everything below runs against the in-process fake Firestore, replayed
+# HTTP responses and throwaway cache/manifest files (removed on exit; use
+# --json to keep the report).
+_workdir = tempfile.mkdtemp(prefix="apero-bench-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ["APERO_FAKE_FIRESTORE"] = "1"
+os.environ["APERO_MENU_CACHE"] = os.path.join(_workdir, "menu_cache.sqlite3")
+os.environ["APERO_WRITE_MANIFEST"] = os.path.join(_workdir, "write_manifest.json")
+os.environ["APERO_PAGE_CACHE"] = os.path.join(_workdir, "retail_pages.json")
+os.environ["APERO_MENU_ARCHIVE"] = os.path.join(_workdir, "archive")
+os.environ["APERO_DISH_REGISTRY"] = os.path.join(_workdir, "dish_ids.json")
+os.environ["APERO_METRICS_DIR"] = os.path.join(_workdir, "metrics")
+os.environ["APERO_HISTORY_STATE"] = os.path.join(_workdir, "history_state.json")
+os.environ["APERO_RATINGS_STATE"] = os.path.join(_workdir, "ratings_state.json")
+os.environ["APERO_HOTSPOT_STATE"] = os.path.join(_workdir, "hotspot_state.json")
+os.environ["APERO_READ_MODEL_DISHES"] = os.path.join(_workdir, "read_model_dishes.json")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import menu_fetcher
+import metrics
+import retail_fetcher
+from firestore_sink import RATE, FirestoreSink
+from history_state import HistoryState
+from write_manifest import WriteManifest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import upload_history
+    import upload_menus
+    import upload_retail
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(current_dir, "fixtures")
+
+# 2. REPLAYED HTTP
+class ReplayResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.content = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReplaySession:
+    """Answers GraphQL POSTs from a menu source and GETs from HTML fixtures."""
+
+    HALL_RE = re.compile(r"(h\d+): diningCourtByName\(name: \$(h\d+)\)")
+    DAY_RE = re.compile(r"(d\d+): dailyMenu\(date: \$(d\d+)\)")
+
+    def __init__(self, menus, pages):
+        self.menus = menus
+        self.pages = pages
+        self.headers = {}
+        self.bytes_received = 0
+
+    def mount(self, *args):
+        pass
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        variables = json["variables"]
+        if json["operationName"] == "getLocationMenu":
+            court = self.menus.court(variables["name"], variables["date"])
+            data = {"data": {"diningCourtByName": court}}
+        else:
+            data = {"data": {}}
+            hall_alias = None
+            for line in json["query"].splitlines():
+                hall = self.HALL_RE.search(line)
+                if hall:
+                    hall_alias = hall.group(1)
+                    data["data"][hall_alias] = {"name": variables[hall.group(2)]}
+                    continue
+                day = self.DAY_RE.search(line)
+                if day and hall_alias:
+                    court = self.menus.court(variables[hall_alias], variables[day.group(2)])
+                    data["data"][hall_alias][day.group(1)] = court["dailyMenu"]
+        response = ReplayResponse(_json_dumps(data))
+        self.bytes_received += len(response.content)
+        return response
+
+    def get(self, url, timeout=None, headers=None, **kwargs):
+        body = self.pages.get(url) or self.pages["*"]
+        response = ReplayResponse(body)
+        self.bytes_received += len(response.content)
+        return response
+
+
+def _json_dumps(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+# 3. MENU SOURCES (recorded fixture or synthetic)
+class FixtureMenus:
+    def __init__(self):
+        with open(os.path.join(FIXTURES_DIR, "graphql_menu_ford.json"), "r", encoding="utf-8") as f:
+            self.recorded = json.load(f)["data"]["diningCourtByName"]
+
+    def court(self, hall, day):
+        return dict(self.recorded, name=hall)
+
+
+ADJECTIVES = ["Grilled", "Roasted", "Spicy", "Garlic", "Honey", "Smoked", "Crispy", "Lemon", "Cajun",
+              "Teriyaki", "Herb", "BBQ", "Sweet", "Fresh", "Steamed", "Buffalo", "Classic", "Vegan"]
+BASES = ["Chicken", "Beef", "Pork", "Tofu", "Turkey", "Salmon", "Vegetable", "Black Bean", "Egg", "Shrimp",
+         "Mushroom", "Potato", "Rice", "Noodle", "Cheese", "Chocolate", "Apple", "Cinnamon"]
+FORMS = ["Sandwich", "Bowl", "Soup", "Salad", "Pizza", "Burger", "Stew", "Curry", "Pasta", "Tacos", "Wrap",
+         "Casserole", "Pie", "Cookie", "Muffin", "Skewers", "Stir Fry", "Chili", "Burrito", "Toast"]
+MEALS = [("Breakfast", "07:00 AM", "10:00 AM"), ("Lunch", "10:30 AM", "02:00 PM"), ("Dinner", "05:00 PM", "08:00 PM")]
+STATIONS = ["Grill", "Comfort", "Global", "Pizza", "Deli", "Salad Bar", "Dessert", "Soup"]
+
+
+class SyntheticMenus:
+    """Deterministic generated menus: every (hall, day) has `items` items."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def court(self, hall, day):
+        rng = random.Random(f"{hall}|{day}")
+        meals = []
+        per_meal = max(1, self.items // len(MEALS))
+        for meal_name, start, end in MEALS:
+            stations = {}
+            for _ in range(per_meal):
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(BASES)} {rng.choice(FORMS)}"
+                stations.setdefault(rng.choice(STATIONS), []).append({"item": {"name": name}})
+            meals.append({
+                "name": meal_name, "startTime": start, "endTime": end,
+                "stations": [{"name": s, "items": items} for s, items in stations.items()]
+            })
+        return {"name": hall, "dailyMenu": {"meals": meals}}
+
+
+def retail_pages(locations):
+    with open(os.path.join(FIXTURES_DIR, "retail_locations.html"), "r", encoding="utf-8") as f:
+        index = f.read()
+    with open(os.path.join(FIXTURES_DIR, "retail_location.html"), "r", encoding="utf-8") as f:
+        page = f.read()
+    if locations:
+        links = "\n".join(f'<a href="/LocationsAndMenus/Spot{i}">Spot {i}</a>' for i in range(locations))
+        index = index.replace("</main>", links + "\n</main>")
+    return {upload_retail.LOCATIONS_URL: index, "*": page}
+
+
+# 4. STAGES
+class Report:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, name, amount):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+
+def bench_history(report, halls, dates, window, rate, quiet):
+    """The production path: load_windows() fetching, parsing, tagging and writing `window` days at a time."""
+    upload_history.HALL_MAPPING = halls
+    manifest = WriteManifest(full=True)
+    sink = FirestoreSink(upload_history.db, manifest, rate=rate, verbose=False)
+    days = [d.strftime("%Y-%m-%d") for d in dates]
+    windows = [[(day, list(halls)) for day in days[i:i + window]] for i in range(0, len(days), window)]
+
+    # The stages overlap (see pipeline), so fetching is timed inside history.process
+    parsed = metrics.snapshot()["counters"].get("items_parsed", 0)
+    with report.stage("history.process"), _quiet(quiet):
+        upload_history.load_windows(windows, manifest, sink, HistoryState())
+    report.add("items", metrics.snapshot()["counters"].get("items_parsed", 0) - parsed)
+
+    with report.stage("history.drain"):
+        stats = sink.close()
+    report.add("sink.sleep_seconds", stats["sleep_seconds"])
+
+
+def bench_menus(report, halls, today, rate, quiet):
+    upload_menus.HALL_MAPPING = halls
+    manifest = WriteManifest(full=True)
+    sink = FirestoreSink(upload_menus.db, manifest, rate=rate, verbose=False)
+    pairs = [(hall, today) for hall in halls]
+
+    with report.stage("menus.fetch"):
+        courts = menu_fetcher.fetch_courts(pairs, use_cache=False)
+    with report.stage("menus.parse"):
+        dishes = {hall: upload_menus.parse_dishes(courts[(hall, today)]) for hall in halls}
+    with report.stage("menus.write"), _quiet(quiet):
+        for hall, items in dishes.items():
+            upload_menus.upload_dishes(hall, items, manifest, sink)
+        stats = sink.close()
+    report.add("sink.sleep_seconds", stats["sleep_seconds"])
+
+
+def bench_retail(report, quiet):
+    with report.stage("retail.scrape"), _quiet(quiet):
+        upload_retail.run_scraper(full=True, min_delay=0)
+
+
+def _quiet(quiet):
+    return contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# 5. MAIN
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the upload pipeline.")
+    parser.add_argument("--source", choices=["synthetic", "fixture"], default="synthetic")
+    parser.add_argument("--halls", type=int, default=5)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--items", type=int, default=300, help="items per hall per day (synthetic)")
+    parser.add_argument("--window", type=int, default=7, help="days fetched per fetch_courts call")
+    parser.add_argument("--locations", type=int, default=40, help="extra synthetic retail locations")
+    parser.add_argument("--rate", type=float, default=RATE,
+                        help="sink writes/second; raise it to measure CPU cost without pacing")
+    parser.add_argument("--stages", default="history,menus,retail")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the uploaders' own output")
+    args = parser.parse_args()
+
+    menus = SyntheticMenus(args.items) if args.source == "synthetic" else FixtureMenus()
+    session = ReplaySession(menus, retail_pages(args.locations))
+    menu_fetcher._session = session
+    retail_fetcher._session = session
+
+    halls = {f"Hall {i}": f"hall-{i}" for i in range(args.halls)}
+    if args.source == "fixture":
+        halls = dict(list(upload_history.HALL_MAPPING.items())[:args.halls])
+    today = date.today()
+    dates = [today - timedelta(days=args.days - 1 - i) for i in range(args.days)]
+    stages = args.stages.split(",")
+    quiet = not args.verbose
+    db = upload_history.db
+
+    report = Report()
+    started = time.perf_counter()
+    if "history" in stages:
+        bench_history(report, halls, dates, args.window, args.rate, quiet)
+    if "menus" in stages:
+        bench_menus(report, halls, today.strftime("%Y-%m-%d"), args.rate, quiet)
+    if "retail" in stages:
+        bench_retail(report, quiet)
+    wall = time.perf_counter() - started
+
+    write_time = sum(v for k, v in report.stages.items() if k.endswith((".process", ".write", ".drain")))
+    result = {
+        "source": args.source, "halls": args.halls, "days": args.days, "items_per_day": args.items,
+        "wall_seconds": round(wall, 3),
+        "stages": {k: round(v, 3) for k, v in report.stages.items()},
+        "items": report.counters.get("items", 0),
+        "items_per_second": round(report.counters.get("items", 0) / wall, 1) if wall else None,
+        "writes": db.stats["writes"],
+        "writes_per_second": round(db.stats["writes"] / write_time, 1) if write_time else None,
+        "batches": db.stats["batches"],
+        "bytes_written": db.stats["bytes"],
+        "sink_sleep_seconds": round(report.counters.get("sink.sleep_seconds", 0), 3),
+        "bytes_received": session.bytes_received,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource else None,
+        "metrics": metrics.snapshot(),
+    }
+
+    print(f"\n📊 {args.source} run: {args.halls} halls × {args.days} days")
+    for name, seconds in result["stages"].items():
+        print(f"   ⏱  {name:<18} {seconds:8.3f}s")
+    print(f"   🍽  items:   {result['items']:>10}  ({result['items_per_second']} items/s)")
+    print(f"   💾 writes:  {result['writes']:>10}  ({result['writes_per_second']} writes/s, {result['batches']} batches)")
+    print(f"   📦 bytes:   {result['bytes_written']:>10} written, {result['bytes_received']} received")
+    print(f"   💤 rate-limit sleep: {result['sink_sleep_seconds']}s (--rate {args.rate:g})")
+    if result["peak_rss_mb"] is not None:
+        print(f"   🧠 peak RSS: {result['peak_rss_mb']} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n📝 Report written to {args.json}")
+
+if __name__ == "__main__":
+    with metrics.run("benchmark"):
+        main()
@@ -0,0 +1,58 @@
+print("--- DISH DOCUMENT COMPACTOR ---")
+
+import argparse
+
+import metrics
+from firebase_client import get_db
+from dish_schema import compact_dish, doc_bytes
+from firestore_sink import FirestoreSink
+from read_models import refresh_dishes
+
+# 1. SETUP FIREBASE
+db = get_db()
+
+# 2. SHRINK mealsServed / stations ON DOCS WRITTEN BEFORE THE BOUNDED SCHEMA
+def compact_dishes(min_bytes=0, dry_run=False):
+    print("📡 Reading globalDishes and dining hall dishes...")
+    docs = list(db.collection("globalDishes").stream())
+    docs += [d for d in db.collection_group("dishes").stream() if (d.to_dict() or {}).get("category") == "diningHall"]
+
+    sink = None if dry_run else FirestoreSink(db, verbose=False)
+    compacted, before, after, largest = 0, 0, 0, []
+    for snap in docs:
+        data = snap.to_dict() or {}
+        size = doc_bytes(data)
+        if size < min_bytes:
+            continue
+        changes = compact_dish(data)
+        if not changes:
+            continue
+        new_size = doc_bytes(dict(data, **changes))
+        compacted += 1
+        before += size
+        after += new_size
+        largest.append((size - new_size, snap.reference.path, size, new_size))
+        if sink:
+            sink.update(snap.reference, changes)
+
+    metrics.incr("dish_docs_compacted", compacted)
+    metrics.incr("dish_bytes_saved", before - after)
+    stats = sink.close() if sink else {"failed_writes": 0}
+    if sink:
+        refresh_dishes(sink.committed_paths)
+
+    for saved, path, size, new_size in sorted(largest, reverse=True)[:10]:
+        print(f"   📉 {path}: {size:,} → {new_size:,} bytes")
+    verb = "Would compact" if dry_run else "Compacted"
+    print(f"\n✨ {verb} {compacted} of {len(docs)} documents: {before:,} → {after:,} bytes "
+          f"({before - after:,} saved), {stats['failed_writes']} failed.")
+    return {"documents": compacted, "bytes_before": before, "bytes_after": after}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite dish documents with bounded mealsServed/stations.")
+    parser.add_argument("--min-bytes", type=int, default=0, help="only touch documents at least this large")
+    parser.add_argument("--dry-run", action="store_true", help="report the savings without writing")
+    args = parser.parse_args()
+
+    with metrics.run("compact_dishes"):
+        compact_dishes(min_bytes=args.min_bytes, dry_run=args.dry_run)
@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+
+import metrics
+from dish_schema import compact_dish
+from firestore_sink import FirestoreSink
+from write_manifest import WriteManifest, update_json
+
+# One place that turns a dish name into its Firestore document ID.
+#
+# The uploaders used to derive IDs inline (50 chars in upload_menus, 60 in
+# upload_history), so long names landed in two documents. dish_id() is the
+# only normalization now. Names whose slug fits in 60 chars use it as-is;
+# longer ones are cut and get a short hash of the full slug, so two long
+# names sharing a prefix never share (and overwrite) one document, and every
+# machine derives the same ID no matter which name it saw first. A local
+# registry remembers the assignments so the migration can find old copies.
+#
+#   python dish_identity.py --migrate [--dry-run]
+#
+# merges documents written under older IDs into their canonical document
+# and re-points the reviews and comparisons that referenced them.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_PATH = os.environ.get("APERO_DISH_REGISTRY", os.path.join(current_dir, ".cache", "dish_ids.json"))
+
+MAX_ID_LENGTH = 60
+HASH_LENGTH = 8
+
+# Fields that are collected across duplicates instead of picked from one doc
+UNION_FIELDS = ("mealsServed", "stations", "tags", "locations")
+RATING_FIELDS = ("score", "averageRating", "totalRatings", "lastReviewed")
+
+
+def slug(name):
+    """'Chicken  Tenders (GF)' -> 'chicken-tenders-gf' (untruncated)."""
+    kept = "".join(c for c in name.lower() if c.isalnum() or c.isspace())
+    return re.sub(r"\s+", "-", kept.strip())
+
+
+def location_id(name):
+    """Retail location document ID ('Starbucks @ MSEE' -> 'starbucksmsee')."""
+    return "".join(c for c in name.lower() if c.isalnum())
+
+
+def canonical_id(full):
+    """Document ID for an untruncated slug: itself, or a hashed cut when it's too long."""
+    if len(full) <= MAX_ID_LENGTH:
+        return full
+    digest = hashlib.sha1(full.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    return f"{full[:MAX_ID_LENGTH - HASH_LENGTH - 1].rstrip('-')}-{digest}"
+
+
+class DishRegistry:
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.ids = {}      # full slug -> document ID
+        self.added = {}    # assignments made since the last save
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.ids = json.load(f)
+        # Entries written by the old first-seen-wins scheme are re-derived on lookup
+        self.owners = {doc_id: full for full, doc_id in self.ids.items() if canonical_id(full) == doc_id}
+
+    def dish_id(self, name):
+        full = slug(name)
+        with self.lock:
+            doc_id = self.ids.get(full)
+            if doc_id is not None and doc_id == canonical_id(full):
+                return doc_id
+            doc_id = canonical_id(full)
+            if self.owners.get(doc_id, full) != full:
+                # Only a hash collision gets here; both names share a document
+                metrics.incr("dish_id_collisions")
+                print(f"   ⚠️ ID collision: '{name}' -> {doc_id} (same ID as '{self.owners[doc_id]}')")
+            self.ids[full] = self.added[full] = doc_id
+            self.owners.setdefault(doc_id, full)
+            return doc_id
+
+    def save(self):
+        with self.lock:
+            if not self.added:
+                return
+            # Other uploaders save to the same file; merge rather than overwrite
+            added = self.added
+            self.ids = update_json(self.path, lambda data: data.update(added))
+            self.added = {}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DishRegistry()
+    return _registry
+
+
+def dish_id(name):
+    return get_registry().dish_id(name)
+
+
+def save():
+    get_registry().save()
+
+
+# --- MIGRATION: merge documents stored under non-canonical IDs ---
+def merge_dish_data(docs):
+    """
+    Combine several {field: value} dicts for the same dish into one.
+    Ratings come from the most-rated copy, serving info from the most
+    recently served one, and list fields are unioned.
+    """
+    by_served = sorted(docs, key=lambda d: d.get("lastServedDate") or "")
+    by_rated = sorted(docs, key=lambda d: (d.get("totalRatings") or 0, d.get("score") not in (None, 1000)))
+    merged = {}
+    for data in by_served:
+        merged.update(data)
+    for field in RATING_FIELDS:
+        merged.pop(field, None)
+        if field in by_rated[-1]:
+            merged[field] = by_rated[-1][field]
+    for field in UNION_FIELDS:
+        values = []
+        for data in by_served:
+            for value in data.get(field) or []:
+                if value not in values:
+                    values.append(value)
+        if values:
+            merged[field] = values
+    merged.update(compact_dish(merged))
+    return merged
+
+
+def plan_migration(db, registry):
+    """
+    Find uploader-written dishes whose document ID isn't the canonical one.
+    Returns {canonical path: [snapshots]} for every group that needs merging.
+    App-created dishes (no mealsServed/locations) are left alone.
+    """
+    groups = {}
+    sources = [("diningHalls", snap) for snap in db.collection_group("dishes").stream()]
+    sources += [("globalDishes", snap) for snap in db.collection("globalDishes").stream()]
+    for root, snap in sources:
+        data = snap.to_dict() or {}
+        path = snap.reference.path
+        if not data.get("name") or not path.startswith(root + "/"):
+            continue
+        if "mealsServed" not in data and "locations" not in data:
+            continue
+        parent = path.rsplit("/", 1)[0]
+        groups.setdefault(f"{parent}/{registry.dish_id(data['name'])}", []).append(snap)
+    return {path: snaps for path, snaps in groups.items()
+            if len(snaps) > 1 or snaps[0].reference.path != path}
+
+
+def repoint_comparisons(db, sink, renamed, moved_ids):
+    """
+    Rewrite users/*/comparisons records that name a renamed dish. The record
+    ID is the sorted pair of dish IDs, so a changed ID moves the record: the
+    old record is only deleted once the sink has committed the new one.
+    """
+    count, moves = 0, []
+    for snap in db.collection_group("comparisons").stream():
+        parts = snap.reference.path.split("/")
+        data = snap.to_dict() or {}
+        if len(parts) != 4 or parts[0] != "users":
+            continue
+        updated = dict(data)
+        for side in ("winner", "loser"):
+            path = data.get(f"{side}Path")
+            if path in renamed:
+                updated[f"{side}Path"] = renamed[path]
+                updated[f"{side}Id"] = renamed[path].rsplit("/", 1)[1]
+            elif data.get(f"{side}Id") in moved_ids:
+                updated[f"{side}Id"] = moved_ids[data[f"{side}Id"]]
+        if updated == data:
+            continue
+        key = "_".join(sorted(str(updated.get(f"{side}Id")) for side in ("winner", "loser")))
+        new_ref = db.document(f"users/{parts[1]}/comparisons/{key}")
+        sink.set(new_ref, updated, merge=False)
+        if key != snap.id:
+            moves.append((new_ref.path, snap.reference))
+        count += 1
+
+    sink.drain()
+    kept = 0
+    for new_path, old_ref in moves:
+        if new_path in sink.committed_paths:
+            sink.delete(old_ref)
+        else:
+            kept += 1
+    if kept:
+        print(f"   ⚠️ {kept} comparisons could not be moved; their old records were kept. Re-run to retry.")
+    return count
+
+
+def migrate(db, dry_run=False):
+    registry = get_registry()
+    print("📡 Scanning dishes for duplicate IDs...")
+    with metrics.timer("dish_id_scan"):
+        plan = plan_migration(db, registry)
+    duplicates = sum(len(snaps) for snaps in plan.values())
+    print(f"   🔎 {len(plan)} canonical documents to (re)build from {duplicates} existing documents")
+    for path, snaps in list(plan.items())[:20]:
+        print(f"      {path} <- {', '.join(s.id for s in snaps)}")
+    if dry_run or not plan:
+        registry.save()
+        return {"merged": 0, "deleted": 0, "reviews": 0, "comparisons": 0}
+
+    manifest = WriteManifest()
+    sink = FirestoreSink(db, manifest, verbose=False)
+    renamed = {}
+    # Canonical documents are written before anything is deleted
+    for path, snaps in plan.items():
+        merged = merge_dish_data([s.to_dict() or {} for s in snaps])
+        sink.set(db.document(path), merged, merge=False)
+        for snap in snaps:
+            if snap.reference.path != path:
+                renamed[snap.reference.path] = path
+    sink.drain()
+    if sink.stats["failed_writes"]:
+        print("   ❌ Some merged documents failed to write; nothing was deleted. Re-run to retry.")
+        sink.close()
+        return {"merged": 0, "deleted": 0, "reviews": 0, "comparisons": 0}
+
+    for old_path in renamed:
+        sink.delete(db.document(old_path))
+    # Uploaders' manifest entries for both old and new paths are now stale
+    for path in set(renamed) | set(renamed.values()):
+        manifest.forget_prefix(path)
+
+    # Reviews point at dish IDs only; follow hall dishes to their new ID
+    reviews = 0
+    moved_ids = {old.rsplit("/", 1)[1]: new.rsplit("/", 1)[1]
+                 for old, new in renamed.items() if old.startswith("diningHalls/")}
+    for old_id, new_id in moved_ids.items():
+        for review in db.collection("reviews").where("dishId", "==", old_id).stream():
+            sink.update(review.reference, {"dishId": new_id})
+            reviews += 1
+
+    comparisons = repoint_comparisons(db, sink, renamed, moved_ids)
+
+    stats = sink.close()
+    from read_models import refresh_dishes  # read_models connects to Firestore on import
+    refresh_dishes(sink.committed_paths)
+    manifest.save()
+    registry.save()
+    metrics.incr("dish_docs_merged", len(plan))
+    print(f"   ✅ Merged {len(plan)} dishes, deleted {len(renamed)} duplicate docs, re-pointed {reviews} reviews "
+          f"and {comparisons} comparisons ({stats['writes']} writes)")
+    return {"merged": len(plan), "deleted": len(renamed), "reviews": reviews, "comparisons": comparisons}
+
+
+if __name__ == "__main__":
+    print("--- DISH IDENTITY MIGRATION ---")
+    parser = argparse.ArgumentParser(description="Canonical dish IDs: inspect the registry or merge duplicate documents.")
+    parser.add_argument("--migrate", action="store_true", help="merge dishes stored under non-canonical IDs")
+    parser.add_argument("--dry-run", action="store_true", help="only report what --migrate would merge")
+    parser.add_argument("name", nargs="*", help="dish names to resolve to IDs")
+    args = parser.parse_args()
+
+    for name in args.name:
+        print(f"   {name!r} -> {dish_id(name)}")
+    if args.migrate or args.dry_run:
+        from firebase_client import get_db
+        with metrics.run("dish_identity"):
+            migrate(get_db(), dry_run=args.dry_run)
+    save()
@@ -0,0 +1,72 @@
+import json
+
+# Bounded serving fields on dining hall dish documents.
+#
+# mealsServed used to be an ArrayUnion of every {name, startTime, endTime}
+# ever seen, so any change in meal times added an element and popular dishes
+# grew without bound (and every collectionGroup('dishes') read paid for it).
+# Now it holds one slot per meal name with the times from the most recent
+# day the dish was served, and stations keeps only the last few stations.
+# The full serving history lives in the local menu archive instead. Uploaders
+# merge the day's values into the stored ones (merge_serving) rather than
+# replacing them, so a dish served only at lunch today keeps its dinner slot.
+
+MEAL_ORDER = ["Breakfast", "Brunch", "Lunch", "Late Lunch", "Dinner", "Late Night"]
+MAX_STATIONS = 5
+
+
+def _meal_rank(meal):
+    name = meal.get("name") or ""
+    return (MEAL_ORDER.index(name) if name in MEAL_ORDER else len(MEAL_ORDER), name)
+
+
+def meal_slots(meals):
+    """One {name, startTime, endTime} per meal name; later entries win. Sorted breakfast -> dinner."""
+    slots = {}
+    for meal in meals:
+        if isinstance(meal, dict) and meal.get("name"):
+            slots[meal["name"]] = {"name": meal["name"], "startTime": meal.get("startTime"), "endTime": meal.get("endTime")}
+    return sorted(slots.values(), key=_meal_rank)
+
+
+def recent_stations(stations, limit=MAX_STATIONS):
+    """Distinct station names, most recently seen last, capped at `limit`."""
+    recent = []
+    for station in stations:
+        if station in recent:
+            recent.remove(station)
+        recent.append(station)
+    return recent[-limit:]
+
+
+def merge_serving(stored, meals=(), stations=()):
+    """
+    Today's meals/stations folded into what a dish document already holds, so
+    a merge write of the bounded lists doesn't drop earlier meals or stations.
+    `stored` is the document's data (updated in place for later merges).
+    """
+    merged = {"mealsServed": meal_slots(list(stored.get("mealsServed") or []) + list(meals))}
+    if stations:
+        merged["stations"] = recent_stations(list(stored.get("stations") or []) + list(stations))
+    stored.update(merged)
+    return merged
+
+
+def doc_bytes(data):
+    return len(json.dumps(data, separators=(",", ":"), sort_keys=True, default=str).encode("utf-8"))
+
+
+def compact_dish(data):
+    """Bounded versions of the serving fields that are over their limits: {field: new value}."""
+    changes = {}
+    meals = data.get("mealsServed")
+    if isinstance(meals, list):
+        slots = meal_slots(meals)
+        if slots != meals:
+            changes["mealsServed"] = slots
+    stations = data.get("stations")
+    if isinstance(stations, list):
+        recent = recent_stations(stations)
+        if recent != stations:
+            changes["stations"] = recent
+    return changes
@@ -0,0 +1,108 @@
+import json
+import os
+from collections import deque
+from functools import lru_cache
+
+import metrics
+
+# --- THE "BRAIN": AUTO-TAGGING LOGIC ---
+# One shared tag -> keyword table (dish_tags.json) compiled into an
+# Aho-Corasick automaton, so a dish name is scanned once for every keyword
+# of every tag. Matching is plain substring matching on the lowercased
+# name, same as the old `any(x in name_lower ...)` checks.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+TAGS_PATH = os.environ.get("APERO_DISH_TAGS", os.path.join(current_dir, "dish_tags.json"))
+
+
+class KeywordAutomaton:
+    def __init__(self, tag_keywords):
+        self.tag_order = list(tag_keywords)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]   # state -> tags ending here (incl. via fail links)
+
+        for tag, keywords in tag_keywords.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), tag)
+        self._link()
+
+    def _add(self, keyword, tag):
+        state = 0
+        for ch in keyword:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+            state = nxt
+        self.out[state].add(tag)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def tags(self, text):
+        found = set()
+        state = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return [t for t in self.tag_order if t in found]
+
+
+def load_tag_table(path=TAGS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+_automaton = None
+
+
+def get_automaton():
+    global _automaton
+    if _automaton is None:
+        _automaton = KeywordAutomaton(load_tag_table())
+    return _automaton
+
+
+def normalize_name(name):
+    return " ".join(name.lower().split())
+
+
+@lru_cache(maxsize=65536)
+def _tags_for(normalized):
+    metrics.incr("tags_computed")
+    return tuple(get_automaton().tags(normalized))
+
+
+def analyze_dish(name):
+    """Return the mood tags for a dish name, e.g. ['cozy', 'protein']."""
+    return list(_tags_for(normalize_name(name)))
+
+
+def tag_many(names):
+    """Bulk API: tag a whole menu or vocabulary at once -> {name: tags}."""
+    with metrics.timer("tagging"):
+        return {name: analyze_dish(name) for name in set(names)}
+
+
+def reload_tags(path=TAGS_PATH):
+    """Rebuild the automaton after dish_tags.json changed."""
+    global _automaton
+    _automaton = KeywordAutomaton(load_tag_table(path))
+    _tags_for.cache_clear()
@@ -0,0 +1,262 @@
+import json
+import threading
+
+# In-process stand-in for the parts of firebase_admin.firestore the
+# pipeline uses. Keeps documents in a dict and counts reads, writes,
+# batches and bytes so benchmarks can run without touching Firestore.
+# Enabled for every script with APERO_FAKE_FIRESTORE=1 (see firebase_client).
+
+
+class Sentinel:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Sentinel({self.name})"
+
+
+SERVER_TIMESTAMP = Sentinel("SERVER_TIMESTAMP")
+DELETE_FIELD = Sentinel("DELETE_FIELD")
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client, match, filters=(), orders=(), limit_to=None):
+        self._client = client
+        self._match = match          # path -> bool
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit_to
+
+    def _copy(self, **changes):
+        q = Query(self._client, self._match, self._filters, self._orders, self._limit)
+        for key, value in changes.items():
+            setattr(q, key, value)
+        return q
+
+    def where(self, field, op, value):
+        return self._copy(_filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(_orders=self._orders + [(field, direction)])
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def stream(self):
+        client = self._client
+        with client.lock:
+            rows = [(p, dict(d)) for p, d in client.docs.items() if self._match(p)]
+        rows = [(p, d) for p, d in rows if all(_matches(d.get(f), op, v) for f, op, v in self._filters)]
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda r: (r[1].get(field) is None, r[1].get(field)), reverse=direction == Query.DESCENDING)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        client.stats["reads"] += len(rows)
+        for path, data in rows:
+            yield DocumentSnapshot(DocumentReference(client, path), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+def _matches(actual, op, expected):
+    try:
+        if op == "==":
+            return actual == expected
+        if op == "!=":
+            return actual != expected
+        if op == "array-contains":
+            return isinstance(actual, list) and expected in actual
+        if op == "in":
+            return actual in expected
+        if actual is None:
+            return False
+        return {"<": actual < expected, "<=": actual <= expected,
+                ">": actual > expected, ">=": actual >= expected}[op]
+    except TypeError:
+        return False
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        prefix = path + "/"
+        super().__init__(client, lambda p: p.startswith(prefix) and "/" not in p[len(prefix):])
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            with self._client.lock:
+                self._client.auto_ids += 1
+                doc_id = f"auto{self._client.auto_ids:08d}"
+        return DocumentReference(self._client, f"{self.path}/{doc_id}")
+
+    def list_documents(self, page_size=None):
+        prefix = self.path + "/"
+        with self._client.lock:
+            ids = {p[len(prefix):].split("/", 1)[0] for p in self._client.docs if p.startswith(prefix)}
+        return [DocumentReference(self._client, prefix + i) for i in sorted(ids)]
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def collections(self):
+        prefix = self.path + "/"
+        with self._client.lock:
+            names = {p[len(prefix):].split("/", 1)[0] for p in self._client.docs if p.startswith(prefix)}
+        return [self.collection(n) for n in sorted(names)]
+
+    def get(self, transaction=None):
+        self._client.stats["reads"] += 1
+        with self._client.lock:
+            data = self._client.docs.get(self.path)
+        return DocumentSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data, merge=False):
+        self._client._commit([("set", self, data, merge)])
+
+    def update(self, data):
+        self._client._commit([("update", self, data, True)])
+
+    def delete(self):
+        self._client._commit([("delete", self, None, False)])
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref, data, True))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, False))
+
+    def commit(self):
+        self._client._commit(self._ops)
+        self._ops = []
+
+
+class Transaction(WriteBatch):
+    """Reads and writes run under one client-wide lock, so transactions are serial."""
+
+
+def transactional(fn):
+    def run(transaction, *args, **kwargs):
+        with transaction._client.tx_lock:
+            result = fn(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+    return run
+
+
+def _payload_bytes(data):
+    return len(json.dumps(data, default=lambda v: getattr(v, "values", None) or repr(v)).encode("utf-8"))
+
+
+class FakeClient:
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+        self.tx_lock = threading.Lock()
+        self.auto_ids = 0
+        self.stats = {"reads": 0, "writes": 0, "batches": 0, "bytes": 0}
+
+    def collection(self, path):
+        return CollectionReference(self, path)
+
+    def document(self, path):
+        return DocumentReference(self, path)
+
+    def collection_group(self, name):
+        return Query(self, lambda p: p.rsplit("/", 2)[-2] == name)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for ref in references:
+            yield ref.get()
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self):
+        return Transaction(self)
+
+    def _commit(self, ops):
+        with self.lock:
+            self.stats["batches"] += 1
+            for kind, ref, data, merge in ops:
+                self.stats["writes"] += 1
+                if kind == "delete":
+                    self.docs.pop(ref.path, None)
+                    continue
+                self.stats["bytes"] += _payload_bytes(data)
+                current = dict(self.docs.get(ref.path, {})) if merge else {}
+                for key, value in data.items():
+                    current_value = current.get(key)
+                    if isinstance(value, ArrayUnion):
+                        merged = list(current_value or [])
+                        merged += [v for v in value.values if v not in merged]
+                        current[key] = merged
+                    elif isinstance(value, ArrayRemove):
+                        current[key] = [v for v in (current_value or []) if v not in value.values]
+                    elif isinstance(value, Increment):
+                        current[key] = (current_value or 0) + value.value
+                    elif value is DELETE_FIELD:
+                        current.pop(key, None)
+                    elif value is SERVER_TIMESTAMP:
+                        current[key] = "SERVER_TIMESTAMP"
+                    else:
+                        current[key] = value
+                self.docs[ref.path] = current
+
+
+def client():
+    return FakeClient()
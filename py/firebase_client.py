@@ -0,0 +1,47 @@
+import os
+
+# Shared Firestore connection for the pipeline scripts.
+# APERO_FAKE_FIRESTORE=1 swaps in the in-process fake (fake_firestore) so
+# benchmarks and dry runs never touch the real project.
+
+FAKE = os.environ.get("APERO_FAKE_FIRESTORE") == "1"
+
+if FAKE:
+    import fake_firestore as firestore
+else:
+    from firebase_admin import firestore
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+key_path = os.path.join(current_dir, "serviceAccountKey.json")
+
+_db = None
+
+
+def get_db():
+    """Connect once per process and reuse the client (exits on failure)."""
+    global _db
+    if _db is not None:
+        return _db
+
+    if FAKE:
+        _db = firestore.client()
+        print("🧪 Using in-process fake Firestore.")
+        return _db
+
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not os.path.exists(key_path):
+        print(f"❌ ERROR: serviceAccountKey.json not found at: {key_path}")
+        exit()
+
+    try:
+        cred = credentials.Certificate(key_path)
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(cred)
+        _db = firestore.client()
+        print("✅ Connected to Firebase Database!")
+    except Exception as e:
+        print(f"❌ FIREBASE CONNECTION ERROR: {e}")
+        exit()
+    return _db
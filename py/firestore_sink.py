@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Shared Firestore write sink.
+# Writes are packed into batches and committed from a small worker pool,
+# paced by a token bucket (writes/second) that halves its rate whenever
+# Firestore pushes back and slowly recovers after successful commits.
+# A batch that keeps failing is dropped and reported; the run continues.
+#
+# Writes are split into lanes by document path, one batch and one commit
+# thread per lane. Batches commit in parallel across lanes but in order
+# within one, so two writes to the same document never land out of order.
+
+BATCH_SIZE = 400        # Firestore allows up to 500 writes per batch
+MAX_IN_FLIGHT = 4       # batches being committed at the same time (one lane each)
+RATE = 500.0            # starting writes/second
+MIN_RATE = 20.0
+MAX_RATE = 2000.0
+MAX_RETRIES = 6
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+THROTTLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded", "Aborted"}
+
+
+def is_throttle(error):
+    text = str(error)
+    return type(error).__name__ in THROTTLE_ERRORS or "429" in text or "Quota" in text
+
+
+class TokenBucket:
+    """Thread-safe token bucket with AIMD rate adaptation."""
+
+    def __init__(self, rate=RATE, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)   # an explicit starting rate is never clamped down
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount):
+        """Block until `amount` tokens are available; returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                # A batch larger than one second of budget may go once the bucket is full
+                need = min(amount, self.rate)
+                if self.tokens >= need:
+                    self.tokens -= need
+                    return waited
+                delay = (need - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, self.rate)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.rate * 0.05)
+
+
+class Lane:
+    """The open batch for one share of the document paths, plus its in-order commit thread."""
+
+    def __init__(self, db):
+        self.db = db
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.reset()
+
+    def reset(self):
+        self.batch = self.db.batch()
+        self.ops = 0
+        self.keys = []
+        self.paths = []
+
+
+class FirestoreSink:
+    def __init__(self, db, manifest=None, batch_size=BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT,
+                 rate=RATE, max_retries=MAX_RETRIES, verbose=True):
+        self.db = db
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self.bucket = TokenBucket(rate)
+        self.lanes = [Lane(db) for _ in range(max_in_flight)]
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.futures = []
+        self.failed_keys = []   # manifest keys of writes that were dropped
+        self.committed_paths = set()   # documents written (or deleted) by committed batches
+
+        self.stats = {
+            "writes": 0, "batches": 0, "retries": 0, "throttles": 0,
+            "failed_batches": 0, "failed_writes": 0, "sleep_seconds": 0.0
+        }
+
+    # --- producer side ---
+    def set(self, doc_ref, data, merge=True, manifest_key=None):
+        lane = self._lane(doc_ref)
+        lane.batch.set(doc_ref, data, merge=merge)
+        self._added(lane, doc_ref, manifest_key)
+
+    def update(self, doc_ref, data, manifest_key=None):
+        lane = self._lane(doc_ref)
+        lane.batch.update(doc_ref, data)
+        self._added(lane, doc_ref, manifest_key)
+
+    def delete(self, doc_ref, manifest_key=None):
+        lane = self._lane(doc_ref)
+        lane.batch.delete(doc_ref)
+        self._added(lane, doc_ref, manifest_key)
+
+    def _lane(self, doc_ref):
+        return self.lanes[zlib.crc32(doc_ref.path.encode("utf-8")) % len(self.lanes)]
+
+    def _added(self, lane, doc_ref, manifest_key):
+        lane.ops += 1
+        lane.paths.append(doc_ref.path)
+        if manifest_key is not None:
+            lane.keys.append(manifest_key)
+        if lane.ops >= self.batch_size:
+            self._submit(lane)
+
+    def _submit(self, lane):
+        if lane.ops == 0:
+            return
+        batch, ops, keys, paths = lane.batch, lane.ops, lane.keys, lane.paths
+        lane.reset()
+
+        self.slots.acquire()  # backpressure: at most MAX_IN_FLIGHT batches outstanding
+        self.futures.append(lane.pool.submit(self._commit, batch, ops, keys, paths))
+
+    def flush(self):
+        """Hand every lane's open batch to its commit thread (blocks if too many are outstanding)."""
+        for lane in self.lanes:
+            self._submit(lane)
+
+    def drain(self):
+        """Flush and wait until everything queued so far has committed (or failed)."""
+        self.flush()
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+    def close(self):
+        """Drain, stop the worker pool and return the stats dict."""
+        self.drain()
+        for lane in self.lanes:
+            lane.pool.shutdown(wait=True)
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- worker side ---
+    def _count(self, **amounts):
+        """Add to this sink's stats and the run-wide firestore_* metrics."""
+        with self.lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+        for name, amount in amounts.items():
+            metrics.incr("firestore_" + name, amount)
+
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+        self._count(sleep_seconds=seconds)
+
+    def _commit(self, batch, ops, keys, paths):
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._count(sleep_seconds=self.bucket.acquire(ops))
+                try:
+                    with metrics.timer("firestore_commit"):
+                        batch.commit()
+                except Exception as e:
+                    throttled = is_throttle(e)
+                    if throttled:
+                        self.bucket.throttled()
+                    self._count(retries=1, throttles=int(throttled))
+
+                    if attempt == self.max_retries:
+                        self._failed(ops, keys, e)
+                        return
+                    delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt))
+                    delay = random.uniform(delay / 2, delay)  # jitter
+                    if self.verbose:
+                        print(f"      ⏳ Commit failed ({e}); retrying in {delay:.1f}s")
+                    self._sleep(delay)
+                    continue
+
+                self.bucket.succeeded()
+                self._count(writes=ops, batches=1)
+                with self.lock:
+                    self.committed_paths.update(paths)
+                    if self.manifest:
+                        self.manifest.confirm(keys)
+                if self.verbose:
+                    print(f"      💾 Batch committed ({ops} writes).")
+                return
+        finally:
+            self.slots.release()
+
+    def _failed(self, ops, keys, error):
+        self._count(failed_batches=1, failed_writes=ops)
+        with self.lock:
+            self.failed_keys.extend(keys)
+            if self.manifest:
+                self.manifest.discard(keys)
+        print(f"      ⚠️ Giving up on a batch of {ops} writes: {error}")
@@ -0,0 +1,172 @@
+import threading
+from datetime import date
+
+import metrics
+from dish_schema import meal_slots
+
+# One compact document per dining hall per day, so a hall screen is one read
+# (and one listener) instead of a listener on the whole dishes subcollection.
+#
+#   diningHalls/{hallId}/days/{YYYY-MM-DD}
+#     {date, hall, dishCount, version,
+#      meals: [{name, startTime, endTime,
+#               stations: [{name, dishes: [{id, name, tags, score}]}]}]}
+#
+# Written by upload_menus (today) and upload_history (every loaded day).
+# Scores are copied from the dish documents at upload time and refreshed by
+# sync_scores() whenever read_models rebuilds. Only the dish documents on the
+# menu being written are read (hall_dishes), never a hall's whole catalog.
+#
+# When and where each dish was last served changes every day, so it is kept
+# out of the dish documents (which are then only rewritten when their stable
+# fields change) and lives in one index document per hall:
+#
+#   diningHalls/{hallId}/meta/served     {dishId: {date, station}}
+#
+# Uploaders merge in only the dishes they saw, and never move a date back.
+
+DAYS_COLLECTION = "days"
+SERVED_PATH = ("meta", "served")
+VERSION = 1
+
+GET_ALL_CHUNK = 300   # document refs per get_all() call
+
+_dishes = {}          # hall id -> {dish id: stored fields}
+_dishes_lock = threading.Lock()
+_served = {}          # hall id -> {dish id: {date, station}}
+
+
+def day_path(hall_id, date_str):
+    return f"diningHalls/{hall_id}/{DAYS_COLLECTION}/{date_str}"
+
+
+def hall_dishes(db, hall_ref, dish_ids):
+    """
+    {dish id: stored fields} for the given dishes of one hall ({} for dishes
+    with no document yet). Each document is fetched once per process, in
+    batched get_all() calls; the returned dicts are the cached copies, so
+    callers update them after writing. Long-running callers forget() between polls.
+    """
+    dish_ids = list(dict.fromkeys(dish_ids))
+    with _dishes_lock:
+        cached = _dishes.setdefault(hall_ref.id, {})
+        refs = [hall_ref.collection("dishes").document(d) for d in dish_ids if d not in cached]
+        for i in range(0, len(refs), GET_ALL_CHUNK):
+            for snap in db.get_all(refs[i:i + GET_ALL_CHUNK]):
+                cached[snap.id] = (snap.to_dict() or {}) if snap.exists else {}
+        metrics.incr("hall_dish_reads", len(refs))
+        return {d: cached[d] for d in dish_ids}
+
+
+def hall_scores(db, hall_ref, dish_ids):
+    """{dish id: score} for the given dishes (None when unscored), via hall_dishes()."""
+    return {d: data.get("score") for d, data in hall_dishes(db, hall_ref, dish_ids).items()}
+
+
+def served_ref(db, hall_id):
+    return db.collection("diningHalls").document(hall_id).collection(SERVED_PATH[0]).document(SERVED_PATH[1])
+
+
+def served_path(hall_id):
+    return f"diningHalls/{hall_id}/{SERVED_PATH[0]}/{SERVED_PATH[1]}"
+
+
+def hall_served(db, hall_id):
+    """The hall's served index, {dish id: {date, station}}; read once per process."""
+    with _dishes_lock:
+        if hall_id not in _served:
+            snap = served_ref(db, hall_id).get()
+            _served[hall_id] = (snap.to_dict() or {}) if snap.exists else {}
+        return _served[hall_id]
+
+
+def served_updates(db, hall_id, date_str, stations):
+    """
+    Index entries to merge for dishes served on `date_str` ({dish id: station}).
+    A dish already recorded on a later day is left out, so loading an old day
+    never rolls its date back. The cached index is updated in place.
+    """
+    index = hall_served(db, hall_id)
+    updates = {}
+    with _dishes_lock:
+        for dish_id, station in stations.items():
+            if date_str >= (index.get(dish_id) or {}).get("date", ""):
+                updates[dish_id] = index[dish_id] = {"date": date_str, "station": station}
+    return updates
+
+
+def last_served(served, dish_id, data):
+    """A dish's last served date: the newer of its index entry and the legacy field on the document."""
+    return max((served.get(dish_id) or {}).get("date") or "", data.get("lastServedDate") or "") or None
+
+
+def forget(hall_id=None):
+    """Drop cached dish documents and served indexes (one hall's, or all) so the next read is fresh."""
+    with _dishes_lock:
+        if hall_id is None:
+            _dishes.clear()
+            _served.clear()
+        else:
+            _dishes.pop(hall_id, None)
+            _served.pop(hall_id, None)
+
+
+def build_day(hall_name, date_str, entries, scores):
+    """
+    entries: iterable of (meal_info, station, dish_id, name, tags) in menu order.
+    Returns the day document; a dish listed twice at one station is kept once.
+    """
+    meals, stations = {}, {}
+    for meal_info, station, dish_id, name, tags in entries:
+        meals.setdefault(meal_info["name"], meal_info)
+        dishes = stations.setdefault((meal_info["name"], station), {})
+        dishes.setdefault(dish_id, {"id": dish_id, "name": name, "tags": tags or [], "score": scores.get(dish_id)})
+
+    day_meals = []
+    for meal in meal_slots(meals.values()):
+        meal_stations = [{"name": station, "dishes": list(dishes.values())}
+                         for (meal_name, station), dishes in stations.items() if meal_name == meal["name"]]
+        day_meals.append(dict(meal, stations=meal_stations))
+    return {
+        "date": date_str,
+        "hall": hall_name,
+        "meals": day_meals,
+        "dishCount": len({dish_id for dishes in stations.values() for dish_id in dishes}),
+        "version": VERSION,
+    }
+
+
+def apply_scores(day, scores):
+    """Copy current scores into a day document in place; True if any changed."""
+    changed = False
+    for meal in day.get("meals") or []:
+        for station in meal.get("stations") or []:
+            for dish in station.get("dishes") or []:
+                score = scores.get(dish["id"], dish.get("score"))
+                if score != dish.get("score"):
+                    dish["score"] = score
+                    changed = True
+    return changed
+
+
+def sync_scores(db, scores, manifest, sink, date_str=None):
+    """
+    Refresh scores in every hall's day document for `date_str` (default today).
+    scores: {(hall id, dish id): score}. Returns the number of day docs rewritten.
+    """
+    date_str = date_str or date.today().strftime("%Y-%m-%d")
+    by_hall = {}
+    for (hall_id, dish_id), score in scores.items():
+        by_hall.setdefault(hall_id, {})[dish_id] = score
+
+    rewritten = 0
+    for hall_id, hall_scores_now in by_hall.items():
+        ref = db.collection("diningHalls").document(hall_id).collection(DAYS_COLLECTION).document(date_str)
+        snap = ref.get()
+        if not snap.exists:
+            continue
+        day = snap.to_dict() or {}
+        if apply_scores(day, hall_scores_now) and manifest.changed(day_path(hall_id, date_str), day):
+            sink.set(ref, day, merge=False, manifest_key=day_path(hall_id, date_str))
+            rewritten += 1
+    return rewritten
@@ -0,0 +1,36 @@
+import json
+import os
+
+# Checkpoint of which (date, hall) history units have been uploaded.
+# Written after every committed backfill window so an interrupted run picks
+# up where it stopped; regular history runs record their days here too.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.environ.get("APERO_HISTORY_STATE", os.path.join(current_dir, ".cache", "history_state.json"))
+
+
+class HistoryState:
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.days = {}   # "YYYY-MM-DD" -> sorted list of hall names
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.days = json.load(f).get("days", {})
+
+    def pending_halls(self, day, halls):
+        done = set(self.days.get(day, ()))
+        return [hall for hall in halls if hall not in done]
+
+    def mark(self, day, halls):
+        self.days[day] = sorted(set(self.days.get(day, ())) | set(halls))
+
+    def forget(self):
+        self.days = {}
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"days": self.days}, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,261 @@
+print("--- HOTSPOT AGGREGATOR ---")
+
+import argparse
+import heapq
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import metrics
+from firebase_client import firestore, get_db
+from firestore_sink import FirestoreSink
+from hall_days import DAYS_COLLECTION
+from write_manifest import WriteManifest
+
+# Campus activity for HotspotMapScreen, so the map reads one document instead
+# of every review in the window.
+#
+#   readModels/hotspots   {windows: {"1h"|"3h"|"today": {total, halls: [...]}}}
+#
+# Each tick reads only the reviews created since the stored cursor and adds
+# them to two rings of time buckets (per-minute for the last 3 hours, hourly
+# for the last day), each holding count and score sums per hall and per dish.
+# The windows are summed from the buckets, so a tick costs O(new reviews)
+# reads no matter how busy campus is. Reviews don't record a hall, so a dish
+# is credited to the halls serving it on the review's date (from the hall day
+# documents), split evenly when several halls served it. Days ("today", menu
+# dates) are campus days in Indiana time, whatever zone the aggregator runs in.
+# The app ignores a summary whose updatedAt is older than the window it shows,
+# so the document is republished every HEARTBEAT seconds even when unchanged.
+
+# 1. SETUP FIREBASE
+db = get_db()
+
+# 2. CONFIG
+current_dir = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.environ.get("APERO_HOTSPOT_STATE", os.path.join(current_dir, ".cache", "hotspot_state.json"))
+DOC_ID = "hotspots"
+VERSION = 1
+MINUTE_SLOTS = 3 * 60        # minute buckets: enough for the 3h window
+HOUR_SLOTS = 25              # hour buckets: "today" plus the partial hour at either end
+RECENT_DISHES = 3            # top dishes listed per hall
+UNKNOWN_HALL = "unknown"
+INTERVAL = 60                # seconds between ticks with --watch
+HEARTBEAT = 15 * 60          # republish an unchanged summary this often, so updatedAt stays fresh
+CAMPUS_TZ = ZoneInfo("America/Indiana/Indianapolis")
+
+# 3. BUCKET RINGS
+class Ring:
+    """Fixed number of time buckets; slot = epoch % size, reused once its epoch is stale."""
+
+    def __init__(self, size, slots=None):
+        self.size = size
+        self.slots = slots or [None] * size
+
+    def bucket(self, epoch):
+        i = epoch % self.size
+        slot = self.slots[i]
+        if slot is None or slot["epoch"] != epoch:
+            slot = self.slots[i] = {"epoch": epoch, "halls": {}, "dishes": {}}
+        return slot
+
+    def add(self, epoch, hall, dish_id, dish_name, score, weight):
+        slot = self.bucket(epoch)
+        count, total = slot["halls"].get(hall, (0.0, 0.0))
+        slot["halls"][hall] = (count + weight, total + score * weight)
+        key = f"{hall}/{dish_id}"
+        count, total, _ = slot["dishes"].get(key, (0.0, 0.0, dish_name))
+        slot["dishes"][key] = (count + weight, total + score * weight, dish_name)
+
+    def window(self, first, last):
+        """Buckets whose epoch falls in [first, last]."""
+        return [slot for slot in self.slots if slot is not None and first <= slot["epoch"] <= last]
+
+# 4. STATE
+class HotspotState:
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.cursor = None     # ISO createdAt of the newest review consumed
+        self.at_cursor = []    # review ids sharing that timestamp (the next query re-reads them)
+        self.published = 0     # epoch of the last summary write
+        self.minutes = Ring(MINUTE_SLOTS)
+        self.hours = Ring(HOUR_SLOTS)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.cursor = data.get("cursor")
+            self.at_cursor = data.get("atCursor", [])
+            self.published = data.get("published", 0)
+            if len(data.get("minutes", ())) == MINUTE_SLOTS and len(data.get("hours", ())) == HOUR_SLOTS:
+                self.minutes = Ring(MINUTE_SLOTS, [_load_slot(s) for s in data["minutes"]])
+                self.hours = Ring(HOUR_SLOTS, [_load_slot(s) for s in data["hours"]])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"cursor": self.cursor, "atCursor": self.at_cursor, "published": self.published,
+                       "minutes": self.minutes.slots, "hours": self.hours.slots}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+def _load_slot(slot):
+    if slot is None:
+        return None
+    return {"epoch": slot["epoch"],
+            "halls": {k: tuple(v) for k, v in slot["halls"].items()},
+            "dishes": {k: tuple(v) for k, v in slot["dishes"].items()}}
+
+# 5. CONSUME REVIEWS
+def _as_utc(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class HallLookup:
+    """Which halls served a dish on a date, read from the day documents once per date."""
+
+    def __init__(self):
+        self.days = {}
+
+    def halls(self, dish_id, day):
+        if day not in self.days:
+            served = {}
+            for hall_ref in db.collection("diningHalls").list_documents():
+                snap = hall_ref.collection(DAYS_COLLECTION).document(day).get()
+                if not snap.exists:
+                    continue
+                for meal in (snap.to_dict() or {}).get("meals") or []:
+                    for station in meal.get("stations") or []:
+                        for dish in station.get("dishes") or []:
+                            served.setdefault(dish["id"], set()).add(hall_ref.id)
+            self.days[day] = {dish: sorted(halls) for dish, halls in served.items()}
+            metrics.incr("hotspot_day_lookups")
+        return self.days[day].get(dish_id) or [UNKNOWN_HALL]
+
+def consume(state, now, lookup=None):
+    """Fold reviews created since the cursor into the rings. Returns how many were new."""
+    lookup = lookup or HallLookup()
+    oldest = now - timedelta(hours=HOUR_SLOTS - 1)
+    since = max(_as_utc(state.cursor), oldest) if state.cursor else oldest
+    query = db.collection("reviews").where("createdAt", ">=", since).order_by("createdAt")
+
+    seen = set(state.at_cursor)
+    added = 0
+    with metrics.timer("hotspot_read"):
+        for snap in query.stream():
+            data = snap.to_dict() or {}
+            created = _as_utc(data.get("createdAt"))
+            if created is None or snap.id in seen:
+                continue
+            stamp = created.isoformat()
+            if stamp != state.cursor:
+                state.cursor, state.at_cursor = stamp, []
+            state.at_cursor.append(snap.id)
+
+            dish_id = data.get("dishId") or ""
+            if data.get("locationId"):
+                halls = [data["locationId"]]
+            else:
+                halls = lookup.halls(dish_id, created.astimezone(CAMPUS_TZ).strftime("%Y-%m-%d"))
+            score = data.get("initialScore") or 0
+            epoch = int(created.timestamp())
+            for hall in halls:
+                for ring, seconds in ((state.minutes, 60), (state.hours, 3600)):
+                    ring.add(epoch // seconds, hall, dish_id, data.get("dishName") or "", score, 1.0 / len(halls))
+            added += 1
+    metrics.incr("hotspot_reviews", added)
+    return added
+
+# 6. SUMMARY
+def window_summary(slots):
+    halls, dishes = {}, {}
+    for slot in slots:
+        for hall, (count, total) in slot["halls"].items():
+            c, t = halls.get(hall, (0.0, 0.0))
+            halls[hall] = (c + count, t + total)
+        for key, (count, total, name) in slot["dishes"].items():
+            c, t, _ = dishes.get(key, (0.0, 0.0, name))
+            dishes[key] = (c + count, t + total, name)
+
+    by_hall = {}
+    for key, (count, _, name) in dishes.items():
+        by_hall.setdefault(key.split("/", 1)[0], []).append((count, name))
+    entries = []
+    for hall, (count, total) in halls.items():
+        top = heapq.nlargest(RECENT_DISHES, by_hall.get(hall, ()))
+        # Counts can be fractional (shared dishes); the screen rounds them for display
+        entries.append({"id": hall, "count": round(count, 1), "averageScore": round(total / count, 1) if count else None,
+                        "recentDishes": [name for _, name in top if name]})
+    entries.sort(key=lambda e: (-e["count"], e["id"]))
+    return {"total": round(sum(count for count, _ in halls.values())), "halls": entries}
+
+def summarize(state, now):
+    minute, hour = int(now.timestamp()) // 60, int(now.timestamp()) // 3600
+    midnight = now.astimezone(CAMPUS_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "1h": window_summary(state.minutes.window(minute - 59, minute)),
+        "3h": window_summary(state.minutes.window(minute - MINUTE_SLOTS + 1, minute)),
+        "today": window_summary(state.hours.window(int(midnight.timestamp()) // 3600, hour)),
+    }
+
+def tick(manifest=None, now=None):
+    """Consume new reviews and republish the summary if it changed. Returns documents written."""
+    own_manifest = manifest is None
+    manifest = manifest or WriteManifest()
+    now = now or datetime.now(timezone.utc)
+    state = HotspotState()
+    added = consume(state, now)
+
+    doc = {"windows": summarize(state, now), "version": VERSION}
+    key = f"readModels/{DOC_ID}"
+    sink = FirestoreSink(db, manifest, verbose=False)
+    # The timestamp stays out of the comparison, or every tick would rewrite the doc
+    heartbeat = now.timestamp() - state.published >= HEARTBEAT
+    if manifest.changed(key, doc) or heartbeat:
+        sink.set(db.collection("readModels").document(DOC_ID), dict(doc, updatedAt=firestore.SERVER_TIMESTAMP),
+                 merge=False, manifest_key=key)
+    stats = sink.close()
+    if stats["writes"] and not stats["failed_writes"]:
+        state.published = now.timestamp()
+    if not stats["failed_writes"]:
+        state.save()   # otherwise the next tick reads the same reviews again
+    if own_manifest:
+        manifest.save()
+    print(f"   🔥 {added} new reviews, {doc['windows']['1h']['total']} in the last hour, "
+          f"{doc['windows']['today']['total']} today ({stats['writes']} written)")
+    return stats["writes"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold new reviews into the campus hotspot summary.")
+    parser.add_argument("--watch", action="store_true", help="keep running, one tick every --interval seconds")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between ticks with --watch")
+    parser.add_argument("--full", action="store_true", help="ignore the write manifest and rewrite the summary")
+    args = parser.parse_args()
+
+    with metrics.run("hotspots"):
+        manifest = WriteManifest(full=args.full)
+        if not args.watch:
+            tick(manifest)
+            manifest.save()
+        else:
+            stop = threading.Event()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.set())
+            started = time.time()
+            while not stop.is_set():
+                ok = True
+                try:
+                    tick(manifest)
+                    manifest.save()
+                except Exception as e:
+                    print(f"   ❌ Tick failed: {e}")
+                    metrics.incr("hotspot_tick_errors")
+                    ok = False
+                metrics.write_prometheus("hotspots", started, ok)
+                stop.wait(args.interval)
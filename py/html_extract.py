@@ -0,0 +1,36 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Targeted HTML parsing for the campusdish pages.
+# Only the nodes the scraper reads are built into the tree (SoupStrainer),
+# using lxml when it is installed and the stdlib parser otherwise.
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+ADDRESS_CLASSES = ["address", "location-address", "contact-address"]
+HOURS_CLASSES = ["hours-container", "location-hours"]
+
+_METADATA_ONLY = SoupStrainer(class_=ADDRESS_CLASSES + HOURS_CLASSES)
+_LINKS_ONLY = SoupStrainer("a", href=True)
+
+
+def metadata_soup(content):
+    """Soup holding only the address/hours containers (and their children)."""
+    return BeautifulSoup(content, PARSER, parse_only=_METADATA_ONLY)
+
+
+def links_soup(content):
+    """Soup holding only <a href> tags (and their children)."""
+    return BeautifulSoup(content, PARSER, parse_only=_LINKS_ONLY)
+
+
+def select_first(soup, classes):
+    """First match for .class1, then .class2, ... (same fallback order as before)."""
+    for cls in classes:
+        node = soup.select_one(f".{cls}")
+        if node:
+            return node
+    return None
@@ -0,0 +1,308 @@
+import json
+import mmap
+import os
+import sys
+import threading
+from array import array
+from collections import Counter
+from datetime import date, datetime
+
+# Compact, append-only columnar archive of every menu day we fetch.
+# One row per served item: (day, hall, meal, station, dish, start, end).
+# Names are interned into integer dictionaries and each column is a flat
+# little-endian file, so a year of menus is a few MB and the query helpers
+# below scan it memory-mapped (with numpy when installed, stdlib otherwise).
+#
+#   archive/dictionaries.json   {"halls": [...], "meals": [...], "stations": [...], "dishes": [...]}
+#   archive/index.json          {"rows": n, "days": {"YYYY-MM-DD": [hall ids]}}
+#   archive/<column>.col        raw column values
+#
+# Only finished (past) days are archived, once per (day, hall); a crash
+# between writes is repaired on open by truncating columns to index["rows"].
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.environ.get("APERO_MENU_ARCHIVE", os.path.join(current_dir, ".cache", "archive"))
+
+# column -> array typecode (all unsigned)
+COLUMNS = {"day": "I", "hall": "H", "meal": "H", "station": "I", "dish": "I", "start": "H", "end": "H"}
+NUMPY_TYPES = {"I": "<u4", "H": "<u2"}
+NO_TIME = 0xFFFF
+DICTIONARIES = ("halls", "meals", "stations", "dishes")
+
+
+def minutes(time_str):
+    """'2025-10-15T07:00:00-04:00' or '07:00 AM' -> minutes after midnight (NO_TIME if unknown)."""
+    if not time_str or not isinstance(time_str, str):
+        return NO_TIME
+    if "T" in time_str:
+        hh, mm = time_str.split("T")[1][:5].split(":")
+        return int(hh) * 60 + int(mm)
+    s = time_str.upper().strip().replace(".", "")
+    for fmt in ("%I:%M %p", "%I:%M:%S %p"):
+        try:
+            t = datetime.strptime(s, fmt)
+            return t.hour * 60 + t.minute
+        except ValueError:
+            continue
+    return NO_TIME
+
+
+def _load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+class MenuArchive:
+    def __init__(self, path=ARCHIVE_DIR):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        names = _load_json(os.path.join(path, "dictionaries.json"), {})
+        self.names = {kind: names.get(kind, []) for kind in DICTIONARIES}
+        self.ids = {kind: {name: i for i, name in enumerate(values)} for kind, values in self.names.items()}
+
+        index = _load_json(os.path.join(path, "index.json"), {"rows": 0, "days": {}})
+        self.rows = index["rows"]
+        self.days = {day: set(halls) for day, halls in index["days"].items()}
+        self._repair()
+        self._columns = None
+
+    def _column_path(self, column):
+        return os.path.join(self.path, f"{column}.col")
+
+    def _repair(self):
+        # Drop any rows written after the last index save (interrupted append)
+        for column, code in COLUMNS.items():
+            path = self._column_path(column)
+            expected = self.rows * array(code).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > expected:
+                with open(path, "r+b") as f:
+                    f.truncate(expected)
+
+    def _intern(self, kind, name):
+        ids = self.ids[kind]
+        if name not in ids:
+            ids[name] = len(self.names[kind])
+            self.names[kind].append(name)
+        return ids[name]
+
+    # --- writing ---
+    def has_day(self, day, hall):
+        hall_id = self.ids["halls"].get(hall)
+        return hall_id is not None and hall_id in self.days.get(day, ())
+
+    def append(self, day, hall, court):
+        """Archive one hall-day payload. Returns the rows added (0 if already archived or not final)."""
+        if day >= date.today().strftime("%Y-%m-%d") or court is None:
+            return 0
+        with self.lock:
+            if self.has_day(day, hall):
+                return 0
+            hall_id = self._intern("halls", hall)
+            day_num = date.fromisoformat(day).toordinal()
+            columns = {column: array(code) for column, code in COLUMNS.items()}
+
+            for meal in (court.get("dailyMenu") or {}).get("meals") or []:
+                meal_id = self._intern("meals", meal.get("name") or "")
+                start, end = minutes(meal.get("startTime")), minutes(meal.get("endTime"))
+                for station in meal.get("stations", []):
+                    station_id = self._intern("stations", station.get("name") or "")
+                    for entry in station.get("items", []):
+                        item = entry.get("item")
+                        if not item:
+                            continue
+                        row = (day_num, hall_id, meal_id, station_id, self._intern("dishes", item["name"]), start, end)
+                        for column, value in zip(COLUMNS, row):
+                            columns[column].append(value)
+
+            for column, values in columns.items():
+                if sys.byteorder != "little":
+                    values.byteswap()
+                with open(self._column_path(column), "ab") as f:
+                    values.tofile(f)
+            added = len(columns["day"])
+            self.rows += added
+            self.days.setdefault(day, set()).add(hall_id)
+            self._columns = None
+            return added
+
+    def append_many(self, courts):
+        """Archive a {(hall, day): court} map as returned by fetch_courts(), saving if anything was added."""
+        added = sum(self.append(day, hall, court) for (hall, day), court in courts.items())
+        if added:
+            self.save()
+        return added
+
+    def save(self):
+        # Dictionaries first: the index must never reference unknown names
+        with self.lock:
+            _save_json(os.path.join(self.path, "dictionaries.json"), self.names)
+            _save_json(os.path.join(self.path, "index.json"), {
+                "rows": self.rows,
+                "days": {day: sorted(halls) for day, halls in sorted(self.days.items())},
+            })
+
+    # --- reading ---
+    def columns(self):
+        """Memory-mapped columns: numpy arrays if numpy is installed, else memoryviews."""
+        if self._columns is None:
+            self._columns = {}
+            for column, code in COLUMNS.items():
+                path = self._column_path(column)
+                if self.rows == 0 or not os.path.exists(path):
+                    self._columns[column] = np.zeros(0, NUMPY_TYPES[code]) if np else array(code)
+                elif np is not None:
+                    self._columns[column] = np.memmap(path, dtype=NUMPY_TYPES[code], mode="r", shape=(self.rows,))
+                else:
+                    with open(path, "rb") as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._columns[column] = memoryview(mapped)[:self.rows * array(code).itemsize].cast(code)
+        return self._columns
+
+    def _rows_where(self, **filters):
+        """Row indexes matching column == value for every filter."""
+        cols = self.columns()
+        if np is not None:
+            mask = np.ones(self.rows, dtype=bool)
+            for column, value in filters.items():
+                mask &= cols[column] == value
+            return np.flatnonzero(mask)
+        candidates = range(self.rows)
+        for column, value in filters.items():
+            col = cols[column]
+            candidates = [i for i in candidates if col[i] == value]
+        return list(candidates)
+
+    def _filters(self, dish=None, hall=None):
+        filters = {}
+        for kind, column, name in (("dishes", "dish", dish), ("halls", "hall", hall)):
+            if name is not None:
+                if name not in self.ids[kind]:
+                    return None
+                filters[column] = self.ids[kind][name]
+        return filters
+
+    def serve_days(self, dish, hall=None):
+        """Sorted list of days ('YYYY-MM-DD') the dish was served (at `hall`, if given)."""
+        filters = self._filters(dish, hall)
+        if filters is None:
+            return []
+        days = self.columns()["day"]
+        ordinals = {int(days[i]) for i in self._rows_where(**filters)}
+        return [date.fromordinal(o).strftime("%Y-%m-%d") for o in sorted(ordinals)]
+
+    def frequency(self, dish, hall=None, start=None, end=None):
+        """Number of days the dish was served, optionally within [start, end]."""
+        return len([d for d in self.serve_days(dish, hall)
+                    if (start is None or d >= start) and (end is None or d <= end)])
+
+    def last_served(self, dish, hall=None):
+        days = self.serve_days(dish, hall)
+        return days[-1] if days else None
+
+    def co_occurrence(self, dish, top=10, hall=None):
+        """Dishes most often on the same (day, hall, meal) as `dish`: [(name, count)]."""
+        filters = self._filters(dish, hall)
+        if filters is None:
+            return []
+        cols = self.columns()
+        meals = {(int(cols["day"][i]), int(cols["hall"][i]), int(cols["meal"][i])) for i in self._rows_where(**filters)}
+        dish_id = self.ids["dishes"][dish]
+
+        counts = Counter()
+        if np is not None and meals:
+            keys = (cols["day"].astype(np.uint64) << 32) | (cols["hall"].astype(np.uint64) << 16) | cols["meal"]
+            wanted = np.array([(d << 32) | (h << 16) | m for d, h, m in meals], dtype=np.uint64)
+            rows = np.flatnonzero(np.isin(keys, wanted))
+            # one count per meal, even if the dish sits at two stations
+            pairs = np.unique(np.stack([keys[rows], cols["dish"][rows].astype(np.uint64)]), axis=1)
+            counts.update(pairs[1].tolist())
+        else:
+            seen = set()
+            for i in range(self.rows):
+                key = (cols["day"][i], cols["hall"][i], cols["meal"][i])
+                if key in meals and (key, cols["dish"][i]) not in seen:
+                    seen.add((key, cols["dish"][i]))
+                    counts[cols["dish"][i]] += 1
+        counts.pop(dish_id, None)
+        return [(self.names["dishes"][i], n) for i, n in counts.most_common(top)]
+
+    def court(self, day, hall):
+        """Rebuild a GraphQL-shaped court payload for replays (None if not archived)."""
+        if not self.has_day(day, hall):
+            return None
+        cols = self.columns()
+        rows = self._rows_where(day=date.fromisoformat(day).toordinal(), hall=self.ids["halls"][hall])
+        meals = {}
+        for i in rows:
+            meal = meals.setdefault(int(cols["meal"][i]), {
+                "name": self.names["meals"][int(cols["meal"][i])],
+                "startTime": _clock(int(cols["start"][i])),
+                "endTime": _clock(int(cols["end"][i])),
+                "stations": {},
+            })
+            station = meal["stations"].setdefault(int(cols["station"][i]), {
+                "name": self.names["stations"][int(cols["station"][i])], "items": []})
+            station["items"].append({"item": {"name": self.names["dishes"][int(cols["dish"][i])]}})
+        for meal in meals.values():
+            meal["stations"] = list(meal["stations"].values())
+        return {"name": hall, "dailyMenu": {"meals": list(meals.values())}}
+
+
+def _clock(value):
+    """Minutes after midnight -> '07:30 AM' (the API's 12-hour form), None if unknown."""
+    if value == NO_TIME:
+        return None
+    return datetime(2000, 1, 1, value // 60, value % 60).strftime("%I:%M %p")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_archive():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = MenuArchive()
+    return _default
+
+
+if __name__ == "__main__":
+    import argparse
+
+    print("--- MENU ARCHIVE ---")
+    parser = argparse.ArgumentParser(description="Query the local menu archive without touching the network.")
+    parser.add_argument("dish", nargs="?", help="dish name to look up")
+    parser.add_argument("--hall", help="restrict to one dining hall (e.g. Ford)")
+    parser.add_argument("--start", help="first day counted by frequency, YYYY-MM-DD")
+    parser.add_argument("--end", help="last day counted by frequency, YYYY-MM-DD")
+    parser.add_argument("--top", type=int, default=10, help="how many co-occurring dishes to list")
+    args = parser.parse_args()
+
+    archive = get_archive()
+    sizes = sum(os.path.getsize(archive._column_path(c)) for c in COLUMNS if os.path.exists(archive._column_path(c)))
+    print(f"📦 {archive.rows} rows, {len(archive.days)} days, {len(archive.names['dishes'])} dishes, "
+          f"{sizes / 1024:.1f} KiB of columns in {archive.path}")
+
+    if args.dish:
+        print(f"\n🍽️  {args.dish}" + (f" @ {args.hall}" if args.hall else ""))
+        print(f"   Served on {archive.frequency(args.dish, args.hall, args.start, args.end)} day(s), "
+              f"last on {archive.last_served(args.dish, args.hall) or 'never'}")
+        for name, count in archive.co_occurrence(args.dish, args.top, args.hall):
+            print(f"   🤝 {count:4d}x  {name}")
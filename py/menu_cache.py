@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+# Persistent on-disk cache for GraphQL court payloads.
+# Keyed by (query hash, hall, date). A menu fetched after its day ended is
+# frozen and never expires; anything fetched earlier (today, future dates, or
+# a past day captured before late substitutions) expires after TTL_SECONDS,
+# and a past day's entry is refetched once so the final menu gets frozen.
+# Values are zlib-compressed JSON and the file is kept under MAX_BYTES by
+# evicting the least recently used entries.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.environ.get("APERO_MENU_CACHE", os.path.join(current_dir, ".cache", "menu_cache.sqlite3"))
+TTL_SECONDS = 30 * 60
+MAX_BYTES = 64 * 1024 * 1024
+
+# APERO_OFFLINE=1 replays whatever is cached (expired or not) and never
+# touches the network, for tests and benchmarks.
+OFFLINE = os.environ.get("APERO_OFFLINE") == "1"
+
+
+def query_hash(query_text):
+    return hashlib.sha1(query_text.encode("utf-8")).hexdigest()[:16]
+
+
+def is_past(date_str, today=None):
+    today = today or date.today().strftime("%Y-%m-%d")
+    return date_str < today
+
+
+def day_end(date_str):
+    """Epoch seconds of local midnight after the given day."""
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+
+
+class MenuCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_bytes=MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by concurrent fetchers (e.g. backfill windows), so serialize access
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS menus (
+                qhash TEXT NOT NULL,
+                hall TEXT NOT NULL,
+                day TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                frozen INTEGER NOT NULL,
+                PRIMARY KEY (qhash, hall, day)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS menus_lru ON menus (accessed_at)")
+        self.conn.commit()
+
+    def get(self, qhash, hall, day, allow_stale=False):
+        """Return (hit, court). A hit may carry a None court (hall closed)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, fetched_at, frozen FROM menus WHERE qhash=? AND hall=? AND day=?",
+                (qhash, hall, day)
+            ).fetchone()
+            if row is None:
+                return False, None
+
+            body, fetched_at, frozen = row
+            if not frozen and is_past(day) and fetched_at >= day_end(day):
+                frozen = 1  # fetched after the day was over, so it is final
+            elif not frozen and not allow_stale and (is_past(day) or time.time() - fetched_at > self.ttl):
+                # A past day seen before it ended may have changed later: refetch once, then freeze
+                return False, None
+
+            self.conn.execute(
+                "UPDATE menus SET accessed_at=?, frozen=? WHERE qhash=? AND hall=? AND day=?",
+                (time.time(), frozen, qhash, hall, day)
+            )
+            self.conn.commit()
+            return True, json.loads(zlib.decompress(body))
+
+    def put(self, qhash, hall, day, court):
+        body = zlib.compress(json.dumps(court, separators=(",", ":")).encode("utf-8"), 6)
+        with self.lock:
+            now = time.time()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO menus VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (qhash, hall, day, body, len(body), now, now, 1 if is_past(day) else 0)
+            )
+            self.conn.commit()
+            self.evict()
+
+    def total_bytes(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM menus").fetchone()[0]
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        with self.lock:
+            excess = self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return 0
+            removed = 0
+            rows = self.conn.execute("SELECT qhash, hall, day, size FROM menus ORDER BY accessed_at")
+            victims = []
+            for qhash, hall, day, size in rows:
+                if removed >= excess:
+                    break
+                victims.append((qhash, hall, day))
+                removed += size
+            self.conn.executemany("DELETE FROM menus WHERE qhash=? AND hall=? AND day=?", victims)
+            self.conn.commit()
+            return len(victims)
+
+    def close(self):
+        self.conn.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = MenuCache()
+    return _default
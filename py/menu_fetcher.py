@@ -0,0 +1,228 @@
+import asyncio
+import random
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import menu_archive
+import menu_cache
+import menu_query
+import metrics
+
+# Shared async GraphQL fetch engine for the HFS menu API.
+# Every script that needs (hall, date) menus goes through fetch_courts()
+# so the whole matrix is fetched concurrently over one pooled session,
+# packed into as few aliased queries as the byte limit allows.
+
+GRAPHQL_URL = "https://api.hfs.purdue.edu/menus/v3/GraphQL"
+HEADERS = {
+    "Content-Type": "application/json",
+    "Origin": "https://dining.purdue.edu",
+    "Referer": "https://dining.purdue.edu/",
+    "User-Agent": "Mozilla/5.0"
+}
+
+QUERY = """
+query getLocationMenu($name: String!, $date: Date!) {
+  diningCourtByName(name: $name) {
+    name
+    dailyMenu(date: $date) {
+      meals {
+        name
+        startTime
+        endTime
+        stations {
+          name
+          items {
+            item {
+              name
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+MAX_CONCURRENCY = 8   # in-flight requests per host
+TIMEOUT = 10          # seconds per request
+RETRIES = 3           # extra attempts after the first failure
+BACKOFF = 0.5         # base delay, doubled every retry
+
+_session = None
+_host_limits = {}                 # host -> semaphore, shared by every thread and event loop
+_host_limits_lock = threading.Lock()
+
+
+def get_session(pool_size=MAX_CONCURRENCY):
+    """Return the process-wide keep-alive session (created on first use)."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+        _session.headers.update(HEADERS)
+    return _session
+
+
+def _host_semaphore(url, limit):
+    # One limit per host for the whole process: several threads may each run
+    # fetch_courts() (its own event loop) at once, and they all share one HTTP
+    # pool, so the cap is enforced in the worker threads rather than per loop.
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(limit)
+        return _host_limits[host]
+
+
+def _post_limited(semaphore, session, url, payload, timeout):
+    with semaphore:
+        return session.post(url, json=payload, timeout=timeout)
+
+
+async def post_json(payload, url=GRAPHQL_URL, concurrency=MAX_CONCURRENCY,
+                    timeout=TIMEOUT, retries=RETRIES):
+    """POST one GraphQL payload with per-host limits, timeout and retry."""
+    data, _ = await post_json_sized(payload, url, concurrency, timeout, retries)
+    return data
+
+
+async def post_json_sized(payload, url=GRAPHQL_URL, concurrency=MAX_CONCURRENCY,
+                          timeout=TIMEOUT, retries=RETRIES):
+    """Like post_json() but returns (data, response_bytes)."""
+    session = get_session(concurrency)
+    semaphore = _host_semaphore(url, concurrency)
+
+    for attempt in range(retries + 1):
+        try:
+            with metrics.timer("graphql_request"):
+                resp = await asyncio.to_thread(_post_limited, semaphore, session, url, payload, timeout)
+            resp.raise_for_status()
+            metrics.incr("graphql_bytes_received", len(resp.content))
+            with metrics.timer("graphql_decode"):
+                return resp.json(), len(resp.content)
+        except Exception:
+            metrics.incr("graphql_errors")
+            if attempt == retries:
+                raise
+            delay = BACKOFF * (2 ** attempt) + random.uniform(0, BACKOFF)
+            metrics.incr("graphql_retries")
+            metrics.incr("graphql_sleep_seconds", delay)
+            await asyncio.sleep(delay)
+
+
+async def fetch_court_async(hall_name, date_str, **kwargs):
+    payload = {
+        "operationName": "getLocationMenu",
+        "variables": {"name": hall_name, "date": date_str},
+        "query": QUERY
+    }
+    try:
+        data = await post_json(payload, **kwargs)
+    except Exception as e:
+        print(f"   ⚠️ Error fetching {hall_name} ({date_str}): {e}")
+        return None
+    court = (data.get("data") or {}).get("diningCourtByName") or None
+    if data.get("errors") and (court is None or court.get("dailyMenu") is None):
+        # A null menu next to an error is a failed fetch, not a closed hall
+        print(f"   ⚠️ Error fetching {hall_name} ({date_str}): {data['errors']}")
+        metrics.incr("graphql_partial_errors")
+        return None
+    return court
+
+
+async def fetch_chunk_async(chunk, **kwargs):
+    """Fetch a chunk of pairs in one aliased query, falling back per pair."""
+    payload, alias_map = menu_query.build_query(chunk)
+    try:
+        data, nbytes = await post_json_sized(payload, **kwargs)
+        if not data.get("data"):
+            raise ValueError(data.get("errors") or "empty response")
+    except Exception as e:
+        print(f"   ⚠️ Combined query for {len(chunk)} menus failed ({e}), retrying one by one")
+        results = await asyncio.gather(*(fetch_court_async(h, d, **kwargs) for h, d in chunk))
+        return dict(zip(chunk, results))
+
+    menu_query.record_response_size(nbytes, len(chunk))
+    courts = menu_query.split_response(data, alias_map)
+    failed = [pair for pair, court in courts.items() if court is None]
+    if failed and data.get("errors"):
+        # Partial errors: refetch just the affected menus; ones that fail again stay None (not cached)
+        metrics.incr("graphql_partial_errors", len(failed))
+        print(f"   ⚠️ {len(failed)} of {len(chunk)} menus errored in a combined query, retrying one by one")
+        results = await asyncio.gather(*(fetch_court_async(h, d, **kwargs) for h, d in failed))
+        courts.update(zip(failed, results))
+    return courts
+
+
+async def fetch_network_async(pairs, batched=True, max_bytes=menu_query.MAX_RESPONSE_BYTES, **kwargs):
+    if not batched:
+        results = await asyncio.gather(*(fetch_court_async(h, d, **kwargs) for h, d in pairs))
+        return dict(zip(pairs, results))
+
+    courts = {}
+    chunks = menu_query.chunk_pairs(pairs, max_bytes)
+    for result in await asyncio.gather(*(fetch_chunk_async(c, **kwargs) for c in chunks)):
+        courts.update(result)
+    return courts
+
+
+async def fetch_courts_async(pairs, use_cache=True, **kwargs):
+    pairs = list(dict.fromkeys(pairs))
+    if not use_cache:
+        return await fetch_network_async(pairs, **kwargs)
+
+    cache = menu_cache.get_cache()
+    qhash = menu_cache.query_hash(menu_query.MENU_FIELDS)
+    courts = {}
+    misses = []
+    for hall, day in pairs:
+        hit, court = cache.get(qhash, hall, day, allow_stale=menu_cache.OFFLINE)
+        if hit:
+            courts[(hall, day)] = court
+        else:
+            misses.append((hall, day))
+    metrics.incr("menu_cache_hits", len(courts))
+    metrics.incr("menu_cache_misses", len(misses))
+
+    archive = menu_archive.get_archive()
+    if misses and menu_cache.OFFLINE:
+        # Past days that aged out of the cache can still be replayed from the archive
+        for hall, day in misses:
+            courts[(hall, day)] = archive.court(day, hall)
+        missing = sum(courts[pair] is None for pair in misses)
+        if missing:
+            print(f"   ⚠️ Offline: {missing} menus not in cache or archive")
+    elif misses:
+        fetched = await fetch_network_async(misses, **kwargs)
+        for (hall, day), court in fetched.items():
+            # None means the request failed; don't pin a failure in the cache
+            if court is not None:
+                cache.put(qhash, hall, day, court)
+        courts.update(fetched)
+    archive.append_many(courts)
+    return courts
+
+
+def fetch_courts(pairs, **kwargs):
+    """
+    Fetch raw `diningCourtByName` payloads for every (hall, date) pair.
+    Returns {(hall, date): court dict or None}.
+
+    Pairs are served from the on-disk menu cache when possible (use_cache=False
+    skips it). Misses are packed into aliased multi-hall/multi-date queries
+    sized to stay under `max_bytes`; pass batched=False for one POST per pair.
+    """
+    return asyncio.run(fetch_courts_async(pairs, **kwargs))
+
+
+def court_meals(court):
+    """Return the meal list of a court payload (empty if closed/missing)."""
+    if not court:
+        return []
+    return (court.get("dailyMenu") or {}).get("meals") or []
@@ -0,0 +1,136 @@
+# GraphQL query builder that packs many (hall, date) pairs into one POST
+# using aliases, and splits the combined response back per hall/date.
+#
+#   query getMenus($h0: String!, $d0: Date!, $d1: Date!) {
+#     h0: diningCourtByName(name: $h0) {
+#       name
+#       d0: dailyMenu(date: $d0) { ...MENU_FIELDS }
+#       d1: dailyMenu(date: $d1) { ...MENU_FIELDS }
+#     }
+#   }
+
+MENU_FIELDS = """
+      meals {
+        name
+        startTime
+        endTime
+        stations {
+          name
+          items {
+            item {
+              name
+            }
+          }
+        }
+      }
+"""
+
+MAX_RESPONSE_BYTES = 512 * 1024   # soft cap on each combined response
+EST_BYTES_PER_DAY = 24 * 1024     # initial guess for one hall-day of menu JSON
+MAX_PAIRS_PER_QUERY = 40          # hard cap regardless of the byte estimate
+
+# Learned from real responses so later plans get closer to the byte limit.
+_observed_bytes_per_day = None
+
+
+def estimated_bytes_per_day():
+    return _observed_bytes_per_day or EST_BYTES_PER_DAY
+
+
+def record_response_size(nbytes, pair_count):
+    """Feed back a response size so the next chunk plan uses a real estimate."""
+    global _observed_bytes_per_day
+    if pair_count <= 0:
+        return
+    per_day = max(1, nbytes // pair_count)
+    # Track the larger of old/new so chunks stay under the cap on busy days
+    if _observed_bytes_per_day is None:
+        _observed_bytes_per_day = per_day
+    else:
+        _observed_bytes_per_day = max(per_day, (_observed_bytes_per_day * 3 + per_day) // 4)
+
+
+def pairs_per_chunk(max_bytes=MAX_RESPONSE_BYTES):
+    return max(1, min(MAX_PAIRS_PER_QUERY, max_bytes // estimated_bytes_per_day()))
+
+
+def chunk_pairs(pairs, max_bytes=MAX_RESPONSE_BYTES):
+    """
+    Split (hall, date) pairs into chunks whose combined response should stay
+    under `max_bytes`. Pairs are ordered by date, then hall, so a chunk covers
+    every hall for a contiguous span of dates.
+    """
+    ordered = sorted(set(pairs), key=lambda p: (p[1], p[0]))
+    size = pairs_per_chunk(max_bytes)
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def build_query(pairs):
+    """
+    Build one aliased query for the given (hall, date) pairs.
+    Returns (payload, alias_map) where alias_map is
+    {hall_alias: (hall, {date_alias: date})}.
+    """
+    halls = {}
+    for hall, day in pairs:
+        halls.setdefault(hall, [])
+        if day not in halls[hall]:
+            halls[hall].append(day)
+
+    date_aliases = {}
+    for day in sorted({day for _, day in pairs}):
+        date_aliases[day] = f"d{len(date_aliases)}"
+
+    variables = {}
+    var_defs = []
+    blocks = []
+    alias_map = {}
+
+    for h_index, (hall, days) in enumerate(halls.items()):
+        h_alias = f"h{h_index}"
+        variables[h_alias] = hall
+        var_defs.append(f"${h_alias}: String!")
+
+        menus = []
+        for day in days:
+            d_alias = date_aliases[day]
+            menus.append(f"    {d_alias}: dailyMenu(date: ${d_alias}) {{{MENU_FIELDS}    }}")
+        blocks.append(f"  {h_alias}: diningCourtByName(name: ${h_alias}) {{\n    name\n" + "\n".join(menus) + "\n  }")
+        alias_map[h_alias] = (hall, {date_aliases[day]: day for day in days})
+
+    for day, d_alias in date_aliases.items():
+        variables[d_alias] = day
+        var_defs.append(f"${d_alias}: Date!")
+
+    query = f"query getMenus({', '.join(var_defs)}) {{\n" + "\n".join(blocks) + "\n}\n"
+    payload = {"operationName": "getMenus", "variables": variables, "query": query}
+    return payload, alias_map
+
+
+def _errored(errors, h_alias, d_alias):
+    """True if a GraphQL error covers this alias (errors without a path cover everything)."""
+    for error in errors:
+        path = (error or {}).get("path") or []
+        if not path or (path[0] == h_alias and (len(path) == 1 or path[1] == d_alias)):
+            return True
+    return False
+
+
+def split_response(data, alias_map):
+    """
+    Turn a combined response back into {(hall, date): court}, where each
+    court has the same shape as a single `diningCourtByName` result.
+    A null menu is a closed hall unless an error covers its alias; then
+    (like a missing court) it comes back as None, i.e. a failed fetch.
+    """
+    root = (data or {}).get("data") or {}
+    errors = (data or {}).get("errors") or []
+    courts = {}
+    for h_alias, (hall, days) in alias_map.items():
+        court = root.get(h_alias)
+        for d_alias, day in days.items():
+            if not court or (court.get(d_alias) is None and _errored(errors, h_alias, d_alias)):
+                courts[(hall, day)] = None
+                continue
+            courts[(hall, day)] = {"name": court.get("name"), "dailyMenu": court.get(d_alias)}
+    return courts
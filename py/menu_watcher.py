@@ -0,0 +1,191 @@
+print("--- MENU WATCHER (DAEMON) ---")
+
+import argparse
+import hashlib
+import json
+import signal
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import dish_identity
+import metrics
+import upload_menus
+from dish_tags import tag_many
+from firestore_sink import FirestoreSink
+import hall_days
+from hall_days import DAYS_COLLECTION, build_day, day_path, hall_scores
+from menu_fetcher import court_meals, fetch_courts
+from read_models import rebuild as rebuild_read_models
+from write_manifest import WriteManifest
+
+# One warm process instead of a cron job per refresh: the Firebase client,
+# HTTP session and write manifest stay loaded between polls. Each poll fetches
+# today's and tomorrow's menus, hashes every hall/meal, and only halls with a
+# changed meal are uploaded. Polls are frequent around meal times and sparse
+# in between, so a mid-day substitution shows up within minutes while an
+# unchanged menu costs one GraphQL request per poll and no writes.
+
+# 1. SETUP FIREBASE (shared with upload_menus)
+db = upload_menus.db
+
+# 2. CONFIG
+ACTIVE_INTERVAL = 5 * 60     # seconds between polls during (and just before) a meal
+IDLE_INTERVAL = 60 * 60      # seconds between polls otherwise
+LEAD_MINUTES = 30            # start polling often this long before a meal opens
+MIN_DELAY = 30               # never poll faster than this, whatever the schedule says
+RETRY_DELAY = 60             # after a failed poll
+
+# 3. CHANGE DETECTION
+def meal_hash(meal):
+    """Hash of one meal's times, stations and items, independent of item order."""
+    normalized = {
+        "startTime": upload_menus.clean_time(meal.get("startTime")),
+        "endTime": upload_menus.clean_time(meal.get("endTime")),
+        "stations": sorted(
+            (station.get("name") or "", sorted(e["item"]["name"] for e in station.get("items", []) if e.get("item")))
+            for station in meal.get("stations", [])
+        ),
+    }
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+def court_hashes(court):
+    return {meal.get("name") or "": meal_hash(meal) for meal in court_meals(court)}
+
+def meal_windows(courts, day):
+    """[(start, end) datetimes] of every meal in the given courts."""
+    windows = []
+    for court in courts:
+        for meal in court_meals(court):
+            start, end = upload_menus.clean_time(meal.get("startTime")), upload_menus.clean_time(meal.get("endTime"))
+            if start and end:
+                windows.append((datetime.combine(day, datetime.strptime(start, "%H:%M").time()),
+                                datetime.combine(day, datetime.strptime(end, "%H:%M").time())))
+    return windows
+
+def next_delay(windows, now=None):
+    """Seconds until the next poll: ACTIVE_INTERVAL inside a meal window, else up to the next one."""
+    now = now or datetime.now()
+    lead = timedelta(minutes=LEAD_MINUTES)
+    if any(start - lead <= now <= end for start, end in windows):
+        return ACTIVE_INTERVAL
+    # Wake up for the next meal, or just after midnight when "today" rolls over
+    wake = [start - lead for start, _ in windows if start - lead > now]
+    wake.append(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) + timedelta(minutes=5))
+    seconds = min(IDLE_INTERVAL, min((w - now).total_seconds() for w in wake))
+    return max(MIN_DELAY, seconds)
+
+# 4. WATCHER
+class MenuWatcher:
+    def __init__(self, halls=None, full=False, read_models=True):
+        self.halls = list(halls or upload_menus.HALL_MAPPING)
+        self.manifest = WriteManifest(full=full)
+        self.read_models = read_models
+        self.hashes = {}    # (hall, "YYYY-MM-DD") -> {meal name: hash}
+        self.polls = 0
+        self.windows = []
+
+    def diff(self, hall, day, court):
+        """New meal hashes for this hall-day if any meal changed since the last push, else None."""
+        hashes = court_hashes(court)
+        previous = self.hashes.get((hall, day))
+        if previous == hashes:
+            return None
+        previous = previous or {}
+        moved = sorted(name for name in set(hashes) | set(previous) if hashes.get(name) != previous.get(name))
+        print(f"   🔄 {hall} {day}: {', '.join(moved) or 'closed'} changed")
+        return hashes
+
+    def upload_future_day(self, hall, day, dishes, sink):
+        """Tomorrow only gets its day document; dish docs change when it's served."""
+        hall_ref = db.collection("diningHalls").document(upload_menus.HALL_MAPPING[hall])
+        tags = tag_many(dish["name"] for dish in dishes)
+        entries = [(d["mealInfo"], d["station"], dish_identity.dish_id(d["name"]), d["name"], tags[d["name"]]) for d in dishes]
+        doc = build_day(hall, day, entries, hall_scores(db, hall_ref, (e[2] for e in entries)))
+        key = day_path(hall_ref.id, day)
+        if self.manifest.changed(key, doc):
+            sink.set(hall_ref.collection(DAYS_COLLECTION).document(day), doc, merge=False, manifest_key=key)
+
+    def poll(self):
+        """One fetch/compare/upload cycle. Returns the number of documents written."""
+        today = date.today()
+        days = [today.strftime("%Y-%m-%d"), (today + timedelta(days=1)).strftime("%Y-%m-%d")]
+        self.polls += 1
+        self.hashes = {key: h for key, h in self.hashes.items() if key[1] in days}
+        metrics.incr("watcher_polls")
+        with metrics.timer("watcher_fetch"):
+            courts = fetch_courts(((hall, day) for day in days for hall in self.halls), use_cache=False)
+        self.windows = meal_windows((courts.get((hall, days[0])) for hall in self.halls), today)
+
+        # Failed fetches (None) are skipped, so the next poll retries them
+        changed = {}
+        for day in days:
+            for hall in self.halls:
+                court = courts.get((hall, day))
+                hashes = self.diff(hall, day, court) if court is not None else None
+                if hashes is not None:
+                    changed[(hall, day)] = hashes
+        metrics.incr("watcher_changed_hall_days", len(changed))
+        if not changed:
+            return 0
+
+        sink = FirestoreSink(db, self.manifest, verbose=False)
+        # Scores may have moved since the last poll and both day docs copy them;
+        # only the changed menus' dishes are re-read
+        hall_days.forget()
+        for hall, day in changed:
+            dishes = upload_menus.parse_dishes(courts[(hall, day)])
+            if day != days[0]:
+                self.upload_future_day(hall, day, dishes, sink)
+            elif dishes:
+                upload_menus.upload_dishes(hall, dishes, self.manifest, sink)
+        stats = sink.close()
+        if stats["writes"] and self.read_models:
+            rebuild_read_models(self.manifest, changed=sink.committed_paths)
+        dish_identity.save()
+        self.manifest.save()
+        # Hashes only advance once everything is written; otherwise the next poll pushes again
+        if not stats["failed_writes"]:
+            self.hashes.update(changed)
+            # --full covers the first push only; later polls skip unchanged docs again
+            self.manifest.full = False
+        print(f"   📝 {len(changed)} hall-day(s) changed: {stats['writes']} written, {stats['failed_writes']} failed")
+        return stats["writes"]
+
+    def run(self, stop, interval=None):
+        """Poll until `stop` is set. Counters accumulate; menu_watcher.prom is refreshed every poll."""
+        run_started = time.time()
+        while not stop.is_set():
+            started = time.time()
+            ok = True
+            try:
+                written = self.poll()
+                delay = interval or next_delay(self.windows)
+            except Exception as e:
+                print(f"   ❌ Poll failed: {e}")
+                metrics.incr("watcher_poll_errors")
+                ok, written, delay = False, 0, RETRY_DELAY
+            metrics.write_prometheus("menu_watcher", run_started, ok)
+            print(f"🕒 Poll #{self.polls} done in {time.time() - started:.1f}s ({written} writes), "
+                  f"next in {delay / 60:.1f} min")
+            stop.wait(delay)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep dining court menus in sync, writing only when they change.")
+    parser.add_argument("--once", action="store_true", help="poll once and exit")
+    parser.add_argument("--interval", type=float, help="fixed seconds between polls instead of the meal-time schedule")
+    parser.add_argument("--full", action="store_true", help="ignore the write manifest until the first successful upload")
+    parser.add_argument("--skip-read-models", action="store_true", help="don't rebuild the readModels documents after changes")
+    args = parser.parse_args()
+
+    watcher = MenuWatcher(full=args.full, read_models=not args.skip_read_models)
+    with metrics.run("menu_watcher"):
+        if args.once:
+            watcher.poll()
+        else:
+            stop = threading.Event()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.set())
+            print(f"👀 Watching {len(watcher.halls)} halls (Ctrl+C to stop)...")
+            watcher.run(stop, args.interval)
+            print("👋 Watcher stopped.")
@@ -0,0 +1,184 @@
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+# Process-wide timers and counters for the uploaders.
+# Fetchers, parsers, the tagger and FirestoreSink record into one registry;
+# each script wraps its main in `with metrics.run("<script>"):`, which writes
+# a JSON run report and a Prometheus textfile (node_exporter textfile
+# collector format) when the run ends, even if it fails.
+#
+#   APERO_METRICS_DIR   where reports go (default py/.cache/metrics)
+#   APERO_PROFILE       "cpu" (cProfile) or "memory" (tracemalloc) for this run
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.environ.get("APERO_METRICS_DIR", os.path.join(current_dir, ".cache", "metrics"))
+PROFILE = os.environ.get("APERO_PROFILE", "").lower()
+PROFILE_TOP = 25
+
+_lock = threading.Lock()
+_counters = {}   # name -> number
+_timers = {}     # name -> [count, total seconds, max seconds]
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, seconds):
+    with _lock:
+        entry = _timers.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+@contextlib.contextmanager
+def timer(name):
+    """Time a block into `name` (works in threads and coroutines alike)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "timers": {name: {"count": c, "seconds": round(total, 6), "max_seconds": round(peak, 6)}
+                       for name, (c, total, peak) in _timers.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+# --- export ---
+def _prom_name(name):
+    return "apero_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def prometheus_text(script, report):
+    label = f'{{script="{script}"}}'
+    lines = []
+    for name, value in sorted(report["counters"].items()):
+        metric = _prom_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric}{label} {value}"]
+    for name, t in sorted(report["timers"].items()):
+        metric = _prom_name(name) + "_seconds"
+        lines += [f"# TYPE {metric} summary",
+                  f"{metric}_count{label} {t['count']}",
+                  f"{metric}_sum{label} {t['seconds']}"]
+        lines += [f"# TYPE {metric}_max gauge", f"{metric}_max{label} {t['max_seconds']}"]
+    lines += [
+        "# TYPE apero_run_duration_seconds gauge",
+        f"apero_run_duration_seconds{label} {report['duration_seconds']}",
+        "# TYPE apero_run_success gauge",
+        f"apero_run_success{label} {int(report['ok'])}",
+        "# TYPE apero_run_finished_timestamp_seconds gauge",
+        f"apero_run_finished_timestamp_seconds{label} {int(report['finished_at'])}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_reports(script, report, directory=METRICS_DIR):
+    """Write <script>-<timestamp>.json and <script>.prom; return the JSON path."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.fromtimestamp(report["started_at"]).strftime("%Y%m%d-%H%M%S")
+    json_path = os.path.join(directory, f"{script}-{stamp}.json")
+    _write_atomic(json_path, json.dumps(report, indent=2))
+    _write_atomic(os.path.join(directory, f"{script}.prom"), prometheus_text(script, report))
+    return json_path
+
+
+def write_prometheus(script, started, ok=True, directory=METRICS_DIR):
+    """Refresh <script>.prom mid-run, for long-running processes (menu_watcher)."""
+    now = time.time()
+    report = {"ok": ok, "finished_at": now, "duration_seconds": round(now - started, 3), **snapshot()}
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, f"{script}.prom"), prometheus_text(script, report))
+
+
+# --- profiling hook ---
+class _Profiler:
+    def __init__(self, mode, script, directory):
+        self.mode = mode
+        self.path = os.path.join(directory, f"{script}.pstats")
+        self.profile = None
+
+    def start(self):
+        if self.mode == "cpu":
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif self.mode == "memory":
+            import tracemalloc
+            tracemalloc.start(25)
+
+    def stop(self):
+        """Stop profiling and return a summary for the run report."""
+        if self.mode == "cpu":
+            import io
+            import pstats
+            self.profile.disable()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.profile.dump_stats(self.path)
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            return {"mode": "cpu", "pstats": self.path, "top": out.getvalue().splitlines()}
+        if self.mode == "memory":
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+            tracemalloc.stop()
+            return {"mode": "memory", "current_bytes": current, "peak_bytes": peak,
+                    "top": [str(stat) for stat in top]}
+        return None
+
+
+@contextlib.contextmanager
+def run(script, directory=METRICS_DIR, profile=PROFILE):
+    """Collect metrics for one script run and export them when it ends."""
+    reset()
+    profiler = _Profiler(profile, script, directory) if profile in ("cpu", "memory") else None
+    if profiler:
+        profiler.start()
+    started = time.time()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        report = {
+            "script": script,
+            "host": socket.gethostname(),
+            "ok": ok,
+            "started_at": started,
+            "finished_at": time.time(),
+            "duration_seconds": round(time.time() - started, 3),
+            **snapshot(),
+        }
+        if profiler:
+            report["profile"] = profiler.stop()
+        try:
+            path = write_reports(script, report, directory)
+            print(f"📈 Run report: {path}")
+        except OSError as e:
+            print(f"⚠️ Could not write run report: {e}")
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+# Per-URL validators for conditional GETs on the retail pages.
+# Remembers ETag / Last-Modified and a hash of the body, plus whatever the
+# scraper extracted last time, so an unchanged page (304 or same hash) is
+# skipped before any parsing or writing.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PAGE_CACHE_PATH = os.environ.get("APERO_PAGE_CACHE", os.path.join(current_dir, ".cache", "retail_pages.json"))
+
+
+def content_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+class PageCache:
+    def __init__(self, path=PAGE_CACHE_PATH, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.pages = {}
+        if enabled and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.pages = json.load(f)
+
+    def request_headers(self, url):
+        """If-None-Match / If-Modified-Since for a URL we've seen before."""
+        entry = self.pages.get(url) if self.enabled else None
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def unchanged(self, url, response):
+        """True if the server said 304 or the body hashes the same as last time."""
+        if not self.enabled or url not in self.pages:
+            return False
+        if response.status_code == 304:
+            return True
+        return self.pages[url].get("hash") == content_hash(response.content)
+
+    def extracted(self, url):
+        return (self.pages.get(url) or {}).get("extracted")
+
+    def remember(self, url, response, extracted):
+        self.pages[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "hash": content_hash(response.content),
+            "extracted": extracted,
+        }
+
+    def clear(self):
+        self.pages = {}
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.pages, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
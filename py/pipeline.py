@@ -0,0 +1,118 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Small streaming pipeline: stages run in their own threads and are joined
+# by bounded queues, so fetching, parsing, tagging and writing overlap while
+# memory stays flat. A slow stage fills the queue in front of it, which
+# blocks the stage before it, and so on back to the source (backpressure).
+#
+#   results = Pipeline("history").add("fetch", fetch).add("write", write).run(units)
+#
+# A stage is a function that takes an iterator and yields outputs. Waiting
+# time is recorded as pipeline_<stage>_blocked_seconds (downstream full)
+# and pipeline_<stage>_starved_seconds (upstream empty), always under the
+# stage that waited; the caller reading the results counts as "output".
+
+QUEUE_SIZE = 8
+POLL = 0.1
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+class Pipeline:
+    def __init__(self, name, maxsize=QUEUE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.stages = []
+        self.stop = threading.Event()
+
+    def add(self, stage_name, fn):
+        self.stages.append((stage_name, fn))
+        return self
+
+    def _put(self, q, item, stage_name):
+        started = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=POLL)
+                break
+            except queue.Full:
+                continue
+        metrics.incr(f"pipeline_{stage_name}_blocked_seconds", time.perf_counter() - started)
+
+    def _iter(self, q, consumer_name):
+        while True:
+            started = time.perf_counter()
+            while True:
+                try:
+                    item = q.get(timeout=POLL)
+                    break
+                except queue.Empty:
+                    if self.stop.is_set():
+                        return
+            metrics.incr(f"pipeline_{consumer_name}_starved_seconds", time.perf_counter() - started)
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+
+    def _run_stage(self, stage_name, fn, items, out):
+        try:
+            for result in fn(items):
+                if self.stop.is_set():
+                    return
+                self._put(out, result, stage_name)
+            self._put(out, _DONE, stage_name)
+        except BaseException as e:
+            self._put(out, _Failed(e), stage_name)
+
+    def run(self, source):
+        """Start every stage and yield what the last one produces."""
+        items = iter(source)
+        threads = []
+        consumers = [name for name, _ in self.stages[1:]] + ["output"]
+        for (stage_name, fn), consumer_name in zip(self.stages, consumers):
+            out = queue.Queue(maxsize=self.maxsize)
+            thread = threading.Thread(target=self._run_stage, args=(stage_name, fn, items, out),
+                                      name=f"{self.name}-{stage_name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+            # Time spent waiting on this queue is the next stage's starvation
+            items = self._iter(out, consumer_name)
+        try:
+            yield from items
+        finally:
+            # Stop upstream threads if the caller bailed out or a stage failed
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def consume(self, source):
+        """Run to completion, discarding the output."""
+        for _ in self.run(source):
+            pass
+
+
+def ordered_map(fn, items, workers):
+    """Like map() over a thread pool, keeping at most `workers` calls in flight, in order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ahead = deque()
+        for item in items:
+            ahead.append((item, pool.submit(fn, item)))
+            if len(ahead) >= workers:
+                item, future = ahead.popleft()
+                yield item, future.result()
+        while ahead:
+            item, future = ahead.popleft()
+            yield item, future.result()
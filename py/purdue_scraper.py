@@ -1,62 +1,13 @@
-import requests
 from datetime import date
 
-GRAPHQL_URL = "https://api.hfs.purdue.edu/menus/v3/GraphQL"
-
-QUERY = """
-query getLocationMenu($name: String!, $date: Date!) {
-  diningCourtByName(name: $name) {
-    name
-    dailyMenu(date: $date) {
-      meals {
-        name
-        stations {
-          name
-          items {
-            item {
-              name
-            }
-          }
-        }
-      }
-    }
-  }
-}
-"""
+from menu_fetcher import fetch_courts, court_meals
 
 DINING_COURTS = ["Ford", "Wiley", "Earhart", "Hillenbrand", "Windsor"]
 
-def fetch_menu(location: str, day=None):
-    """Fetch menu grouped by Meal → Station → Items."""
-    if day is None:
-        day = date.today().strftime("%Y-%m-%d")
-
-    payload = {
-        "operationName": "getLocationMenu",
-        "variables": {"name": location, "date": day},
-        "query": QUERY
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "Origin": "https://dining.purdue.edu",
-        "Referer": "https://dining.purdue.edu/",
-        "User-Agent": "Mozilla/5.0"
-    }
-
-    try:
-        resp = requests.post(GRAPHQL_URL, json=payload, headers=headers, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as e:
-        print(f"[!] Error fetching {location}: {e}")
-        return {}
-
-    court_data = data.get("data", {}).get("diningCourtByName", {})
-    meals = court_data.get("dailyMenu", {}).get("meals", [])
-
+def structure_menu(court):
+    """Group a raw court payload by Meal → Station → Items."""
     structured = {}
-    for meal in meals:
+    for meal in court_meals(court):
         meal_name = meal.get("name")
         structured[meal_name] = {}
         for station in meal.get("stations", []):
@@ -67,12 +18,26 @@ def fetch_menu(location: str, day=None):
     return structured
 
 
+def fetch_menus(locations, day=None):
+    """Fetch menus for several courts concurrently: {location: menu}."""
+    if day is None:
+        day = date.today().strftime("%Y-%m-%d")
+    courts = fetch_courts((loc, day) for loc in locations)
+    return {loc: structure_menu(courts[(loc, day)]) for loc in locations}
+
+
+def fetch_menu(location: str, day=None):
+    """Fetch menu grouped by Meal → Station → Items."""
+    return fetch_menus([location], day)[location]
+
+
 def main():
     today = date.today().strftime("%Y-%m-%d")
     print(f"\n🍽 Purdue Dining Menus for {today}\n")
 
+    menus = fetch_menus(DINING_COURTS, today)
     for court in DINING_COURTS:
-        menu = fetch_menu(court, today)
+        menu = menus[court]
         if not menu:
             print(f"== {court} Dining Court ==\n  [No data found]\n")
             continue
@@ -0,0 +1,253 @@
+print("--- DISH RATING ENGINE ---")
+
+import argparse
+import json
+import math
+import os
+from datetime import datetime
+
+import metrics
+from firebase_client import get_db
+from firestore_sink import FirestoreSink
+from hall_days import GET_ALL_CHUNK
+from read_models import rebuild as rebuild_read_models
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Recomputes every compared dish's `score` from users/{uid}/comparisons in
+# one batch, instead of each client nudging two scores in a transaction.
+#
+# The model is a Bradley-Terry fit (strength p_i, P(i beats j) = p_i / (p_i + p_j))
+# solved with the MM iteration, vectorized over all comparison events. Every
+# dish also plays PRIOR_GAMES virtual games against a fixed 1000-rated anchor,
+# so unbeaten dishes stay finite and thinly compared ones stay near 1000.
+# Strengths are reported on the familiar Elo scale: 1000 + 400 * log10(p_i).
+# The fit is order-independent, so the same comparisons always give the same
+# ranking.
+#
+# Runs are incremental: only comparisons at or after the stored watermark are
+# read (re-saved comparison docs replace their earlier result), the fit is
+# warm-started from the last strengths, and only scores that moved are written.
+# Dish documents are read only for dishes in the new comparisons and for the
+# scores about to be written (get_all); the rest come from the scores
+# remembered in the state. --full (and comparisons that carry only dish IDs)
+# scan every dish instead. Needs a collection-group index exemption on
+# comparisons.timestamp.
+
+# 1. SETUP FIREBASE
+db = get_db()
+
+# 2. CONFIG
+current_dir = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.environ.get("APERO_RATINGS_STATE", os.path.join(current_dir, ".cache", "ratings_state.json"))
+BASE_SCORE = 1000
+PRIOR_GAMES = 2          # virtual games (one win, one loss) against the anchor
+MAX_ITERATIONS = 10000
+TOLERANCE = 1e-10        # max change in log-strength between iterations (MM converges slowly)
+MIN_CHANGE = 0.05        # score changes smaller than this are not written
+
+# 3. STATE
+class RatingState:
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.watermark = None   # ISO timestamp of the newest comparison read
+        self.events = {}        # comparison doc path -> [winner dish path, loser dish path]
+        self.strengths = {}     # dish path -> last fitted strength (warm start)
+        self.scores = {}        # dish path -> score last read or written (None if unscored)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.watermark = data.get("watermark")
+            self.events = data.get("events", {})
+            self.strengths = data.get("strengths", {})
+            self.scores = data.get("scores", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark, "events": self.events, "strengths": self.strengths,
+                       "scores": self.scores}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+# 4. MODEL
+def fit(n, winners, losers, init=None, prior=PRIOR_GAMES, iterations=MAX_ITERATIONS, tol=TOLERANCE):
+    """
+    Bradley-Terry fit for dishes 0..n-1 from parallel winner/loser index lists.
+    Returns (Elo-scale scores, raw strengths), both as lists.
+    """
+    if np is None:
+        return _fit_python(n, winners, losers, init, prior, iterations, tol)
+    winners, losers = np.asarray(winners, dtype=np.int64), np.asarray(losers, dtype=np.int64)
+    wins = np.bincount(winners, minlength=n) + prior / 2
+    p = np.ones(n) if init is None else np.asarray(init, dtype=float)
+    for _ in range(iterations):
+        per_game = 1.0 / (p[winners] + p[losers])
+        games = np.bincount(winners, per_game, n) + np.bincount(losers, per_game, n)
+        updated = wins / (games + prior / (p + 1.0))
+        converged = np.max(np.abs(np.log(updated / p)), initial=0.0) < tol
+        p = updated
+        if converged:
+            break
+    return (BASE_SCORE + 400 * np.log10(p)).tolist(), p.tolist()
+
+def _fit_python(n, winners, losers, init, prior, iterations, tol):
+    wins = [prior / 2] * n
+    for w in winners:
+        wins[w] += 1
+    p = [1.0] * n if init is None else list(init)
+    for _ in range(iterations):
+        games = [0.0] * n
+        for w, l in zip(winners, losers):
+            share = 1.0 / (p[w] + p[l])
+            games[w] += share
+            games[l] += share
+        updated = [wins[i] / (games[i] + prior / (p[i] + 1.0)) for i in range(n)]
+        converged = max((abs(math.log(u / q)) for u, q in zip(updated, p)), default=0.0) < tol
+        p = updated
+        if converged:
+            break
+    return [BASE_SCORE + 400 * math.log10(x) for x in p], p
+
+# 5. LOAD, FIT, WRITE
+def _timestamp(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def read_comparisons(state, full=False):
+    """New/changed comparison docs since the watermark: {doc path: (winner id or path, loser id or path)}."""
+    query = db.collection_group("comparisons")
+    if state.watermark and not full:
+        # >= so comparisons sharing the watermark's timestamp are never missed
+        query = query.where("timestamp", ">=", datetime.fromisoformat(state.watermark))
+    fresh = {}
+    newest = state.watermark
+    with metrics.timer("ratings_read"):
+        for snap in query.stream():
+            data = snap.to_dict() or {}
+            winner = data.get("winnerPath") or data.get("winnerId")
+            loser = data.get("loserPath") or data.get("loserId")
+            if winner and loser and winner != loser:
+                fresh[snap.reference.path] = (winner, loser)
+            if data.get("timestamp") is not None:
+                stamp = _timestamp(data["timestamp"])
+                newest = max(newest or stamp, stamp)
+    metrics.incr("ratings_comparisons_read", len(fresh))
+    return fresh, newest
+
+def read_scores(paths):
+    """{dish path: score} for the given dishes that still exist, in get_all() chunks."""
+    paths = sorted(set(paths))
+    scores = {}
+    for i in range(0, len(paths), GET_ALL_CHUNK):
+        for snap in db.get_all([db.document(p) for p in paths[i:i + GET_ALL_CHUNK]]):
+            if snap.exists:
+                scores[snap.reference.path] = (snap.to_dict() or {}).get("score")
+    metrics.incr("ratings_dishes_read", len(paths))
+    return scores
+
+def recompute(full=False, dry_run=False, read_models=True):
+    state = RatingState()
+    if full:
+        state.events, state.strengths, state.scores = {}, {}, {}
+
+    print("📡 Reading comparisons" + (f" since {state.watermark}..." if state.watermark and not full else "..."))
+    fresh, newest = read_comparisons(state, full)
+    print(f"   🆕 {len(fresh)} new or updated comparisons")
+
+    paths_by_id = {}
+    scanned = full or any("/" not in ref for pair in fresh.values() for ref in pair)
+    if scanned:
+        # A full refit, or old comparisons that carry only IDs: the whole catalog is needed
+        print("📡 Reading current dish scores...")
+        current = {}
+        for snap in db.collection_group("dishes").stream():
+            path = snap.reference.path
+            current[path] = (snap.to_dict() or {}).get("score")
+            paths_by_id.setdefault(snap.id, []).append(path)
+    else:
+        # Dishes in new comparisons are read; the others keep their remembered scores
+        new_dishes = {ref for pair in fresh.values() for ref in pair}
+        known = {path for pair in state.events.values() for path in pair} - new_dishes
+        read_now = new_dishes | {path for path in known if path not in state.scores}
+        current = {path: state.scores[path] for path in known if path in state.scores}
+        current.update(read_scores(read_now))
+
+    # Older comparisons only carry dish IDs; resolve them when the ID is unambiguous
+    unresolved = 0
+    for doc_path, pair in fresh.items():
+        resolved = []
+        for ref in pair:
+            if "/" in ref:
+                resolved.append(ref)
+            elif len(paths_by_id.get(ref, ())) == 1:
+                resolved.append(paths_by_id[ref][0])
+        if len(resolved) == 2:
+            state.events[doc_path] = resolved
+        else:
+            state.events.pop(doc_path, None)
+            unresolved += 1
+    metrics.incr("ratings_unresolved", unresolved)
+
+    # Dishes that no longer exist (deleted or merged) drop out of the fit
+    events = [pair for pair in state.events.values() if pair[0] in current and pair[1] in current]
+    dishes = sorted({path for pair in events for path in pair})
+    index = {path: i for i, path in enumerate(dishes)}
+    winners = [index[w] for w, _ in events]
+    losers = [index[l] for _, l in events]
+
+    with metrics.timer("ratings_fit"):
+        scores, strengths = fit(len(dishes), winners, losers, init=[state.strengths.get(p, 1.0) for p in dishes])
+    print(f"   🧮 Fitted {len(dishes)} dishes from {len(events)} comparisons"
+          + (f" ({unresolved} ambiguous/unknown skipped)" if unresolved else ""))
+
+    changed = {path: round(score, 2) for path, score in zip(dishes, scores)
+               if not isinstance(current[path], (int, float)) or abs(current[path] - score) >= MIN_CHANGE}
+    metrics.incr("ratings_scores_changed", len(changed))
+    for path, score in sorted(changed.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"   🏅 {score:7.1f}  {path}")
+    if dry_run:
+        print(f"\n🔎 Dry run: {len(changed)} scores would change.")
+        return changed
+
+    if not scanned:
+        # Remembered scores may be stale, and dishes may have been deleted since
+        unread = [path for path in changed if path not in read_now]
+        stored = read_scores(unread)
+        for path in unread:
+            if path not in stored:
+                current.pop(path)
+                changed.pop(path)
+            else:
+                current[path] = stored[path]
+                if isinstance(stored[path], (int, float)) and abs(stored[path] - changed[path]) < MIN_CHANGE:
+                    changed.pop(path)
+    sink = FirestoreSink(db, verbose=False)
+    for path, score in changed.items():
+        # merge=True: a dish deleted meanwhile doesn't fail the whole batch (NOT_FOUND)
+        sink.set(db.document(path), {"score": score})
+    stats = sink.close()
+    if stats["failed_writes"]:
+        # Keep the old watermark so the next run reads these comparisons again
+        print(f"   ⚠️ {stats['failed_writes']} score writes failed; watermark not advanced.")
+    else:
+        state.watermark = newest
+        state.strengths = dict(zip(dishes, strengths))
+        state.scores = {path: changed.get(path, current[path]) for path in dishes if path in current}
+        state.save()
+    if read_models and stats["writes"]:
+        rebuild_read_models(changed=sink.committed_paths)
+    print(f"\n✨ Ratings updated: {stats['writes']} scores written, {stats['failed_writes']} failed.")
+    return changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute dish scores from every user comparison.")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and refit from all comparisons")
+    parser.add_argument("--dry-run", action="store_true", help="fit and report, but don't write scores")
+    parser.add_argument("--skip-read-models", action="store_true", help="don't rebuild the readModels documents afterwards")
+    args = parser.parse_args()
+
+    with metrics.run("ratings"):
+        recompute(full=args.full, dry_run=args.dry_run, read_models=not args.skip_read_models)
@@ -0,0 +1,322 @@
+import argparse
+import heapq
+import json
+import os
+from datetime import date, timedelta
+
+import metrics
+from dish_tags import load_tag_table
+from firebase_client import firestore, get_db
+from firestore_sink import FirestoreSink
+from hall_days import GET_ALL_CHUNK, hall_served, last_served, sync_scores
+from search_index import build as build_search_index
+from write_manifest import WriteManifest, update_json
+
+# Precomputed documents the app reads instead of scanning collectionGroup('dishes').
+#
+#   readModels/pulse                        top dishes by score (HomeScreen)
+#   readModels/comparisonPool               header: {shards, count, version}
+#   readModels/comparisonPool/shards/{n}    {"dishes": [...]}  (ComparisonScreen)
+#   readModels/searchCatalog                header
+#   readModels/searchCatalog/shards/{n}     {"dishes": [...]}  (TasteDNAScreen)
+#   readModels/searchIndex                  header: {keys, sizes, count, revision, version}
+#   readModels/searchIndex/shards/{ngram}   {"dishes": [...]}  (SearchScreen, see search_index.py)
+#   readModels/mood-{tag}                   top dishes for one mood tag (MoodResultsScreen)
+#
+# Shards are written before their header, so a client that reads the header
+# first never sees a shard count larger than what exists.
+#
+# The models are built from a local snapshot of the fields they use from
+# every dish document (DISHES_PATH). Uploaders and ratings pass the paths
+# they just wrote, and only those documents are re-read; writers that don't
+# rebuild fold theirs in with refresh_dishes(). Dishes written from
+# elsewhere (the app, one-off scripts) are picked up by `--full`, which
+# rescans collectionGroup('dishes') and replaces the snapshot.
+
+# 1. SETUP FIREBASE
+db = get_db()
+
+# 2. CONFIG
+COLLECTION = "readModels"
+VERSION = 1
+PULSE_SIZE = 150
+MOOD_TOP_K = 50
+MOOD_WINDOW_DAYS = 14          # dining hall dishes must have been served this recently
+MAX_SHARD_BYTES = 800 * 1024   # Firestore's hard limit is 1 MiB per document
+ENTRY_OVERHEAD = 64            # per-entry slack for Firestore's map encoding
+SNAPSHOT_FIELDS = ("name", "score", "category", "tags", "mealsServed", "locationName", "locations",
+                   "averageRating", "lastServedDate")
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DISHES_PATH = os.environ.get("APERO_READ_MODEL_DISHES", os.path.join(current_dir, ".cache", "read_model_dishes.json"))
+
+# 3. ENTRY SHAPES (only the fields each screen actually renders)
+def dish_location(path):
+    """diningHalls/ford/dishes/x -> ("diningHalls", "ford")"""
+    parts = path.split("/")
+    return (parts[-4], parts[-3]) if len(parts) >= 4 else (None, None)
+
+def base_entry(path, data):
+    parent_collection, parent_id = dish_location(path)
+    return {
+        "id": path.rsplit("/", 1)[-1],
+        "name": data.get("name", ""),
+        "parentId": parent_id,
+        "parentCollection": parent_collection,
+    }
+
+def pulse_entry(path, data, location_names):
+    entry = base_entry(path, data)
+    entry.update({
+        "score": data.get("score"),
+        "category": data.get("category"),
+        "tags": data.get("tags") or [],
+        "mealsServed": data.get("mealsServed") or [],
+        "locationName": data.get("locationName") or location_names.get(entry["parentId"], "Unknown Location"),
+    })
+    return entry
+
+def comparison_entry(path, data):
+    entry = base_entry(path, data)
+    entry.update({"score": data.get("score"), "dishPath": path})
+    return entry
+
+def search_entry(path, data):
+    entry = base_entry(path, data)
+    entry.update({
+        "category": data.get("category") or "diningHall",
+        "locations": data.get("locations") or [entry["parentId"] or "Unknown"],
+        "score": data.get("score"),
+        "tags": data.get("tags") or [],
+    })
+    return entry
+
+def mood_entry(path, data, served_date=None):
+    entry = base_entry(path, data)
+    entry.update({
+        "averageRating": data.get("averageRating"),
+        "score": data.get("score"),
+        "lastServedDate": served_date or data.get("lastServedDate"),
+    })
+    return entry
+
+def mood_rank(entry):
+    rating, score = entry["averageRating"], entry["score"]
+    return (rating if _is_number(rating) else 0, score if _is_number(score) else 0)
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# 4. SHARDING
+def entry_bytes(entry):
+    return len(json.dumps(entry, separators=(",", ":"), default=str).encode("utf-8")) + ENTRY_OVERHEAD
+
+def shard_entries(entries, max_bytes=MAX_SHARD_BYTES):
+    """Pack entries, in order, into lists whose encoded size stays under max_bytes."""
+    shards, current, size = [], [], 0
+    for entry in entries:
+        nbytes = entry_bytes(entry)
+        if current and size + nbytes > max_bytes:
+            shards.append(current)
+            current, size = [], 0
+        current.append(entry)
+        size += nbytes
+    if current or not shards:
+        shards.append(current)
+    return shards
+
+# 5. BUILD & WRITE
+def _fields(data):
+    return {field: data[field] for field in SNAPSHOT_FIELDS if field in data}
+
+def load_dishes(changed=(), full=False):
+    """
+    {dish path: fields} for every dish, from the local snapshot. Only the
+    `changed` dish documents are read (get_all); a missing snapshot or `full`
+    means one collectionGroup scan that replaces it.
+    """
+    if full or not os.path.exists(DISHES_PATH):
+        with metrics.timer("read_models_scan"):
+            fresh = {snap.reference.path: _fields(snap.to_dict() or {}) for snap in db.collection_group("dishes").stream()}
+        metrics.incr("read_models_dishes_read", len(fresh))
+
+        def replace(data):
+            data.clear()
+            data.update(fresh)
+        return update_json(DISHES_PATH, replace)
+
+    refs = [db.document(path) for path in sorted({p for p in changed if is_dish_path(p)})]
+    fresh = {}
+    with metrics.timer("read_models_scan"):
+        for i in range(0, len(refs), GET_ALL_CHUNK):
+            for snap in db.get_all(refs[i:i + GET_ALL_CHUNK]):
+                fresh[snap.reference.path] = _fields(snap.to_dict() or {}) if snap.exists else None
+    metrics.incr("read_models_dishes_read", len(fresh))
+
+    def apply(data):
+        for path, fields in fresh.items():
+            if fields is None:
+                data.pop(path, None)
+            else:
+                data[path] = fields
+    return update_json(DISHES_PATH, apply)
+
+def refresh_dishes(paths):
+    """For writers that don't rebuild: fold their dish writes into the snapshot, if there is one yet."""
+    if os.path.exists(DISHES_PATH):
+        load_dishes(paths)
+
+def is_dish_path(path):
+    parts = path.split("#", 1)[0].split("/")
+    return len(parts) == 4 and parts[2] == "dishes"
+
+def collect(dishes, location_names=None, window_days=MOOD_WINDOW_DAYS, scores=None):
+    """
+    One pass over every dish ({path: fields}) -> (pulse, comparison pool, search catalog, {tag: top dishes}).
+    If given, `scores` is filled with {(hall id, dish id): score} for dining hall dishes.
+    """
+    if location_names is None:
+        location_names = {}
+        for coll in ("diningHalls", "diningPoints"):
+            for snap in db.collection(coll).stream():
+                location_names[snap.id] = (snap.to_dict() or {}).get("name", snap.id)
+
+    since = (date.today() - timedelta(days=window_days)).strftime("%Y-%m-%d")
+    pulse, pool, catalog = [], [], []
+    moods = {tag: [] for tag in load_tag_table()}
+    for path, data in sorted(dishes.items()):
+        if not data.get("name"):
+            continue
+        dish_id = path.rsplit("/", 1)[-1]
+        catalog.append(search_entry(path, data))
+        parent_collection, parent_id = dish_location(path)
+        if scores is not None and parent_collection == "diningHalls":
+            scores[(parent_id, dish_id)] = data.get("score")
+        if _is_number(data.get("score")) and data["score"] >= 0:
+            pool.append(comparison_entry(path, data))
+            pulse.append(pulse_entry(path, data, location_names))
+        # Retail dishes have no serving dates; hall dishes drop out once they go stale
+        served_date = None
+        if parent_collection == "diningHalls":
+            served_date = last_served(hall_served(db, parent_id), dish_id, data)
+        if data.get("category") == "diningHall" and (served_date or "") < since:
+            continue
+        for tag in data.get("tags") or []:
+            if tag in moods:
+                moods[tag].append(mood_entry(path, data, served_date))
+
+    pulse.sort(key=lambda e: e["score"], reverse=True)
+    catalog.sort(key=lambda e: e["name"].lower())
+    metrics.incr("read_models_dishes_scanned", len(catalog))
+    moods = {tag: heapq.nlargest(MOOD_TOP_K, entries, key=mood_rank) for tag, entries in moods.items()}
+    return pulse[:PULSE_SIZE], pool, catalog, moods
+
+def write_shards(name, entries, sink, manifest):
+    """Queue the shard documents for one model; returns the shard count."""
+    header_ref = db.collection(COLLECTION).document(name)
+    shards = shard_entries(entries)
+    for i, shard in enumerate(shards):
+        payload = {"dishes": shard, "version": VERSION}
+        key = f"{COLLECTION}/{name}/shards/{i}"
+        if manifest.changed(key, payload):
+            sink.set(header_ref.collection("shards").document(str(i)), payload, merge=False, manifest_key=key)
+    return len(shards)
+
+def write_header(name, shard_count, entry_count, sink, manifest):
+    """Point the header at the new shards, then drop shards left from a larger build."""
+    header_ref = db.collection(COLLECTION).document(name)
+    previous = header_ref.get()
+    old_count = (previous.to_dict() or {}).get("shards", 0) if previous.exists else 0
+
+    header = {"shards": shard_count, "count": entry_count, "version": VERSION,
+              "generatedAt": firestore.SERVER_TIMESTAMP}
+    key = f"{COLLECTION}/{name}"
+    if manifest.changed(key, header):
+        sink.set(header_ref, header, merge=False, manifest_key=key)
+    for i in range(shard_count, old_count):
+        key = f"{COLLECTION}/{name}/shards/{i}"
+        sink.delete(header_ref.collection("shards").document(str(i)))
+        manifest.forget_prefix(key)
+
+def write_search_index(catalog, sink, manifest):
+    """Queue the changed n-gram shards; returns the header. Shards are keyed by n-gram, not position."""
+    header_ref = db.collection(COLLECTION).document("searchIndex")
+    header, shards = build_search_index(catalog)
+    for key, entries in shards.items():
+        payload = {"dishes": entries, "version": VERSION}
+        path = f"{COLLECTION}/searchIndex/shards/{key}"
+        if manifest.changed(path, payload):
+            sink.set(header_ref.collection("shards").document(key), payload, merge=False, manifest_key=path)
+    return header
+
+def write_search_header(header, sink, manifest):
+    """Point the header at the new keys, then drop shards for n-grams that no longer occur."""
+    header_ref = db.collection(COLLECTION).document("searchIndex")
+    previous = header_ref.get()
+    old_keys = set((previous.to_dict() or {}).get("keys", [])) if previous.exists else set()
+
+    doc_data = dict(header, version=VERSION, generatedAt=firestore.SERVER_TIMESTAMP)
+    key = f"{COLLECTION}/searchIndex"
+    if manifest.changed(key, doc_data):
+        sink.set(header_ref, doc_data, merge=False, manifest_key=key)
+    for shard_key in sorted(old_keys - set(header["keys"])):
+        sink.delete(header_ref.collection("shards").document(shard_key))
+        manifest.forget_prefix(f"{COLLECTION}/searchIndex/shards/{shard_key}")
+
+def rebuild(manifest=None, sink=None, changed=None):
+    """
+    Rebuild every read model from the current dishes. Returns {model: shard count}.
+    `changed` lists the document paths written since the last build (e.g. a
+    sink's committed_paths); only those dishes are re-read. None rescans all of them.
+    """
+    print("\n🧮 Building read models...")
+    own_sink = sink is None
+    own_manifest = manifest is None
+    manifest = manifest or WriteManifest()
+    sink = sink or FirestoreSink(db, manifest, verbose=False)
+
+    scores = {}
+    pulse, pool, catalog, moods = collect(load_dishes(changed or (), full=changed is None), scores=scores)
+    single = {"pulse": {"dishes": pulse, "count": len(pulse)}}
+    for tag, entries in moods.items():
+        single[f"mood-{tag}"] = {"tag": tag, "dishes": entries, "count": len(entries), "windowDays": MOOD_WINDOW_DAYS}
+    # Only documents whose ranking actually moved are rewritten
+    for name, doc_data in single.items():
+        doc_data.update(version=VERSION, generatedAt=firestore.SERVER_TIMESTAMP)
+        key = f"{COLLECTION}/{name}"
+        if manifest.changed(key, doc_data):
+            sink.set(db.collection(COLLECTION).document(name), doc_data, merge=False, manifest_key=key)
+
+    sharded = {"comparisonPool": pool, "searchCatalog": catalog}
+    counts = {name: write_shards(name, entries, sink, manifest) for name, entries in sharded.items()}
+    search_header = write_search_index(catalog, sink, manifest)
+    sink.drain()  # shards must be committed before any header points at them
+    for name, entries in sharded.items():
+        write_header(name, counts[name], len(entries), sink, manifest)
+    write_search_header(search_header, sink, manifest)
+    # Today's hall day documents carry scores too; keep them in step with the dishes
+    days_synced = sync_scores(db, scores, manifest, sink)
+
+    if own_sink:
+        sink.close()
+    else:
+        sink.drain()
+    if own_manifest:
+        manifest.save()
+    print(f"   ✅ pulse: {len(pulse)} dishes, comparison pool: {len(pool)} in {counts['comparisonPool']} shard(s), "
+          f"search catalog: {len(catalog)} in {counts['searchCatalog']} shard(s), "
+          f"search index: {len(search_header['keys'])} prefix shard(s), {len(moods)} mood lists, "
+          f"{days_synced} hall day(s) rescored")
+    return dict(counts, searchIndex=len(search_header["keys"]), **{name: 1 for name in single})
+
+if __name__ == "__main__":
+    print("--- READ MODEL BUILDER ---")
+    parser = argparse.ArgumentParser(description="Rebuild the readModels documents from the current dishes.")
+    parser.add_argument("--full", action="store_true", help="rescan every dish and rewrite every document")
+    args = parser.parse_args()
+
+    with metrics.run("read_models"):
+        manifest = WriteManifest(full=args.full)
+        # Without --full only the local dish snapshot is used (plus fresh served dates)
+        rebuild(manifest, changed=None if args.full else ())
+        manifest.save()
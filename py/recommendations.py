@@ -0,0 +1,287 @@
+print("--- DISH RECOMMENDER ---")
+
+import argparse
+import heapq
+import math
+import re
+from collections import Counter
+from datetime import date, timedelta
+
+import dish_identity
+import metrics
+from dish_tags import tag_many
+from firebase_client import firestore, get_db
+from firestore_sink import FirestoreSink
+from hall_days import hall_served, last_served
+from menu_archive import get_archive
+from write_manifest import WriteManifest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Precomputed "more like this" lists, so TasteDNA doesn't download the whole
+# catalog and score it on the device.
+#
+#   dishNeighbors/{dishId}                    {neighbors: [{id, name, similarity}]}
+#   users/{uid}/recommendations/latest        {dishes: [...], count, basedOn}
+#
+# Every globalDishes entry gets a sparse feature vector: mood tags, name
+# tokens (TF-IDF), the halls serving it, and the meals it was served at in
+# the local menu archive (dishes served together in the same meals look
+# alike). Each group is L2-normalized and weighted, and cosine similarity
+# picks the top-K neighbors. A user's recommendations are the neighbors of
+# the dishes they rated well or picked in comparisons, minus what they've
+# already tried.
+
+# 1. SETUP FIREBASE
+db = get_db()
+
+# 2. CONFIG
+NEIGHBORS_COLLECTION = "dishNeighbors"
+TOP_K = 20
+USER_TOP = 10
+GROUP_WEIGHTS = {"tag": 1.0, "token": 1.0, "hall": 0.3, "meal": 0.7}
+CO_SERVED_DAYS = 120         # archive window for the co-served features
+MIN_SIMILARITY = 0.05
+BLOCK_ROWS = 256             # rows per similarity block (numpy path)
+BLOCK_PAIRS = 4_000_000      # posting-list products per block (numpy path)
+LIKED_REVIEW_SCORE = 1000    # reviews with an initialScore at/above this count as likes
+STOPWORDS = {"and", "with", "the", "of", "in", "on", "a", "w"}
+
+# 3. FEATURES
+def name_tokens(name):
+    return [t for t in re.findall(r"[a-z0-9]+", name.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def co_served_meals(dish_ids, days=CO_SERVED_DAYS):
+    """{dish id: [meal keys]} from the menu archive over the last `days` days."""
+    archive = get_archive()
+    if not archive.rows:
+        return {}
+    cols = archive.columns()
+    cutoff = (date.today() - timedelta(days=days)).toordinal()
+    ids = {i: dish_identity.dish_id(name) for i, name in enumerate(archive.names["dishes"])}
+    wanted = [i for i, dish_id in ids.items() if dish_id in dish_ids]
+    meals = {}
+    if np is not None:
+        rows = np.flatnonzero((cols["day"] >= cutoff) & np.isin(cols["dish"], wanted))
+        keys = np.stack([cols[c][rows].astype(np.int64) for c in ("dish", "day", "hall", "meal")], axis=1)
+        for dish, day, hall, meal in np.unique(keys, axis=0).tolist():
+            meals.setdefault(ids[dish], set()).add((day, hall, meal))
+        return meals
+    wanted = set(wanted)
+    for row in range(archive.rows):
+        if cols["day"][row] < cutoff or cols["dish"][row] not in wanted:
+            continue
+        meals.setdefault(ids[int(cols["dish"][row])], set()).add(
+            (int(cols["day"][row]), int(cols["hall"][row]), int(cols["meal"][row])))
+    return meals
+
+def build_vectors(dishes, meals):
+    """
+    dishes: {id: {"name", "locations"}}; meals: {id: meal keys}.
+    Returns {id: {feature: weight}} with unit length (empty dishes omitted).
+    """
+    tags = tag_many(d["name"] for d in dishes.values())
+    groups = {}
+    for dish_id, dish in dishes.items():
+        groups[dish_id] = {
+            "tag": Counter(tags[dish["name"]]),
+            "token": Counter(name_tokens(dish["name"])),
+            "hall": Counter(dish.get("locations") or []),
+            "meal": Counter(meals.get(dish_id, ())),
+        }
+
+    # IDF per feature, so "chicken" or a 40-dish buffet meal says less than a rare token
+    df = Counter(f"{group}:{feature}" for g in groups.values() for group, counts in g.items() for feature in counts)
+    n = len(dishes)
+    vectors = {}
+    for dish_id, g in groups.items():
+        vector = {}
+        for group, counts in g.items():
+            weighted = {f"{group}:{f}": c * math.log(1 + n / df[f"{group}:{f}"]) for f, c in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weighted.values()))
+            for feature, w in weighted.items():
+                vector[feature] = GROUP_WEIGHTS[group] * w / norm
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm:
+            vectors[dish_id] = {f: w / norm for f, w in vector.items()}
+    return vectors
+
+# 4. SIMILARITY KERNEL
+def nearest_neighbors(vectors, k=TOP_K, min_similarity=MIN_SIMILARITY):
+    """{id: [(neighbor id, cosine)]}, best first, excluding the dish itself."""
+    if np is not None and vectors:
+        return _neighbors_numpy(vectors, k, min_similarity)
+    return _neighbors_python(vectors, k, min_similarity)
+
+def _neighbors_numpy(vectors, k, min_similarity):
+    # Sorted ids, so "ties by id" is "ties by row index" below
+    ids = sorted(vectors)
+    features = {f: j for j, f in enumerate(sorted({f for v in vectors.values() for f in v}))}
+    n = len(ids)
+    # Sparse rows (CSR) and per-feature posting lists; nothing dishes x features is ever dense
+    row_len = np.array([len(vectors[dish_id]) for dish_id in ids], dtype=np.int64)
+    row_ptr = np.concatenate(([0], np.cumsum(row_len)))
+    cols = np.array([features[f] for dish_id in ids for f in vectors[dish_id]], dtype=np.int64)
+    vals = np.array([w for dish_id in ids for w in vectors[dish_id].values()], dtype=np.float64)
+    rows = np.repeat(np.arange(n), row_len)
+    order = np.argsort(cols, kind="stable")
+    post_rows, post_vals = rows[order], vals[order]
+    post_len = np.bincount(cols, minlength=len(features))
+    post_ptr = np.concatenate(([0], np.cumsum(post_len)))
+
+    # Blocks of rows, cut early when their posting lists would expand past BLOCK_PAIRS
+    cost = np.concatenate(([0], np.cumsum(np.add.reduceat(post_len[cols], row_ptr[:-1]))))
+    result = {}
+    k = min(k, n - 1)
+    start = 0
+    while start < n:
+        end = int(np.searchsorted(cost, cost[start] + BLOCK_PAIRS, side="right")) - 1
+        end = min(start + BLOCK_ROWS, n, max(end, start + 1))
+        entries = slice(row_ptr[start], row_ptr[end])
+        reps = post_len[cols[entries]]
+        first = np.repeat(post_ptr[cols[entries]] - (np.cumsum(reps) - reps), reps)
+        postings = first + np.arange(int(reps.sum()))
+        pairs = np.repeat(rows[entries] - start, reps) * n + post_rows[postings]
+        block = np.bincount(pairs, weights=np.repeat(vals[entries], reps) * post_vals[postings],
+                            minlength=(end - start) * n).reshape(end - start, n)
+        for row in range(end - start):
+            sims = block[row]
+            sims[start + row] = -1.0  # not its own neighbor
+            near = np.flatnonzero(sims >= min_similarity) if k > 0 else np.zeros(0, dtype=np.int64)
+            rounded = np.round(sims[near], 4)
+            if len(near) > k:
+                # Keep everything tied with the k-th best, then break ties by id
+                kth = np.partition(rounded, len(near) - k)[len(near) - k]
+                near, rounded = near[rounded >= kth], rounded[rounded >= kth]
+            best = np.lexsort((near, -rounded))[:k]
+            result[ids[start + row]] = [(ids[j], float(s)) for j, s in zip(near[best].tolist(), rounded[best].tolist())]
+        start = end
+    return result
+
+def _neighbors_python(vectors, k, min_similarity):
+    postings = {}
+    for dish_id, vector in vectors.items():
+        for feature, weight in vector.items():
+            postings.setdefault(feature, []).append((dish_id, weight))
+    result = {}
+    for dish_id, vector in vectors.items():
+        sims = Counter()
+        for feature, weight in vector.items():
+            for other, other_weight in postings[feature]:
+                if other != dish_id:
+                    sims[other] += weight * other_weight
+        near = [(other, round(s, 4)) for other, s in sims.items() if s >= min_similarity]
+        result[dish_id] = heapq.nsmallest(k, near, key=_rank)
+    return result
+
+def _rank(pair):
+    # Best first, ties by id, so both kernels (and every run) give the same list
+    return (-pair[1], pair[0])
+
+# 5. USERS
+def user_history():
+    """{uid: (liked dish ids, tried dish ids)} from reviews and comparisons."""
+    users = {}
+    for snap in db.collection("reviews").stream():
+        data = snap.to_dict() or {}
+        if not data.get("userId") or not data.get("dishId"):
+            continue
+        liked, tried = users.setdefault(data["userId"], (Counter(), set()))
+        tried.add(data["dishId"])
+        if (data.get("initialScore") or 0) >= LIKED_REVIEW_SCORE:
+            liked[data["dishId"]] += 1
+    for snap in db.collection_group("comparisons").stream():
+        parts = snap.reference.path.split("/")
+        data = snap.to_dict() or {}
+        if len(parts) != 4 or parts[0] != "users" or not data.get("winnerId"):
+            continue
+        liked, tried = users.setdefault(parts[1], (Counter(), set()))
+        liked[data["winnerId"]] += 1
+        tried.update(x for x in (data.get("winnerId"), data.get("loserId")) if x)
+    return users
+
+def recommend(liked, tried, neighbors, top=USER_TOP):
+    """Rank untried dishes by similarity to the user's likes: [(id, score)]."""
+    scores = Counter()
+    for dish_id, weight in liked.items():
+        for other, similarity in neighbors.get(dish_id, ()):
+            if other not in tried:
+                scores[other] += weight * similarity
+    return heapq.nlargest(top, scores.items(), key=lambda kv: kv[1])
+
+# 6. BUILD & WRITE
+def dish_entries():
+    """Display info per dish id from the hall dish docs (most recently served copy wins)."""
+    entries = {}
+    for snap in db.collection_group("dishes").stream():
+        parts = snap.reference.path.split("/")
+        data = snap.to_dict() or {}
+        if parts[0] != "diningHalls" or not data.get("name"):
+            continue
+        current = entries.get(snap.id)
+        served = last_served(hall_served(db, parts[1]), snap.id, data)
+        if current and (current["_served"] or "") >= (served or ""):
+            continue
+        entries[snap.id] = {"id": snap.id, "name": data["name"], "score": data.get("score"), "tags": data.get("tags") or [],
+                            "parentId": parts[1], "parentCollection": "diningHalls", "_served": served}
+    return {dish_id: {k: v for k, v in e.items() if k != "_served"} for dish_id, e in entries.items()}
+
+def rebuild(manifest=None, users=True):
+    own_manifest = manifest is None
+    manifest = manifest or WriteManifest()
+    sink = FirestoreSink(db, manifest, verbose=False)
+
+    print("📡 Reading globalDishes...")
+    dishes = {}
+    for snap in db.collection("globalDishes").stream():
+        data = snap.to_dict() or {}
+        if data.get("name"):
+            dishes[snap.id] = {"name": data["name"], "locations": data.get("locations") or []}
+
+    with metrics.timer("recommend_features"):
+        vectors = build_vectors(dishes, co_served_meals(set(dishes)))
+    with metrics.timer("recommend_neighbors"):
+        neighbors = nearest_neighbors(vectors)
+    print(f"   🧭 {len(vectors)} dish vectors, {sum(len(v) for v in neighbors.values())} neighbor links")
+
+    for dish_id, near in neighbors.items():
+        doc = {"neighbors": [{"id": other, "name": dishes[other]["name"], "similarity": s} for other, s in near]}
+        key = f"{NEIGHBORS_COLLECTION}/{dish_id}"
+        if manifest.changed(key, doc):
+            sink.set(db.collection(NEIGHBORS_COLLECTION).document(dish_id), doc, merge=False, manifest_key=key)
+
+    recommended = 0
+    if users:
+        print("📡 Reading reviews and comparisons...")
+        entries = dish_entries()
+        for uid, (liked, tried) in user_history().items():
+            picks = [dict(entries[d], recScore=round(s, 4)) for d, s in recommend(liked, tried, neighbors) if d in entries]
+            if not picks:
+                continue
+            doc = {"dishes": picks, "count": len(picks), "basedOn": len(liked), "generatedAt": firestore.SERVER_TIMESTAMP}
+            key = f"users/{uid}/recommendations/latest"
+            if manifest.changed(key, doc):
+                sink.set(db.document(key), doc, merge=False, manifest_key=key)
+            recommended += 1
+
+    stats = sink.close()
+    if own_manifest:
+        manifest.save()
+    metrics.incr("recommend_users", recommended)
+    print(f"\n✨ Recommendations built for {recommended} users: {stats['writes']} documents written, "
+          f"{manifest.skipped} unchanged, {stats['failed_writes']} failed.")
+    return neighbors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build dish neighbor lists and per-user recommendations.")
+    parser.add_argument("--full", action="store_true", help="ignore the write manifest and rewrite every document")
+    parser.add_argument("--skip-users", action="store_true", help="only rebuild the per-dish neighbor lists")
+    args = parser.parse_args()
+
+    with metrics.run("recommendations"):
+        manifest = WriteManifest(full=args.full)
+        rebuild(manifest, users=not args.skip_users)
+        manifest.save()
@@ -1,70 +1,122 @@
 print("--- CLEANUP STARTED ---")
 
-import os
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from firebase_client import get_db
+from firestore_sink import FirestoreSink
+from history_state import HistoryState
+from page_cache import PageCache
+from write_manifest import WriteManifest
 
 # ==========================================
 # 1. SETUP FIREBASE
 # ==========================================
-current_dir = os.path.dirname(os.path.abspath(__file__))
-key_path = os.path.join(current_dir, "serviceAccountKey.json")
-
-if not os.path.exists(key_path):
-    print(f"❌ ERROR: serviceAccountKey.json not found at: {key_path}")
-    exit()
-
-try:
-    cred = credentials.Certificate(key_path)
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("✅ Connected to Firebase Database!")
-except Exception as e:
-    print(f"❌ FIREBASE CONNECTION ERROR: {e}")
-    exit()
+db = get_db()
 
 # ==========================================
-# 2. DELETE FUNCTION (Recursive)
+# 2. BULK DELETE (Breadth-first, batched, parallel)
 # ==========================================
-def delete_collection(coll_ref, batch_size=50):
-    docs = list(coll_ref.limit(batch_size).stream())
-    deleted = 0
+PAGE_SIZE = 300         # document refs listed per page
+LIST_WORKERS = 8        # parallel subcollection lookups
+PROGRESS_EVERY = 500
 
-    if len(docs) == 0:
-        return
+def delete_collection(coll_ref, page_size=PAGE_SIZE, dry_run=False, sink=None):
+    """
+    Delete a collection and everything under it (e.g. diningHalls/*/dishes).
+    Walks the tree breadth-first with an explicit queue instead of recursion
+    and deletes through the shared batched, rate-limited sink.
+    Returns {"docs": n, "collections": n}.
+    """
+    own_sink = sink is None and not dry_run
+    if own_sink:
+        sink = FirestoreSink(db, verbose=False)
+
+    counts = {"docs": 0, "collections": 0}
+    queue = deque([coll_ref])
+    next_report = PROGRESS_EVERY
 
-    for doc in docs:
-        print(f"   Deleting doc: {doc.id}")
-        
-        # ⚠️ RECURSIVE DELETE: Check for subcollections (like 'dishes')
-        subcollections = doc.reference.collections()
-        for sub in subcollections:
-            delete_collection(sub, batch_size)
+    with ThreadPoolExecutor(max_workers=LIST_WORKERS) as pool:
+        while queue:
+            current = queue.popleft()
+            counts["collections"] += 1
 
-        doc.reference.delete()
-        deleted += 1
+            # list_documents() also returns "missing" parents that only hold subcollections
+            page = []
+            for doc_ref in current.list_documents(page_size=page_size):
+                page.append(doc_ref)
+                if len(page) >= page_size:
+                    _delete_page(page, pool, queue, sink, dry_run)
+                    counts["docs"] += len(page)
+                    page = []
+            if page:
+                _delete_page(page, pool, queue, sink, dry_run)
+                counts["docs"] += len(page)
 
-    if deleted >= batch_size:
-        return delete_collection(coll_ref, batch_size)
+            if counts["docs"] >= next_report:
+                verb = "counted" if dry_run else "deleted"
+                print(f"   … {counts['docs']} docs {verb}, {counts['collections']} collections, {len(queue)} queued")
+                next_report = counts["docs"] + PROGRESS_EVERY
+
+    if own_sink:
+        stats = sink.close()
+        if stats["failed_writes"]:
+            print(f"   ⚠️ {stats['failed_writes']} deletes failed; run again to finish.")
+    return counts
+
+def _delete_page(doc_refs, pool, queue, sink, dry_run):
+    # Look up subcollections for the whole page in parallel, then queue them
+    with metrics.timer("list_subcollections"):
+        for subcollections in pool.map(lambda ref: list(ref.collections()), doc_refs):
+            queue.extend(subcollections)
+    metrics.incr("documents_listed", len(doc_refs))
+    if not dry_run:
+        for doc_ref in doc_refs:
+            sink.delete(doc_ref)
 
 # ==========================================
 # 3. EXECUTE CLEANUP
 # ==========================================
 # UPDATE: Added 'globalDishes' to the wipe list
-COLLECTIONS_TO_WIPE = ["diningHalls", "diningPoints", "globalDishes"]
+COLLECTIONS_TO_WIPE = ["diningHalls", "diningPoints", "globalDishes", "readModels", "dishNeighbors"]
 
-print("\n⚠️  WARNING: This will delete ALL data in:", COLLECTIONS_TO_WIPE)
-print("This is required to clear old data formats before uploading new ones.")
-confirm = input("Type 'DELETE' to confirm: ")
+def main():
+    parser = argparse.ArgumentParser(description="Wipe the menu collections from Firestore.")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+    args = parser.parse_args()
 
-if confirm == "DELETE":
+    if args.dry_run:
+        print("\n🔍 DRY RUN: counting documents in:", COLLECTIONS_TO_WIPE)
+        for col_name in COLLECTIONS_TO_WIPE:
+            counts = delete_collection(db.collection(col_name), dry_run=True)
+            print(f"   {col_name}: {counts['docs']} docs in {counts['collections']} collections")
+        return
+
+    print("\n⚠️  WARNING: This will delete ALL data in:", COLLECTIONS_TO_WIPE)
+    print("This is required to clear old data formats before uploading new ones.")
+    confirm = input("Type 'DELETE' to confirm: ")
+
+    if confirm != "DELETE":
+        print("❌ Operation cancelled.")
+        return
+
+    manifest = WriteManifest()
     for col_name in COLLECTIONS_TO_WIPE:
         print(f"\n🗑️  Wiping collection: {col_name}...")
-        delete_collection(db.collection(col_name))
-        print(f"✅ {col_name} cleared.")
+        counts = delete_collection(db.collection(col_name))
+        # Forget what the uploaders wrote there so the next run rewrites it
+        manifest.forget_prefix(col_name)
+        manifest.save()
+        if col_name == "diningPoints":
+            PageCache().clear()  # retail pages must be re-read to refill it
+        if col_name == "diningHalls":
+            HistoryState().forget()  # every history day has to be loaded again
+        print(f"✅ {col_name} cleared ({counts['docs']} docs, {counts['collections']} collections).")
     
     print("\n✨ Database is clean. Now run 'py/upload_history.py' to repopulate!")
-else:
-    print("❌ Operation cancelled.")
\ No newline at end of file
+
+if __name__ == "__main__":
+    with metrics.run("reset_database"):
+        main()
@@ -0,0 +1,42 @@
+print("--- DISH RE-TAGGER ---")
+
+import metrics
+from firebase_client import get_db
+from dish_tags import tag_many
+from firestore_sink import FirestoreSink
+from read_models import refresh_dishes
+from write_manifest import WriteManifest
+
+# 1. SETUP FIREBASE
+db = get_db()
+
+# 2. RE-TAG EVERYTHING AFTER A KEYWORD CHANGE IN dish_tags.json
+def retag_dishes():
+    print("📡 Reading globalDishes and dining hall dishes...")
+    docs = list(db.collection("globalDishes").stream())
+    docs += [d for d in db.collection_group("dishes").stream() if (d.to_dict() or {}).get("category") == "diningHall"]
+
+    tags = tag_many((d.to_dict() or {}).get("name", "") for d in docs)
+    print(f"   🏷️ Tagged {len(tags)} distinct names from {len(docs)} documents.")
+
+    # The stored tags decide what is written; the manifest records it (keyed path#tags,
+    # apart from the uploaders' entries) once the batch has committed
+    manifest = WriteManifest(full=True)
+    sink = FirestoreSink(db, manifest)
+    changed = 0
+    for snap in docs:
+        data = snap.to_dict() or {}
+        new_tags = tags[data.get("name", "")]
+        key = f"{snap.reference.path}#tags"
+        if data.get("tags") != new_tags and manifest.changed(key, {"tags": new_tags}):
+            sink.set(snap.reference, {"tags": new_tags}, manifest_key=key)
+            changed += 1
+
+    stats = sink.close()
+    manifest.save()
+    refresh_dishes(sink.committed_paths)
+    print(f"\n✨ Re-tag complete: {changed} documents changed, {stats['failed_writes']} failed.")
+
+if __name__ == "__main__":
+    with metrics.run("retag_dishes"):
+        retag_dishes()
@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Concurrent, polite page fetcher for the campusdish retail pages.
+# One keep-alive session is shared by a small thread pool; every host gets
+# its own cap on in-flight requests and a minimum gap between request starts.
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+MAX_CONCURRENCY = 6     # in-flight requests per host
+MIN_DELAY = 0.1         # seconds between request starts to the same host
+TIMEOUT = 10
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size=MAX_CONCURRENCY):
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session.headers.update(HEADERS)
+    return _session
+
+
+class HostLimiter:
+    """Per-host concurrency cap plus a minimum delay between request starts."""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, min_delay=MIN_DELAY):
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.lock = threading.Lock()
+        self.hosts = {}   # host -> [semaphore, next allowed start]
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = [threading.Semaphore(self.max_concurrency), 0.0]
+            return self.hosts[host]
+
+    def run(self, url, fn):
+        entry = self._host(url)
+        with entry[0]:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, entry[1])
+                entry[1] = start + self.min_delay
+            if start > now:
+                metrics.incr("retail_sleep_seconds", start - now)
+                time.sleep(start - now)
+            return fn()
+
+
+def get(url, timeout=TIMEOUT, limiter=None, **kwargs):
+    """GET one page through the shared session (and limiter, if given)."""
+    session = get_session()
+
+    def call():
+        with metrics.timer("retail_request"):
+            response = session.get(url, timeout=timeout, **kwargs)
+        metrics.incr("retail_bytes_received", len(response.content))
+        if response.status_code == 304:
+            metrics.incr("retail_not_modified")
+        return response
+
+    return limiter.run(url, call) if limiter else call()
+
+
+def iter_pages(jobs, max_concurrency=MAX_CONCURRENCY, min_delay=MIN_DELAY, timeout=TIMEOUT):
+    """
+    Fetch pages concurrently and yield (job, response, error) as each one
+    finishes, so callers can parse and write while other fetches run.
+    `jobs` are dicts with a "url" key and optional extra request "headers".
+    """
+    limiter = HostLimiter(max_concurrency, min_delay)
+    get_session(max_concurrency)
+
+    def fetch(job):
+        try:
+            response = get(job["url"], timeout=timeout, limiter=limiter, headers=job.get("headers"))
+            return job, response, None
+        except Exception as e:
+            metrics.incr("retail_errors")
+            return job, None, e
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = [pool.submit(fetch, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
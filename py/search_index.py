@@ -0,0 +1,109 @@
+import hashlib
+import json
+import re
+import unicodedata
+
+import metrics
+
+# N-gram-sharded search index, so SearchScreen fetches one small shard for
+# what was typed instead of the whole catalog.
+#
+#   readModels/searchIndex               {keys: [...], sizes: [...], count, revision, version}
+#   readModels/searchIndex/shards/{key}  {"dishes": [search catalog entries]}
+#
+# Every token of a dish's name and tags (normalized: lowercase, accents
+# stripped, split on anything that isn't a letter or digit) puts the dish in
+# the shard of each of the token's trigrams and bigrams, so a query matches
+# inside words ("burger" finds "Cheeseburger"), not just at their start. A
+# query token of three or more characters is answered by the smallest shard
+# among its trigrams (`sizes` lists each key's dish count); a two-letter query
+# reads its bigram shard, which keeps only the best-scored dishes. `revision`
+# changes whenever any shard does, so clients know to drop cached shards.
+# The catalog has one entry per hall serving a dish; the index keeps one per
+# dish id (the best-scored copy, with every copy's locations).
+# The client side is readModels.js (searchKey / searchDishes); the
+# tokenization below must stay in step with normalizeSearch() there.
+
+SHORT = 2                   # bigram shards, for two-letter queries
+GRAM = 3                    # trigram shards, for everything longer
+SHARD_BYTES = 64 * 1024       # bigram shards
+MAX_SHARD_BYTES = 800 * 1024  # trigram shards; Firestore's hard limit is 1 MiB per document
+ENTRY_OVERHEAD = 64
+
+
+def tokens(text):
+    """'Crème Brûlée & Berries' -> ['creme', 'brulee', 'berries']"""
+    stripped = "".join(c for c in unicodedata.normalize("NFKD", text or "") if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", stripped.lower())
+
+
+def entry_tokens(entry):
+    return set(tokens(entry.get("name"))) | {t for tag in entry.get("tags") or [] for t in tokens(tag)}
+
+
+def _bytes(entry):
+    return len(json.dumps(entry, separators=(",", ":"), default=str).encode("utf-8")) + ENTRY_OVERHEAD
+
+
+def _rank(entry):
+    score = entry.get("score")
+    return (-(score if isinstance(score, (int, float)) and not isinstance(score, bool) else 0), entry.get("name") or "")
+
+
+def _fit(entries, max_bytes):
+    """Best-ranked entries whose encoded size stays under max_bytes."""
+    kept, size = [], 0
+    for entry in sorted(entries, key=_rank):
+        size += _bytes(entry)
+        if size > max_bytes:
+            break
+        kept.append(entry)
+    return kept
+
+
+def dedupe(entries):
+    """One entry per dish id: the best-ranked copy, its locations unioned with the others'."""
+    best = {}
+    for entry in sorted(entries, key=_rank):
+        kept = best.setdefault(entry["id"], dict(entry, locations=list(entry.get("locations") or [])))
+        for location in entry.get("locations") or []:
+            if location not in kept["locations"]:
+                kept["locations"].append(location)
+    return list(best.values())
+
+
+def grams(token, n):
+    """'fries', 3 -> {'fri', 'rie', 'ies'}"""
+    return {token[i:i + n] for i in range(len(token) - n + 1)}
+
+
+def build(entries, shard_bytes=SHARD_BYTES, max_shard_bytes=MAX_SHARD_BYTES):
+    """
+    entries: search catalog entries (id, name, parentId, ..., tags).
+    Returns (header fields, {shard key: entries}); each shard is sorted best score first.
+    """
+    entries = dedupe(entries)
+    groups = {}
+    for entry in entries:
+        keys = set()
+        for token in entry_tokens(entry):
+            keys |= grams(token, SHORT) | grams(token, GRAM)
+        for key in keys:
+            groups.setdefault(key, []).append(entry)
+
+    # Bigram shards only serve two-letter queries, so they keep the best-scored
+    # dishes; trigram shards are the whole answer and are cut only to fit in a document
+    shards = {key: _fit(group, shard_bytes if len(key) == SHORT else max_shard_bytes)
+              for key, group in groups.items()}
+    truncated = sorted(key for key in shards if len(key) == GRAM and len(shards[key]) < len(groups[key]))
+    if truncated:
+        dropped = sum(len(groups[key]) - len(shards[key]) for key in truncated)
+        metrics.incr("search_shards_truncated", len(truncated))
+        metrics.incr("search_entries_truncated", dropped)
+        print(f"   ⚠️ {len(truncated)} search shard(s) over {max_shard_bytes // 1024} KB kept only their "
+              f"best-scored dishes ({dropped} entries dropped): {', '.join(truncated[:10])}")
+    keys = sorted(shards)
+    revision = hashlib.sha1("\n".join(sorted(json.dumps(e, sort_keys=True, default=str) for e in entries))
+                            .encode("utf-8")).hexdigest()[:12]
+    header = {"keys": keys, "sizes": [len(shards[key]) for key in keys], "count": len(entries), "revision": revision}
+    return header, shards
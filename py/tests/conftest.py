@@ -0,0 +1,55 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Every test runs against the in-process fake Firestore, with the local
+# caches/state files in a throwaway directory instead of py/.cache.
+
+_workdir = tempfile.mkdtemp(prefix="apero-tests-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+
+os.environ["APERO_FAKE_FIRESTORE"] = "1"
+os.environ["APERO_OFFLINE"] = "1"
+for var, name in {
+    "APERO_WRITE_MANIFEST": "write_manifest.json",
+    "APERO_DISH_REGISTRY": "dish_ids.json",
+    "APERO_HISTORY_STATE": "history_state.json",
+    "APERO_MENU_CACHE": "menu_cache.sqlite3",
+    "APERO_MENU_ARCHIVE": "archive",
+    "APERO_METRICS_DIR": "metrics",
+    "APERO_PAGE_CACHE": "retail_pages.json",
+    "APERO_RATINGS_STATE": "ratings_state.json",
+    "APERO_HOTSPOT_STATE": "hotspot_state.json",
+    "APERO_READ_MODEL_DISHES": "read_model_dishes.json",
+}.items():
+    os.environ[var] = os.path.join(_workdir, name)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """The shared fake client, emptied (with the per-process dish caches) for each test."""
+    import hall_days
+    from firebase_client import get_db
+
+    client = get_db()
+    client.docs.clear()
+    hall_days.forget()
+    if os.path.exists(os.environ["APERO_READ_MODEL_DISHES"]):
+        os.remove(os.environ["APERO_READ_MODEL_DISHES"])
+    yield client
+    hall_days.forget()
+
+
+def court(meals):
+    """A menu payload as the GraphQL API returns it: {meal: {station: [dish names]}}."""
+    return {"dailyMenu": {"meals": [
+        {"name": meal, "startTime": None, "endTime": None,
+         "stations": [{"name": station, "items": [{"item": {"name": name}} for name in names]}
+                      for station, names in stations.items()]}
+        for meal, stations in meals.items()]}}
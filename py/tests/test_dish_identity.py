@@ -0,0 +1,40 @@
+def test_canonical_id_is_bounded_and_stable():
+    from dish_identity import canonical_id, slug
+
+    assert canonical_id(slug("Chicken  Tikka Masala (GF)")) == "chicken-tikka-masala-gf"
+    long_slug = slug("Grilled " + "Extra Cheesy " * 10 + "Sandwich")
+    dish_id = canonical_id(long_slug)
+    assert len(dish_id) <= 60 and dish_id == canonical_id(long_slug)
+    # Slugs sharing their first 51 characters still get distinct IDs
+    assert dish_id != canonical_id(slug("Grilled " + "Extra Cheesy " * 10 + "Wrap"))
+
+
+def test_comparison_is_kept_when_its_move_fails(db, monkeypatch):
+    import fake_firestore
+    from dish_identity import repoint_comparisons
+    from firestore_sink import FirestoreSink
+
+    db.document("users/u1/comparisons/old-pizza_soup").set({
+        "winnerId": "old-pizza", "loserId": "soup",
+        "winnerPath": "diningHalls/ford/dishes/old-pizza", "loserPath": "diningHalls/ford/dishes/soup"})
+    renamed = {"diningHalls/ford/dishes/old-pizza": "diningHalls/ford/dishes/pizza"}
+
+    commit = fake_firestore.WriteBatch.commit
+
+    def failing_sets(batch):
+        if any(kind == "set" for kind, *_ in batch._ops):
+            raise RuntimeError("unavailable")
+        commit(batch)
+    monkeypatch.setattr(fake_firestore.WriteBatch, "commit", failing_sets)
+    sink = FirestoreSink(db, max_retries=0, verbose=False)
+    repoint_comparisons(db, sink, renamed, {"old-pizza": "pizza"})
+    sink.close()
+    assert db.document("users/u1/comparisons/old-pizza_soup").get().exists
+
+    monkeypatch.setattr(fake_firestore.WriteBatch, "commit", commit)
+    sink = FirestoreSink(db, verbose=False)
+    repoint_comparisons(db, sink, renamed, {"old-pizza": "pizza"})
+    sink.close()
+    assert not db.document("users/u1/comparisons/old-pizza_soup").get().exists
+    moved = db.document("users/u1/comparisons/pizza_soup").get().to_dict()
+    assert moved["winnerPath"] == "diningHalls/ford/dishes/pizza" and moved["winnerId"] == "pizza"
@@ -0,0 +1,28 @@
+import itertools
+import time
+
+
+def test_writes_to_one_document_commit_in_order(db, monkeypatch):
+    import fake_firestore
+    from firestore_sink import FirestoreSink
+
+    # The first batch is slow to commit; later ones would overtake it on another worker
+    commit = fake_firestore.WriteBatch.commit
+    calls = itertools.count()
+
+    def slow_first(batch):
+        if next(calls) == 0:
+            time.sleep(0.1)
+        commit(batch)
+    monkeypatch.setattr(fake_firestore.WriteBatch, "commit", slow_first)
+
+    sink = FirestoreSink(db, batch_size=1, verbose=False)
+    ref = db.document("diningHalls/ford-dining-court/dishes/pizza")
+    for station in ("Oven", "Grill", "Wok"):
+        sink.set(ref, {"currentStation": station})
+        sink.set(db.document(f"globalDishes/{station.lower()}"), {"name": station})
+    stats = sink.close()
+
+    assert stats["writes"] == 6
+    assert ref.get().to_dict()["currentStation"] == "Wok"
+    assert ref.path in sink.committed_paths
@@ -0,0 +1,48 @@
+import os
+from datetime import datetime, timedelta
+
+
+def test_fit_orders_dishes_by_wins():
+    from ratings import fit
+
+    # 0 beats 1 twice, 1 beats 2 twice, 2 never wins
+    scores, strengths = fit(3, [0, 0, 1, 1], [1, 1, 2, 2])
+    assert scores[0] > scores[1] > scores[2]
+    assert len(strengths) == 3
+    # Symmetric results stay at the anchor
+    scores, _ = fit(2, [0, 1], [1, 0])
+    assert abs(scores[0] - 1000) < 1e-6 and abs(scores[1] - 1000) < 1e-6
+
+
+def _compare(db, doc_id, winner, loser, when):
+    db.document(f"users/u1/comparisons/{doc_id}").set({
+        "winnerPath": f"diningHalls/ford/dishes/{winner}", "loserPath": f"diningHalls/ford/dishes/{loser}",
+        "timestamp": when})
+
+
+def test_incremental_run_reads_only_new_dishes_and_skips_deleted(db, monkeypatch):
+    import ratings
+
+    if os.path.exists(ratings.STATE_PATH):
+        os.remove(ratings.STATE_PATH)
+    for dish in ("pizza", "soup", "salad"):
+        db.document(f"diningHalls/ford/dishes/{dish}").set({"name": dish.title(), "score": 1000})
+    start = datetime(2026, 1, 1)
+    _compare(db, "pizza_soup", "pizza", "soup", start)
+    ratings.recompute(read_models=False)
+
+    # The loser is deleted, and a new comparison arrives
+    db.document("diningHalls/ford/dishes/soup").delete()
+    _compare(db, "pizza_salad", "salad", "pizza", start + timedelta(hours=1))
+
+    def no_scan(name):
+        raise AssertionError(f"incremental run scanned collectionGroup('{name}')")
+    real_group = db.collection_group
+    monkeypatch.setattr(db, "collection_group", lambda name: real_group(name) if name == "comparisons" else no_scan(name))
+    changed = ratings.recompute(read_models=False)
+
+    assert "diningHalls/ford/dishes/soup" not in changed
+    assert not db.document("diningHalls/ford/dishes/soup").get().exists
+    salad = db.document("diningHalls/ford/dishes/salad").get().to_dict()["score"]
+    pizza = db.document("diningHalls/ford/dishes/pizza").get().to_dict()["score"]
+    assert salad > pizza
@@ -0,0 +1,39 @@
+def _pulse(db):
+    return [(e["id"], e["score"]) for e in db.document("readModels/pulse").get().to_dict()["dishes"]]
+
+
+def test_incremental_rebuild_reads_only_changed_dishes(db, monkeypatch):
+    import read_models
+    from firestore_sink import FirestoreSink
+    from write_manifest import WriteManifest
+
+    db.document("diningHalls/ford-dining-court").set({"name": "Ford"})
+    for i, score in enumerate((1100, 1000, 900)):
+        db.document(f"diningHalls/ford-dining-court/dishes/dish-{i}").set({"name": f"Dish {i}", "score": score})
+    read_models.rebuild(WriteManifest(full=True))
+    assert _pulse(db) == [("dish-0", 1100), ("dish-1", 1000), ("dish-2", 900)]
+
+    sink = FirestoreSink(db, verbose=False)
+    sink.update(db.document("diningHalls/ford-dining-court/dishes/dish-2"), {"score": 1500})
+    sink.delete(db.document("diningHalls/ford-dining-court/dishes/dish-1"))
+    sink.close()
+
+    def no_scan(name):
+        raise AssertionError("incremental rebuild scanned collectionGroup('%s')" % name)
+    monkeypatch.setattr(db, "collection_group", no_scan)
+    read_models.rebuild(WriteManifest(), changed=sink.committed_paths)
+    assert _pulse(db) == [("dish-2", 1500), ("dish-0", 1100)]
+
+
+def test_full_rebuild_picks_up_outside_writes(db):
+    import read_models
+    from write_manifest import WriteManifest
+
+    db.document("diningHalls/ford-dining-court/dishes/a").set({"name": "A", "score": 1000})
+    read_models.rebuild(WriteManifest(), changed=())
+    # Written by the app, not through a sink: only --full sees it
+    db.document("diningHalls/ford-dining-court/dishes/b").set({"name": "B", "score": 1200})
+    read_models.rebuild(WriteManifest(), changed=())
+    assert [d for d, _ in _pulse(db)] == ["a"]
+    read_models.rebuild(WriteManifest(), changed=None)
+    assert [d for d, _ in _pulse(db)] == ["b", "a"]
@@ -0,0 +1,14 @@
+def test_retag_confirms_committed_tag_writes(db):
+    import retag_dishes
+    from write_manifest import MANIFEST_PATH, WriteManifest
+
+    db.document("globalDishes/chicken-noodle-soup").set({"name": "Chicken Noodle Soup", "tags": []})
+    db.document("diningHalls/ford/dishes/chicken-noodle-soup").set({"name": "Chicken Noodle Soup", "tags": [],
+                                                                   "category": "diningHall"})
+    retag_dishes.retag_dishes()
+
+    tags = db.document("globalDishes/chicken-noodle-soup").get().to_dict()["tags"]
+    assert tags and db.document("diningHalls/ford/dishes/chicken-noodle-soup").get().to_dict()["tags"] == tags
+    entries = WriteManifest(MANIFEST_PATH).entries
+    assert "globalDishes/chicken-noodle-soup#tags" in entries
+    assert "diningHalls/ford/dishes/chicken-noodle-soup#tags" in entries
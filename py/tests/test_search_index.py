@@ -0,0 +1,27 @@
+import search_index
+
+
+def _entry(dish_id, hall, score, name=None):
+    return {"id": dish_id, "name": name or dish_id.title(), "parentId": hall, "parentCollection": "diningHalls",
+            "locations": [hall], "score": score, "tags": []}
+
+
+def test_build_keeps_one_entry_per_dish():
+    header, shards = search_index.build([_entry("burger", "ford", 900), _entry("burger", "wiley", 1100),
+                                         _entry("cheeseburger", "ford", 1000)])
+    assert header["count"] == 2
+    burgers = shards["urg"]
+    assert [(e["id"], e["parentId"]) for e in burgers] == [("burger", "wiley"), ("cheeseburger", "ford")]
+    assert burgers[0]["locations"] == ["wiley", "ford"]
+    # Substring matches come from the trigram shards, two-letter queries from the bigram ones
+    assert "che" in shards and "ch" in shards and "ee" in header["keys"]
+
+
+def test_oversized_shards_are_cut_and_sized_honestly():
+    entries = [_entry(f"soup-{i}", "ford", i, name=f"Soup {i}") for i in range(200)]
+    header, shards = search_index.build(entries, shard_bytes=1024, max_shard_bytes=4096)
+    sizes = dict(zip(header["keys"], header["sizes"]))
+    assert len(shards["sou"]) < 200
+    assert sizes["sou"] == len(shards["sou"])
+    # The best-scored dishes are the ones kept
+    assert shards["sou"][0]["id"] == "soup-199"
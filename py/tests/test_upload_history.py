@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+from conftest import court
+
+
+def test_backfill_after_current_upload_keeps_latest_serving(db):
+    import upload_history
+    import upload_menus
+    from firestore_sink import FirestoreSink
+    from write_manifest import WriteManifest
+
+    today = date.today()
+    manifest = WriteManifest(full=True)
+    sink = FirestoreSink(db, manifest)
+    upload_menus.upload_dishes("Ford", [{"name": "Pizza", "station": "Oven",
+                                         "mealInfo": {"name": "Dinner", "startTime": "17:00", "endTime": "20:00"}}],
+                               manifest, sink)
+    sink.close()
+
+    # A fresh process backfilling an older day: nothing local says today was loaded
+    import hall_days
+    hall_days.forget()
+    old = today - timedelta(days=30)
+    courts = {(hall, old.strftime("%Y-%m-%d")): None for hall in upload_history.HALL_MAPPING}
+    courts[("Ford", old.strftime("%Y-%m-%d"))] = court({"Dinner": {"Grill": ["Pizza"]}, "Breakfast": {"Grill": ["Pizza"]}})
+    upload_history.process_date(old, courts, WriteManifest(full=True))
+
+    served = db.document("diningHalls/ford-dining-court/meta/served").get().to_dict()
+    assert served["pizza"] == {"date": today.strftime("%Y-%m-%d"), "station": "Oven"}
+    dish = db.document("diningHalls/ford-dining-court/dishes/pizza").get().to_dict()
+    assert dish["mealsServed"] == [{"name": "Dinner", "startTime": "17:00", "endTime": "20:00"}]
+    assert "lastServedDate" not in db.document("globalDishes/pizza").get().to_dict()
+    # The old day's menu document is still written
+    assert db.document(f"diningHalls/ford-dining-court/days/{old.strftime('%Y-%m-%d')}").get().exists
+
+
+def test_history_days_load_oldest_first(db):
+    import upload_history
+    from write_coalescer import WriteCoalescer
+
+    writes = WriteCoalescer()
+    for day, station in (("2026-01-05", "Oven"), ("2026-01-06", "Grill")):
+        records = upload_history.tag_records(upload_history.normalize_court(court({"Lunch": {station: ["Pizza"]}})))
+        upload_history.fold_records("Ford", day, records, writes)
+    # Folding an older day afterwards doesn't roll the newer one back
+    records = upload_history.tag_records(upload_history.normalize_court(court({"Lunch": {"Wok": ["Pizza"]}})))
+    upload_history.fold_records("Ford", "2026-01-01", records, writes)
+
+    docs = {path: data for path, _, data in writes.items()}
+    assert docs["diningHalls/ford-dining-court/meta/served"]["pizza"] == {"date": "2026-01-06", "station": "Grill"}
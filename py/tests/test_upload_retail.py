@@ -0,0 +1,27 @@
+class _Response:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+
+def test_unchanged_page_still_takes_the_index_name(db, monkeypatch):
+    import retail_fetcher
+    import upload_retail
+    from page_cache import PageCache
+
+    url = "https://dining.purdue.edu/retail/sbux"
+    cache = PageCache()
+    cache.clear()
+    cache.remember(url, _Response(200, b"<html></html>"), {"address": "610 Purdue Mall", "hours": "7am - 5pm"})
+    cache.save()
+
+    # The locations index renamed the location; its own page answers 304
+    loc = {"id": "sbux", "name": "Starbucks @ Union", "url": url}
+    monkeypatch.setattr(upload_retail, "get_all_location_urls", lambda page_cache, pending: [loc])
+    monkeypatch.setattr(retail_fetcher, "iter_pages", lambda jobs, *args: iter([(loc, _Response(304), None)]))
+    upload_retail.run_scraper()
+
+    doc = db.document("diningPoints/sbux").get().to_dict()
+    assert doc["name"] == "Starbucks @ Union"
+    assert doc["address"] == "610 Purdue Mall" and doc["hours"] == "7am - 5pm"
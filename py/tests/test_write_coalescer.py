@@ -0,0 +1,13 @@
+def test_writes_to_one_document_are_folded():
+    import fake_firestore
+    from write_coalescer import WriteCoalescer
+
+    writes = WriteCoalescer()
+    writes.set("globalDishes/pizza", "ref", {"name": "Pizza", "locations": fake_firestore.ArrayUnion(["Ford"])})
+    writes.set("globalDishes/pizza", "ref", {"name": "Pizza!", "locations": fake_firestore.ArrayUnion(["Wiley", "Ford"])})
+    writes.set("globalDishes/soup", "ref", {"name": "Soup"})
+
+    assert writes.incoming == 3 and len(writes) == 2
+    docs = {path: data for path, _, data in writes.items()}
+    assert docs["globalDishes/pizza"]["name"] == "Pizza!"
+    assert docs["globalDishes/pizza"]["locations"].values == ["Ford", "Wiley"]
@@ -0,0 +1,29 @@
+def test_unchanged_payloads_are_skipped_once_confirmed(tmp_path):
+    from write_manifest import WriteManifest
+
+    path = str(tmp_path / "manifest.json")
+    manifest = WriteManifest(path)
+    assert manifest.changed("globalDishes/pizza", {"name": "Pizza"})
+    # Not confirmed (the batch never committed): still treated as changed
+    assert manifest.changed("globalDishes/pizza", {"name": "Pizza"})
+    manifest.confirm(["globalDishes/pizza"])
+    assert not manifest.changed("globalDishes/pizza", {"name": "Pizza"})
+    assert manifest.changed("globalDishes/pizza", {"name": "Pizza", "tags": ["cozy"]})
+    manifest.discard()
+    manifest.save()
+
+    reloaded = WriteManifest(path)
+    assert not reloaded.changed("globalDishes/pizza", {"name": "Pizza"})
+    assert WriteManifest(path, full=True).changed("globalDishes/pizza", {"name": "Pizza"})
+
+
+def test_saves_from_two_processes_merge(tmp_path):
+    from write_manifest import WriteManifest
+
+    path = str(tmp_path / "manifest.json")
+    first, second = WriteManifest(path), WriteManifest(path)
+    for manifest, doc in ((first, "globalDishes/a"), (second, "globalDishes/b")):
+        manifest.changed(doc, {"name": doc})
+        manifest.confirm()
+        manifest.save()
+    assert set(WriteManifest(path).entries) == {"globalDishes/a", "globalDishes/b"}
@@ -1,37 +1,26 @@
-print("--- LITE HISTORY UPLOADER (PAST 3 DAYS) ---")
+print("--- LITE HISTORY UPLOADER (PAST 3 DAYS, OR --start/--end BACKFILL) ---")
 
-import os
-import requests
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+import argparse
 from datetime import date, datetime, timedelta
-import time
+
+import metrics
+from firebase_client import firestore, get_db
+import dish_identity
+from dish_schema import merge_serving
+from dish_tags import analyze_dish
+from hall_days import DAYS_COLLECTION, build_day, day_path, hall_dishes, served_path, served_ref, served_updates
+from menu_fetcher import fetch_courts, court_meals
+from pipeline import Pipeline, ordered_map
+from read_models import rebuild as rebuild_read_models
+from firestore_sink import FirestoreSink
+from history_state import HistoryState
+from write_coalescer import WriteCoalescer
+from write_manifest import WriteManifest
 
 # 1. SETUP FIREBASE
-current_dir = os.path.dirname(os.path.abspath(__file__))
-key_path = os.path.join(current_dir, "serviceAccountKey.json")
-
-if not os.path.exists(key_path):
-    print(f"❌ ERROR: serviceAccountKey.json not found at: {key_path}")
-    exit()
-
-try:
-    cred = credentials.Certificate(key_path)
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("✅ Connected to Firebase Database!")
-except Exception as e:
-    print(f"❌ FIREBASE CONNECTION ERROR: {e}")
-    exit()
+db = get_db()
 
 # 2. CONFIG
-GRAPHQL_URL = "https://api.hfs.purdue.edu/menus/v3/GraphQL"
-HEADERS = {
-    "Content-Type": "application/json",
-    "User-Agent": "Mozilla/5.0"
-}
 HALL_MAPPING = {
     "Ford": "ford-dining-court",
     "Wiley": "wiley-dining-court",
@@ -40,29 +29,6 @@ HALL_MAPPING = {
     "Windsor": "windsor-dining-court"
 }
 
-QUERY = """
-query getLocationMenu($name: String!, $date: Date!) {
-  diningCourtByName(name: $name) {
-    name
-    dailyMenu(date: $date) {
-      meals {
-        name
-        startTime
-        endTime
-        stations {
-          name
-          items {
-            item {
-              name
-            }
-          }
-        }
-      }
-    }
-  }
-}
-"""
-
 def clean_time(time_str):
     if not time_str or not isinstance(time_str, str): return None
     if "T" in time_str:
@@ -78,116 +44,289 @@ def clean_time(time_str):
             return dt.strftime("%H:%M")
         except ValueError: return None
 
-def analyze_dish(name):
-    name_lower = name.lower()
-    tags = []
-    if any(x in name_lower for x in ['soup', 'mac', 'pasta', 'stew', 'chili', 'mashed']): tags.append('cozy')
-    if any(x in name_lower for x in ['soup', 'broth', 'toast', 'tea', 'cracker']): tags.append('sick')
-    if any(x in name_lower for x in ['salad', 'grilled', 'vegetable', 'fruit', 'tofu', 'vegan']): tags.append('healthy')
-    if any(x in name_lower for x in ['spicy', 'buffalo', 'jalapeno', 'cajun', 'curry']): tags.append('spicy')
-    if any(x in name_lower for x in ['cookie', 'cake', 'brownie', 'pie', 'chocolate']): tags.append('sweet')
-    if any(x in name_lower for x in ['chicken', 'beef', 'steak', 'turkey', 'fish', 'egg']): tags.append('protein')
-    return tags
-
-def commit_batch_safely(batch):
-    try:
-        batch.commit()
-        print("      💾 Batch committed.")
-        # Minimal sleep to avoid rate limits, but fast enough for small history
-        time.sleep(0.5) 
-    except Exception as e:
-        print(f"      ⚠️ Upload Error: {e}")
-        # If quota exceeded, we stop to prevent hanging forever
-        if "Quota" in str(e) or "429" in str(e):
-            print("      🚨 DAILY QUOTA EXCEEDED. STOPPING SCRIPT.")
-            exit()
-
-def process_date(target_date):
+# --- Pipeline stages: normalize -> tag -> fold into per-document writes ---
+def normalize_court(court):
+    """Flatten one hall-day payload into dish records with cleaned ids and meal times."""
+    records = []
+    for meal in court_meals(court):
+        start_24 = clean_time(meal.get("startTime"))
+        end_24 = clean_time(meal.get("endTime"))
+        meal_info = {"name": meal["name"], "startTime": start_24, "endTime": end_24}
+
+        for station in meal.get("stations", []):
+            for entry in station.get("items", []):
+                item = entry.get("item")
+                if item:
+                    records.append({"name": item["name"], "id": dish_identity.dish_id(item["name"]),
+                                    "station": station["name"], "meal": meal_info})
+    return records
+
+def tag_records(records):
+    for record in records:
+        record["tags"] = analyze_dish(record["name"])
+    return records
+
+def fold_records(hall_name, date_str, records, writes):
+    """
+    Add one hall-day of tagged records to `writes` (a WriteCoalescer).
+    The day's date and station go to the hall's served index and its meal
+    slots onto the dish only for dishes not already stored as served later
+    (by an earlier upload or another run), so loading old days never rolls
+    them back.
+    """
+    hall_id = HALL_MAPPING[hall_name]
+    hall_ref = db.collection("diningHalls").document(hall_id)
+
+    # A dish served at several meals today is one write with one slot per meal
+    served = {}
+    for record in records:
+        served.setdefault(record["id"], []).append(record)
+    stored = hall_dishes(db, hall_ref, served)
+    latest = served_updates(db, hall_id, date_str, {
+        dish_id: dish_records[-1]["station"] for dish_id, dish_records in served.items()
+        if date_str >= (stored[dish_id].get("lastServedDate") or "")})
+    if latest:
+        writes.set(served_path(hall_id), served_ref(db, hall_id), latest)
+
+    for dish_records in served.values():
+        record = dish_records[-1]
+        # A. Update Local
+        local_dish_ref = hall_ref.collection("dishes").document(record["id"])
+        local_data = {
+            "name": record["name"],
+            "category": "diningHall",
+            "tags": record["tags"],
+        }
+        if record["id"] in latest:
+            local_data.update(merge_serving(stored[record["id"]], (r["meal"] for r in dish_records)))
+        writes.set(f"diningHalls/{hall_id}/dishes/{record['id']}", local_dish_ref, local_data)
+
+        # B. Update Global
+        global_dish_ref = db.collection("globalDishes").document(record["id"])
+        global_data = {
+            "name": record["name"],
+            "tags": record["tags"],
+            "locations": firestore.ArrayUnion([hall_name]), 
+            "category": "diningHall"
+        }
+        writes.set(f"globalDishes/{record['id']}", global_dish_ref, global_data)
+
+    # C. The hall's menu for this day as one document (closed/failed days are skipped)
+    if records:
+        entries = ((r["meal"], r["station"], r["id"], r["name"], r["tags"]) for r in records)
+        writes.set(day_path(hall_id, date_str), hall_ref.collection(DAYS_COLLECTION).document(date_str),
+                   build_day(hall_name, date_str, entries, {d: data.get("score") for d, data in stored.items()}))
+
+def collect_date(date_str, courts, writes):
+    """Fold one day's menus for every hall into `writes`; returns the number of items."""
+    items_parsed = 0
+    for hall_name in HALL_MAPPING:
+        records = tag_records(normalize_court(courts.get((hall_name, date_str))))
+        fold_records(hall_name, date_str, records, writes)
+        items_parsed += len(records)
+    return items_parsed
+
+def write_coalesced(writes, key_suffix, manifest, sink):
+    """Queue one write per coalesced document, skipping ones the manifest has seen."""
+    for path, doc_ref, doc_data in writes.items():
+        # History is keyed per date (or date range) so re-running it is a no-op
+        key = f"{path}#{key_suffix}"
+        if manifest.changed(key, doc_data):
+            sink.set(doc_ref, doc_data, manifest_key=key)
+
+def process_date(target_date, courts=None, manifest=None, sink=None):
+    """
+    Upload one day of history. `courts` is an optional prefetched
+    {(hall, date_str): court} map; if omitted, the halls are fetched here.
+    Documents whose writes for this date match `manifest` are skipped.
+    Writes go to `sink` (a private one is created and drained if omitted).
+    """
+    manifest = manifest or WriteManifest(full=True)
+    own_sink = sink is None
+    sink = sink or FirestoreSink(db, manifest)
     date_str = target_date.strftime("%Y-%m-%d")
     print(f"\n📅 Processing {date_str}...")
+
+    if courts is None:
+        courts = fetch_courts((hall_name, date_str) for hall_name in HALL_MAPPING)
     
-    batch = db.batch()
-    op_count = 0
-
-    for hall_name, hall_id in HALL_MAPPING.items():
-        payload = {
-            "operationName": "getLocationMenu",
-            "variables": {"name": hall_name, "date": date_str},
-            "query": QUERY
-        }
+    # Every mutation for this date is folded into one write per document
+    writes = WriteCoalescer()
+    with metrics.timer("parse"):
+        items_parsed = collect_date(date_str, courts, writes)
+    metrics.incr("items_parsed", items_parsed)
+    write_coalesced(writes, date_str, manifest, sink)
 
-        try:
-            resp = requests.post(GRAPHQL_URL, json=payload, headers=HEADERS, timeout=5)
-            data = resp.json()
-        except:
-            print(f"   ⚠️ Error fetching {hall_name}")
-            continue
-
-        court = data.get("data", {}).get("diningCourtByName", {})
-        if not court: continue
-        meals = court.get("dailyMenu", {}).get("meals", [])
-        if not meals: continue
-
-        hall_ref = db.collection("diningHalls").document(hall_id)
-        
-        for meal in meals:
-            start_24 = clean_time(meal.get("startTime"))
-            end_24 = clean_time(meal.get("endTime"))
-            meal_info = {"name": meal["name"], "startTime": start_24, "endTime": end_24}
-
-            for station in meal.get("stations", []):
-                for entry in station.get("items", []):
-                    item = entry.get("item")
-                    if item:
-                        dish_name = item["name"]
-                        clean_id = "".join(c for c in dish_name.lower() if c.isalnum() or c == " ").strip().replace(" ", "-")[:60]
-                        
-                        auto_tags = analyze_dish(dish_name)
-
-                        # A. Update Local
-                        local_dish_ref = hall_ref.collection("dishes").document(clean_id)
-                        local_data = {
-                            "name": dish_name,
-                            "category": "diningHall",
-                            "currentStation": station["name"], 
-                            "lastServedDate": date_str,
-                            "mealsServed": firestore.ArrayUnion([meal_info]),
-                            "tags": auto_tags,
-                        }
-                        batch.set(local_dish_ref, local_data, merge=True)
-
-                        # B. Update Global
-                        global_dish_ref = db.collection("globalDishes").document(clean_id)
-                        global_data = {
-                            "name": dish_name,
-                            "lastServedDate": date_str,
-                            "tags": auto_tags,
-                            "locations": firestore.ArrayUnion([hall_name]), 
-                            "category": "diningHall"
-                        }
-                        batch.set(global_dish_ref, global_data, merge=True)
-
-                        op_count += 2
-                        
-                        # Commit every 100 operations to be safe and steady
-                        if op_count >= 100:
-                            commit_batch_safely(batch)
-                            batch = db.batch()
-                            op_count = 0
-                            
-    if op_count > 0:
-        commit_batch_safely(batch)
-    print("   ✅ Date finished.")
-
-def run_history_load():
+    if own_sink:
+        sink.close()
+    print(f"   ✅ Date finished ({writes.incoming} mutations coalesced into {len(writes)} docs).")
+
+def run_history_load(full=False, read_models=True):
     # JUST LAST 3 DAYS
     start_date = date.today() - timedelta(days=3)
     end_date = date.today() 
     
     delta = end_date - start_date
-    
-    for i in range(delta.days + 1):
-        process_date(start_date + timedelta(days=i))
+    dates = [start_date + timedelta(days=i) for i in range(delta.days + 1)]
+
+    # One window per day keeps the manifest keyed per date, as before
+    windows = [[(d.strftime("%Y-%m-%d"), list(HALL_MAPPING))] for d in dates]
+    manifest = WriteManifest(full=full)
+    sink = FirestoreSink(db, manifest)
+    load_windows(windows, manifest, sink, HistoryState())
+    finish_load(manifest, sink, read_models)
+
+def finish_load(manifest, sink, read_models):
+    stats = sink.close()
+    if read_models and stats["writes"]:
+        rebuild_read_models(manifest, changed=sink.committed_paths)
+    dish_identity.save()
+    manifest.save()
+    print(f"\n📝 Documents written: {stats['writes']}, unchanged: {manifest.skipped}, failed: {stats['failed_writes']}")
+    print(f"   {stats['batches']} batches, {stats['retries']} retries, {stats['throttles']} throttles")
+
+# 3. STREAMING LOAD: fetch -> normalize -> tag -> write, joined by bounded queues
+FETCH_WORKERS = 4       # windows fetched ahead; HTTP concurrency stays capped process-wide (menu_fetcher)
+
+def load_windows(windows, manifest, sink, state, workers=FETCH_WORKERS):
+    """
+    Load windows of [(day, [halls])] oldest first. Each (day, hall) flows
+    through the stages on its own; a window's documents are coalesced, written
+    and drained before its units are checkpointed in `state`. Only a few
+    windows are ever in memory, whatever the range.
+    """
+    def fetch_window(units):
+        return fetch_courts((hall, day) for day, halls in units for hall in halls)
+
+    def fetch(windows):
+        for w, (units, courts) in enumerate(ordered_map(fetch_window, windows, workers)):
+            for day, halls in units:
+                for hall in halls:
+                    yield w, units, day, hall, courts.get((hall, day))
+
+    def normalize(items):
+        for w, units, day, hall, court in items:
+            with metrics.timer("parse"):
+                records = normalize_court(court)
+            metrics.incr("items_parsed", len(records))
+            # court is None only when the fetch failed; a closed hall is still "loaded"
+            yield w, units, day, hall, court is not None, records
+
+    def tag(items):
+        for w, units, day, hall, loaded, records in items:
+            with metrics.timer("tagging"):
+                tag_records(records)
+            yield w, units, day, hall, loaded, records
+
+    def write(items):
+        window, writes, loaded_units, count = None, WriteCoalescer(), {}, 0
+        for w, units, day, hall, loaded, records in items:
+            if window is not None and w != window[0]:
+                yield commit_window(window[1], writes, loaded_units, count)
+                writes, loaded_units, count = WriteCoalescer(), {}, 0
+            window = (w, units)
+            fold_records(hall, day, records, writes)
+            count += len(records)
+            if loaded:
+                loaded_units.setdefault(day, []).append(hall)
+        if window is not None:
+            yield commit_window(window[1], writes, loaded_units, count)
+
+    def commit_window(units, writes, loaded_units, count):
+        first, last = units[0][0], units[-1][0]
+        failed_before = len(sink.failed_keys)
+        write_coalesced(writes, first if first == last else f"{first}..{last}", manifest, sink)
+        sink.drain()  # the checkpoint below must only cover committed writes
+        dish_identity.save()
+        manifest.save()
+        ok = len(sink.failed_keys) == failed_before
+        if ok:
+            for day, halls in loaded_units.items():
+                state.mark(day, halls)
+            state.save()
+        return first, last, count, len(writes), ok
+
+    stages = Pipeline("history").add("fetch", fetch).add("normalize", normalize).add("tag", tag).add("write", write)
+    for i, (first, last, count, docs, ok) in enumerate(stages.run(windows)):
+        span = first if first == last else f"{first} → {last}"
+        if ok:
+            print(f"   ✅ [{i + 1}/{len(windows)}] {span}: {count} items → {docs} docs")
+        else:
+            print(f"   ⚠️ [{i + 1}/{len(windows)}] {span}: some writes failed, left unfinished")
+
+# 4. BACKFILL (arbitrary ranges, resumable)
+BACKFILL_WINDOW = 7     # days per fetch + write unit (also the checkpoint granularity)
+
+# Approximate Purdue terms, (month, day) start and end
+SEMESTERS = {
+    "spring": ((1, 8), (5, 10)),
+    "summer": ((5, 11), (8, 15)),
+    "fall": ((8, 16), (12, 20)),
+}
+
+def semester_range(name):
+    """'fall-2025' -> (date(2025, 8, 16), date(2025, 12, 20))"""
+    term, _, year = name.partition("-")
+    if term not in SEMESTERS or not year.isdigit():
+        raise ValueError(f"Unknown semester '{name}', expected e.g. fall-2025 or spring-2026")
+    (m1, d1), (m2, d2) = SEMESTERS[term]
+    return date(int(year), m1, d1), date(int(year), m2, d2)
+
+def plan_backfill(start, end, state, window=BACKFILL_WINDOW, redo=False):
+    """Split [start, end] into windows of [(day, [halls still to load])], skipping finished days."""
+    units = []
+    d = start
+    while d <= end:
+        day = d.strftime("%Y-%m-%d")
+        halls = list(HALL_MAPPING) if redo else state.pending_halls(day, HALL_MAPPING)
+        if halls:
+            units.append((day, halls))
+        d += timedelta(days=1)
+
+    windows, current = [], []
+    for unit in units:
+        # Windows cover at most `window` calendar days so checkpoints stay small
+        if current and unit[0] > (date.fromisoformat(current[0][0]) + timedelta(days=window - 1)).strftime("%Y-%m-%d"):
+            windows.append(current)
+            current = []
+        current.append(unit)
+    if current:
+        windows.append(current)
+    return windows
+
+def run_backfill(start, end, full=False, window=BACKFILL_WINDOW, workers=FETCH_WORKERS, read_models=True):
+    """
+    Load every day in [start, end] through load_windows(). Finished
+    (day, hall) units are skipped, so a rerun resumes after the last
+    window that committed.
+    """
+    state = HistoryState()
+    windows = plan_backfill(start, end, state, window, redo=full)
+    total_units = sum(len(halls) for w in windows for _, halls in w)
+    print(f"\n🗂️  Backfill {start} → {end}: {total_units} (day, hall) units in {len(windows)} windows to load")
+    if not windows:
+        return
+
+    manifest = WriteManifest(full=full)
+    sink = FirestoreSink(db, manifest, verbose=False)
+    load_windows(windows, manifest, sink, state, workers)
+    finish_load(manifest, sink, read_models)
 
 if __name__ == "__main__":
-    run_history_load()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Upload the last few days of dining history, or backfill a date range.")
+    parser.add_argument("--full", action="store_true", help="ignore the write manifest and rewrite every document")
+    parser.add_argument("--skip-read-models", action="store_true", help="don't rebuild the readModels documents afterwards")
+    parser.add_argument("--start", type=date.fromisoformat, help="backfill from this day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="backfill up to this day (default: today)")
+    parser.add_argument("--semester", help="backfill a whole term, e.g. fall-2025")
+    parser.add_argument("--window", type=int, default=BACKFILL_WINDOW, help="days per backfill window")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="windows fetched concurrently")
+    args = parser.parse_args()
+
+    with metrics.run("upload_history"):
+        if args.semester or args.start:
+            start, end = semester_range(args.semester) if args.semester else (args.start, args.end or date.today())
+            run_backfill(start, min(end, date.today()), full=args.full, window=args.window,
+                         workers=args.workers, read_models=not args.skip_read_models)
+        else:
+            run_history_load(full=args.full, read_models=not args.skip_read_models)
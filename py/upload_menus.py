@@ -1,39 +1,25 @@
-print("--- INTELLIGENT MENU UPLOADER (37 RATED DISHES) ---")
+print("--- INTELLIGENT MENU UPLOADER ---")
 
-import os
-import requests
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+import argparse
 from datetime import date, datetime
-import random
+
+import metrics
+from firebase_client import firestore, get_db
+import dish_identity
+from dish_schema import merge_serving
+from dish_tags import tag_many
+from hall_days import DAYS_COLLECTION, GET_ALL_CHUNK, build_day, day_path, hall_dishes, served_path, served_ref, served_updates
+from menu_fetcher import fetch_courts, court_meals
+from pipeline import Pipeline
+from read_models import rebuild as rebuild_read_models
+from firestore_sink import FirestoreSink
+from write_coalescer import WriteCoalescer
+from write_manifest import WriteManifest
 
 # 1. SETUP FIREBASE
-current_dir = os.path.dirname(os.path.abspath(__file__))
-key_path = os.path.join(current_dir, "serviceAccountKey.json")
-
-if not os.path.exists(key_path):
-    print(f"❌ ERROR: serviceAccountKey.json not found at: {key_path}")
-    exit()
-
-try:
-    cred = credentials.Certificate(key_path)
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("✅ Connected to Firebase Database!")
-except Exception as e:
-    print(f"❌ FIREBASE CONNECTION ERROR: {e}")
-    exit()
+db = get_db()
 
 # 2. CONFIG
-GRAPHQL_URL = "https://api.hfs.purdue.edu/menus/v3/GraphQL"
-HEADERS = {
-    "Content-Type": "application/json",
-    "Origin": "https://dining.purdue.edu",
-    "Referer": "https://dining.purdue.edu/",
-    "User-Agent": "Mozilla/5.0"
-}
 HALL_MAPPING = {
     "Ford": "ford-dining-court",
     "Wiley": "wiley-dining-court",
@@ -42,29 +28,6 @@ HALL_MAPPING = {
     "Windsor": "windsor-dining-court"
 }
 
-QUERY = """
-query getLocationMenu($name: String!, $date: Date!) {
-  diningCourtByName(name: $name) {
-    name
-    dailyMenu(date: $date) {
-      meals {
-        name
-        startTime
-        endTime
-        stations {
-          name
-          items {
-            item {
-              name
-            }
-          }
-        }
-      }
-    }
-  }
-}
-"""
-
 # 3. HELPER FUNCTIONS
 def clean_time(time_str):
     if not time_str or not isinstance(time_str, str): return None
@@ -81,53 +44,16 @@ def clean_time(time_str):
             return dt.strftime("%H:%M")
         except ValueError: return None
 
-# --- THE "BRAIN": AUTO-TAGGING LOGIC ---
-def analyze_dish(name):
-    name_lower = name.lower()
-    tags = []
-    
-    if any(x in name_lower for x in ['soup', 'mac', 'cheese', 'pasta', 'stew', 'chili', 'mashed', 'potato', 'casserole', 'biscuits', 'gravy']):
-        tags.append('cozy')
-    if any(x in name_lower for x in ['soup', 'broth', 'noodle', 'toast', 'tea', 'cracker', 'ginger', 'rice', 'plain']):
-        tags.append('sick')
-    if any(x in name_lower for x in ['salad', 'grilled', 'roasted', 'steamed', 'vegetable', 'fruit', 'tofu', 'vegan', 'fresh', 'garden']):
-        tags.append('healthy')
-    if any(x in name_lower for x in ['spicy', 'buffalo', 'jalapeno', 'cajun', 'curry', 'sriracha', 'hot', 'pepper', 'fiesta']):
-        tags.append('spicy')
-    if any(x in name_lower for x in ['cookie', 'cake', 'brownie', 'pie', 'pudding', 'chocolate', 'sugar', 'cinnamon', 'donut', 'muffin']):
-        tags.append('sweet')
-    if any(x in name_lower for x in ['chicken', 'beef', 'pork', 'steak', 'turkey', 'fish', 'tuna', 'egg', 'sausage', 'bacon', 'tofu', 'beans']):
-        tags.append('protein')
-    if any(x in name_lower for x in ['burger', 'pizza', 'sandwich', 'pasta', 'rice', 'burrito', 'bowl']):
-        tags.append('value')
-
-    return tags
-
 # 4. FETCH & UPLOAD
-def fetch_menu(location_name):
-    today = date.today().strftime("%Y-%m-%d")
-    print(f"\n📡 Fetching {location_name}...")
-
-    payload = {
-        "operationName": "getLocationMenu",
-        "variables": {"name": location_name, "date": today},
-        "query": QUERY
-    }
-
-    try:
-        resp = requests.post(GRAPHQL_URL, json=payload, headers=HEADERS, timeout=10)
-        data = resp.json()
-    except Exception as e:
-        print(f"   ⚠️ Network Error: {e}")
-        return []
-
-    court = data.get("data", {}).get("diningCourtByName", {})
-    if not court: return []
-    meals = court.get("dailyMenu", {}).get("meals", [])
-    if not meals: return []
+def parse_dishes(court):
+    with metrics.timer("parse"):
+        dishes = _parse_dishes(court)
+    metrics.incr("items_parsed", len(dishes))
+    return dishes
 
+def _parse_dishes(court):
     dishes = []
-    for meal in meals:
+    for meal in court_meals(court):
         start_24 = clean_time(meal.get("startTime"))
         end_24 = clean_time(meal.get("endTime"))
         meal_info = {"name": meal["name"], "startTime": start_24, "endTime": end_24}
@@ -143,71 +69,158 @@ def fetch_menu(location_name):
                     })
     return dishes
 
-# Track how many dishes we've given real scores to
-rated_dishes_count = 0
-MAX_RATED_DISHES = 37
+def fetch_all_menus(hall_names=None):
+    """Fetch today's menu for every hall concurrently: {hall: dishes}."""
+    today = date.today().strftime("%Y-%m-%d")
+    hall_names = list(hall_names or HALL_MAPPING)
+    print(f"\n📡 Fetching {len(hall_names)} halls for {today}...")
+
+    courts = fetch_courts((hall, today) for hall in hall_names)
+    return {hall: parse_dishes(courts[(hall, today)]) for hall in hall_names}
 
-def upload_dishes(location_name, dishes):
-    global rated_dishes_count
+def fetch_menu(location_name):
+    return fetch_all_menus([location_name])[location_name]
+
+def stream_menus(hall_names=None):
+    """
+    Yield (hall, dishes) hall by hall. Every hall is fetched in one batched
+    (aliased) request; the pipeline overlaps parsing with the caller's upload.
+    """
+    today = date.today().strftime("%Y-%m-%d")
+    hall_names = list(hall_names or HALL_MAPPING)
+    print(f"\n📡 Streaming {len(hall_names)} halls for {today}...")
+
+    def fetch(halls):
+        halls = list(halls)
+        courts = fetch_courts((hall, today) for hall in halls)
+        for hall in halls:
+            yield hall, courts[(hall, today)]
+
+    def parse(courts):
+        for hall, court in courts:
+            yield hall, parse_dishes(court)
+
+    yield from Pipeline("menus").add("fetch", fetch).add("parse", parse).run(hall_names)
+
+# New dishes start unrated; ratings.py fits real scores from user comparisons
+DEFAULT_SCORE = 1000
+SEED_FIELDS = {"score": DEFAULT_SCORE, "averageRating": 5.0}
+
+@firestore.transactional
+def _seed_missing(transaction, doc_refs):
+    # Every read in a transaction has to happen before its first write
+    snaps = list(db.get_all(doc_refs, transaction=transaction))
+    seeded = []
+    for snap in snaps:
+        data = (snap.to_dict() or {}) if snap.exists else {}
+        seed = {field: value for field, value in SEED_FIELDS.items() if data.get(field) is None}
+        if seed:
+            transaction.set(snap.reference, seed, merge=True)
+            seeded.append(snap.id)
+    return seeded
+
+def seed_new_dishes(doc_refs):
+    """
+    Give dishes that have no score yet (new, or first written by history) the
+    default score/rating. The check-and-set runs in one transaction per chunk
+    of dishes, reading them with a single get_all(), so real ratings are never
+    reset, whatever the local write manifest believes. Returns the seeded ids.
+    """
+    doc_refs = list(doc_refs)
+    seeded = []
+    for i in range(0, len(doc_refs), GET_ALL_CHUNK):
+        chunk = doc_refs[i:i + GET_ALL_CHUNK]
+        try:
+            seeded += _seed_missing(db.transaction(), chunk)
+        except Exception as e:
+            print(f"      ⚠️ Could not seed {len(chunk)} dishes: {e}")
+    metrics.incr("dishes_seeded", len(seeded))
+    return seeded
+
+def upload_dishes(location_name, dishes, manifest=None, sink=None):
+    # Without a manifest every document is treated as new (full rewrite)
+    manifest = manifest or WriteManifest(full=True)
+    own_sink = sink is None
+    sink = sink or FirestoreSink(db, manifest)
     
     hall_id = HALL_MAPPING[location_name]
     today_str = date.today().strftime("%Y-%m-%d")
     print(f"   💾 Uploading {len(dishes)} dishes to {hall_id}...")
     
     hall_ref = db.collection("diningHalls").document(hall_id)
-    hall_ref.set({
+
+    hall_data = {
         "name": location_name, 
         "type": "diningHall",
         "lastUpdated": firestore.SERVER_TIMESTAMP
-    }, merge=True)
-
-    batch = db.batch()
-    count = 0
-
+    }
+    if manifest.changed(f"diningHalls/{hall_id}", hall_data):
+        sink.set(hall_ref, hall_data, manifest_key=f"diningHalls/{hall_id}")
+
+    # A dish can appear at several meals/stations; fold those into one write
+    # whose meal slots and stations add today's to the stored ones (bounded, see dish_schema).
+    # Only stable fields go on the dish, so a dish served again unchanged isn't rewritten;
+    # today's date and station go to the hall's served index (see hall_days)
+    writes = WriteCoalescer()
+    tags = tag_many(dish['name'] for dish in dishes)
+    served = {}
     for dish in dishes:
-        clean_id = "".join(c for c in dish['name'].lower() if c.isalnum() or c == " ").strip().replace(" ", "-")[:50]
-        doc_ref = hall_ref.collection("dishes").document(clean_id)
-        
-        auto_tags = analyze_dish(dish['name'])
-        
-        # Decide if this dish gets a real score or stays at 1000
-        if rated_dishes_count < MAX_RATED_DISHES:
-            simulated_score = random.randint(950, 1050)
-            rated_dishes_count += 1
-            print(f"      ✅ Rated dish #{rated_dishes_count}: {dish['name']} (Score: {simulated_score})")
-        else:
-            simulated_score = 1000  # Default unrated score
-
-        doc_data = {
+        served.setdefault(dish_identity.dish_id(dish['name']), []).append(dish)
+    # Only today's dishes are read, once per process (see hall_days)
+    stored = hall_dishes(db, hall_ref, served)
+    for dish_id, dish_entries in served.items():
+        dish = dish_entries[-1]
+        writes.set(f"diningHalls/{hall_id}/dishes/{dish_id}", hall_ref.collection("dishes").document(dish_id), {
             "name": dish['name'],
             "category": "diningHall",
-            "lastServed": firestore.SERVER_TIMESTAMP,
-            "lastServedDate": today_str,
-            "currentStation": dish['station'],
-            "mealsServed": firestore.ArrayUnion([dish['mealInfo']]), 
-            "stations": firestore.ArrayUnion([dish['station']]),
-            "tags": auto_tags,
-            "score": simulated_score,
-            "averageRating": 5.0
-        }
-
-        batch.set(doc_ref, doc_data, merge=True)
-        
-        count += 1
-        if count >= 400:
-            batch.commit()
-            batch = db.batch()
-            count = 0
-
-    batch.commit()
-    print("   ✅ Batch uploaded.")
+            **merge_serving(stored[dish_id], (d['mealInfo'] for d in dish_entries),
+                            [d['station'] for d in dish_entries]),
+            "tags": tags[dish['name']],
+        })
+
+    # Dishes without a stored score get their seed before the menu fields are merged in
+    missing = [doc_ref for _, doc_ref, _ in writes.items() if stored[doc_ref.id].get("score") is None]
+    for dish_id in seed_new_dishes(missing):
+        stored[dish_id].setdefault("score", DEFAULT_SCORE)
+    scores = {dish_id: data.get("score") for dish_id, data in stored.items()}
+
+    for doc_path, doc_ref, doc_data in writes.items():
+        if manifest.changed(doc_path, doc_data):
+            sink.set(doc_ref, doc_data, manifest_key=doc_path)
+
+    served_now = served_updates(db, hall_id, today_str, {dish_id: entries[-1]['station'] for dish_id, entries in served.items()})
+    if served_now and manifest.changed(served_path(hall_id), served_now):
+        sink.set(served_ref(db, hall_id), served_now, manifest_key=served_path(hall_id))
+
+    # Today's menu as one document, so the hall screen is a single read
+    day = build_day(location_name, today_str, ((dish['mealInfo'], dish['station'], dish_identity.dish_id(dish['name']),
+                                                dish['name'], tags[dish['name']]) for dish in dishes), scores)
+    day_key = day_path(hall_id, today_str)
+    if manifest.changed(day_key, day):
+        sink.set(hall_ref.collection(DAYS_COLLECTION).document(today_str), day, merge=False, manifest_key=day_key)
+
+    if own_sink:
+        sink.close()
+    print(f"   ✅ Dishes queued ({manifest.skipped} unchanged docs skipped so far).")
 
 if __name__ == "__main__":
-    for hall in HALL_MAPPING:
-        items = fetch_menu(hall)
-        if items: 
-            upload_dishes(hall, items)
-    
-    print(f"\n🏁 INTELLIGENT UPLOAD COMPLETE.")
-    print(f"📊 Total dishes with real ratings: {rated_dishes_count}")
-    print(f"📋 All other dishes have default score of 1000 (unrated)")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Upload today's dining court menus.")
+    parser.add_argument("--full", action="store_true", help="ignore the write manifest and rewrite every document")
+    parser.add_argument("--skip-read-models", action="store_true", help="don't rebuild the readModels documents afterwards")
+    args = parser.parse_args()
+
+    with metrics.run("upload_menus"):
+        manifest = WriteManifest(full=args.full)
+        sink = FirestoreSink(db, manifest)
+        for hall, items in stream_menus():
+            if items: 
+                upload_dishes(hall, items, manifest, sink)
+        stats = sink.close()
+        if stats["writes"] and not args.skip_read_models:
+            rebuild_read_models(manifest, changed=sink.committed_paths)
+        dish_identity.save()
+        manifest.save()
+
+        print(f"\n🏁 INTELLIGENT UPLOAD COMPLETE.")
+        print(f"📝 Documents written: {stats['writes']}, unchanged: {manifest.skipped}, failed: {stats['failed_writes']}")
+        print(f"📋 New dishes start at {DEFAULT_SCORE} (unrated) until ratings.py scores them")
@@ -1,46 +1,44 @@
 print("--- CORRECTED RETAIL SCRAPER STARTED ---")
 
-import os
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
-import requests
-from bs4 import BeautifulSoup
-import time
+import argparse
 from urllib.parse import urljoin
 
+from dish_identity import location_id
+from firebase_client import firestore, get_db
+import html_extract
+import metrics
+import retail_fetcher
+from page_cache import PageCache
+from firestore_sink import FirestoreSink
+from write_manifest import WriteManifest
+
 # 1. SETUP FIREBASE
-current_dir = os.path.dirname(os.path.abspath(__file__))
-key_path = os.path.join(current_dir, "serviceAccountKey.json")
-
-if not os.path.exists(key_path):
-    print(f"❌ ERROR: serviceAccountKey.json not found at: {key_path}")
-    exit()
-
-try:
-    cred = credentials.Certificate(key_path)
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("✅ Connected to Firebase Database!")
-except Exception as e:
-    print(f"❌ FIREBASE CONNECTION ERROR: {e}")
-    exit()
+db = get_db()
 
 # 2. CONFIG
 BASE_URL = "https://purdue.campusdish.com"
 LOCATIONS_URL = "https://purdue.campusdish.com/LocationsAndMenus"
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-}
+MAX_CONCURRENCY = retail_fetcher.MAX_CONCURRENCY
+MIN_DELAY = retail_fetcher.MIN_DELAY
 
 # 3. CRAWLER: FIND ALL LOCATION URLS
-def get_all_location_urls():
+def get_all_location_urls(page_cache=None, pending=None):
+    """
+    Discover the retail locations. With `pending` (a list), the index page is
+    appended there instead of remembered, so the caller can remember it once
+    the location writes are committed.
+    """
     print(f"📡 Crawling {LOCATIONS_URL} to find locations...")
+    page_cache = page_cache or PageCache(enabled=False)
     
     try:
-        response = requests.get(LOCATIONS_URL, headers=HEADERS, timeout=15)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        response = retail_fetcher.get(LOCATIONS_URL, timeout=15, headers=page_cache.request_headers(LOCATIONS_URL))
+        if page_cache.unchanged(LOCATIONS_URL, response):
+            discovered = page_cache.extracted(LOCATIONS_URL)
+            print(f"   ✅ Locations page unchanged ({len(discovered)} locations).")
+            return discovered
+
+        soup = html_extract.links_soup(response.content)
         
         discovered = []
         seen_ids = set()
@@ -65,7 +63,7 @@ def get_all_location_urls():
                 if not name or name.lower() in ["map", "menus", "locations", "home", "catering", "contact us"]:
                     continue
 
-                clean_id = "".join(c for c in name.lower() if c.isalnum()).strip()
+                clean_id = location_id(name)
                 
                 if clean_id and clean_id not in seen_ids:
                     seen_ids.add(clean_id)
@@ -76,6 +74,10 @@ def get_all_location_urls():
                     })
                     
         print(f"   ✅ Found {len(discovered)} locations.")
+        if pending is None:
+            page_cache.remember(LOCATIONS_URL, response, discovered)
+        else:
+            pending.append((LOCATIONS_URL, response, discovered))
         return discovered
 
     except Exception as e:
@@ -85,17 +87,24 @@ def get_all_location_urls():
 # 4. METADATA SCRAPER: ADDRESS & HOURS
 def scrape_metadata(location_name, url):
     print(f"   🔎 Scanning: {location_name}...")
+    try:
+        response = retail_fetcher.get(url)
+    except Exception as e:
+        print(f"      Warning: {e}")
+        return {"address": None, "hours": None}
+    return parse_metadata(response)
+
+def parse_metadata(response):
     data = {"address": None, "hours": None}
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
         if response.status_code != 200: return data
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = html_extract.metadata_soup(response.content)
         
         # --- FIX: SCRAPE ADDRESS CORRECTLY ---
         # We look for the address block
-        addr_container = soup.select_one('.address') or soup.select_one('.location-address') or soup.select_one('.contact-address')
+        addr_container = html_extract.select_first(soup, html_extract.ADDRESS_CLASSES)
         
         if addr_container:
             # CRITICAL FIX: Remove "Map" links inside the address container
@@ -113,7 +122,7 @@ def scrape_metadata(location_name, url):
                 print(f"      📍 Address: {clean_address}")
 
         # --- SCRAPE HOURS ---
-        hours_div = soup.select_one('.hours-container') or soup.select_one('.location-hours')
+        hours_div = html_extract.select_first(soup, html_extract.HOURS_CLASSES)
         if hours_div:
              # Remove "Today's Hours" label
             text = hours_div.get_text(" ", strip=True).replace("Today's Hours", "").strip()
@@ -127,18 +136,39 @@ def scrape_metadata(location_name, url):
         return data
 
 # 5. UPLOAD PROCESS
-def run_scraper():
-    locations = get_all_location_urls()
+def run_scraper(full=False, max_concurrency=MAX_CONCURRENCY, min_delay=MIN_DELAY):
+    manifest = WriteManifest(full=full)
+    page_cache = PageCache(enabled=not full)
+    index_pages = []
+    locations = get_all_location_urls(page_cache, index_pages)
     
     if not locations:
         print("⚠️ No locations found.")
         return
 
-    batch = db.batch()
-    op_count = 0
+    sink = FirestoreSink(db, manifest)
+    jobs = [dict(loc, headers=page_cache.request_headers(loc["url"])) for loc in locations]
+    seen = []
+    unchanged_pages = 0
     
-    for loc in locations:
-        meta = scrape_metadata(loc["name"], loc["url"])
+    # Pages are parsed and queued for Firestore as soon as each fetch lands
+    for loc, response, error in retail_fetcher.iter_pages(jobs, max_concurrency, min_delay):
+        if error:
+            print(f"   🔎 Scanned: {loc['name']}")
+            print(f"      Warning: {error}")
+            meta = {"address": None, "hours": None}
+        elif page_cache.unchanged(loc["url"], response):
+            # 304 or identical body: nothing to parse. The name and URL come from the
+            # locations index, though, so the document is still checked against the manifest
+            unchanged_pages += 1
+            metrics.incr("retail_pages_unchanged")
+            meta = page_cache.extracted(loc["url"]) or {"address": None, "hours": None}
+            response = None
+        else:
+            print(f"   🔎 Scanned: {loc['name']}")
+            with metrics.timer("parse"):
+                meta = parse_metadata(response)
+            metrics.incr("items_parsed")
         
         doc_ref = db.collection("diningPoints").document(loc["id"])
         
@@ -157,18 +187,34 @@ def run_scraper():
         if meta["hours"]:
             update_data["hours"] = meta["hours"]
 
-        batch.set(doc_ref, update_data, merge=True)
-        op_count += 1
-        
-        if op_count >= 400:
-            batch.commit()
-            batch = db.batch()
-            op_count = 0
-            
-        time.sleep(0.1) 
-
-    batch.commit()
-    print("\n✨ DATABASE UPDATED.")
+        doc_path = f"diningPoints/{loc['id']}"
+        if manifest.changed(doc_path, update_data):
+            sink.set(doc_ref, update_data, manifest_key=doc_path)
+        if response is not None and response.status_code == 200:
+            seen.append((loc["url"], response, meta, doc_path))
+
+    stats = sink.close()
+
+    # Only trust a page's validators once its document is safely written
+    failed = set(sink.failed_keys)
+    for url, response, meta, doc_path in seen:
+        if doc_path not in failed:
+            page_cache.remember(url, response, meta)
+    # A 304 on the index page skips every location, so only remember it after a clean run
+    if not failed:
+        for url, response, discovered in index_pages:
+            page_cache.remember(url, response, discovered)
+    page_cache.save()
+    manifest.save()
+    print(f"\n✨ DATABASE UPDATED. ({stats['writes']} written, {manifest.skipped} unchanged, "
+          f"{unchanged_pages} pages not modified, {stats['failed_writes']} failed)")
 
 if __name__ == "__main__":
-    run_scraper()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape retail dining locations.")
+    parser.add_argument("--full", action="store_true", help="ignore the write manifest and page cache, rewrite every document")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="max in-flight page fetches per host")
+    parser.add_argument("--min-delay", type=float, default=MIN_DELAY, help="minimum seconds between requests to one host")
+    args = parser.parse_args()
+
+    with metrics.run("upload_retail"):
+        run_scraper(full=args.full, max_concurrency=args.concurrency, min_delay=args.min_delay)
\ No newline at end of file
@@ -0,0 +1,48 @@
+# In-memory write coalescing for merge=True Firestore writes.
+# All mutations for a document are folded into one payload keyed by its
+# path: ArrayUnion fields are unioned, plain fields are last-write-wins.
+# The same dish served at several meals/stations/halls becomes one write.
+
+
+def _is_array_union(value):
+    return type(value).__name__ == "ArrayUnion"
+
+
+def _union(values, extra):
+    merged = list(values)
+    for v in extra:
+        if v not in merged:
+            merged.append(v)
+    return merged
+
+
+class WriteCoalescer:
+    def __init__(self):
+        self.docs = {}      # path -> (doc_ref, payload)
+        self.incoming = 0   # writes requested
+
+    def set(self, doc_path, doc_ref, data):
+        self.incoming += 1
+        if doc_path not in self.docs:
+            self.docs[doc_path] = (doc_ref, dict(data))
+            return
+
+        payload = self.docs[doc_path][1]
+        for key, value in data.items():
+            current = payload.get(key)
+            if _is_array_union(value) and _is_array_union(current):
+                payload[key] = type(value)(_union(current.values, value.values))
+            else:
+                payload[key] = value
+
+    def __len__(self):
+        return len(self.docs)
+
+    def items(self):
+        """Yield (doc_path, doc_ref, payload), one per document."""
+        for path, (doc_ref, payload) in self.docs.items():
+            yield path, doc_ref, payload
+
+    def clear(self):
+        self.docs = {}
+        self.incoming = 0
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are unlocked there
+    fcntl = None
+
+# Local shadow manifest of what we last wrote to Firestore.
+# Stores one content hash per document path (diningHalls/*/dishes/*,
+# globalDishes/*, diningPoints/*, ...) so uploaders can skip documents
+# whose payload hasn't changed since the previous run.
+#
+# Hashes are staged while a batch is being built and only become part of
+# the manifest after confirm(), i.e. once the batch actually committed.
+# Several uploaders (cron jobs, menu_watcher, hotspots --watch) share the
+# file, so save() merges only this process's changes into whatever is on
+# disk, under a file lock, instead of replacing it with a stale copy.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.environ.get("APERO_WRITE_MANIFEST", os.path.join(current_dir, ".cache", "write_manifest.json"))
+
+
+def _normalize(value):
+    # Firestore sentinels are matched by class name so this module stays
+    # importable without firebase_admin (benchmarks, offline tools).
+    kind = type(value).__name__
+    if kind == "Sentinel":
+        return None  # SERVER_TIMESTAMP & co. change every run by design
+    if kind in ("ArrayUnion", "ArrayRemove"):
+        return {f"${kind}": [_normalize(v) for v in value.values]}
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if type(v).__name__ != "Sentinel"}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def update_json(path, apply):
+    """
+    Read-modify-write a JSON dict file under an exclusive lock: `apply(data)`
+    edits the current contents in place. Returns the merged dict.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        apply(data)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, path)
+    return data
+
+
+def content_hash(*payloads):
+    parts = sorted(json.dumps(_normalize(p), sort_keys=True, default=str) for p in payloads)
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class WriteManifest:
+    def __init__(self, path=MANIFEST_PATH, full=False):
+        self.path = path
+        self.full = full
+        self.entries = {}
+        self.pending = {}
+        self.dirty = {}        # confirmed since the last save: the only keys save() writes
+        self.forgotten = set() # prefixes dropped since the last save
+        self.skipped = 0
+        self.written = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_new(self, doc_path):
+        return self.full or doc_path not in self.entries
+
+    def changed(self, doc_path, *payloads):
+        """
+        True if these payloads (all writes for `doc_path` in this run) differ
+        from what was last written. Changed docs are staged for confirm().
+        """
+        digest = content_hash(*payloads)
+        if not self.full and self.entries.get(doc_path) == digest:
+            self.skipped += 1
+            metrics.incr("documents_unchanged")
+            return False
+        self.pending[doc_path] = digest
+        self.written += 1
+        return True
+
+    def confirm(self, keys=None):
+        """Call after a successful batch commit (optionally only for `keys`)."""
+        if keys is None:
+            keys = list(self.pending)
+        for key in keys:
+            if key in self.pending:
+                self.entries[key] = self.dirty[key] = self.pending.pop(key)
+
+    def discard(self, keys=None):
+        """Call after a failed commit so those docs are retried next run."""
+        if keys is None:
+            self.pending = {}
+            return
+        for key in keys:
+            self.pending.pop(key, None)
+
+    def forget_prefix(self, prefix):
+        """Drop entries under a collection path (e.g. after it was wiped), including per-date keys."""
+        _drop_prefix(self.entries, prefix)
+        _drop_prefix(self.dirty, prefix)
+        self.forgotten.add(prefix)
+
+    def save(self):
+        def merge(data):
+            for prefix in self.forgotten:
+                _drop_prefix(data, prefix)
+            data.update(self.dirty)
+
+        # Entries other processes saved meanwhile are picked up too
+        self.entries = update_json(self.path, merge)
+        self.dirty, self.forgotten = {}, set()
+
+
+def _drop_prefix(entries, prefix):
+    for key in [k for k in entries if k == prefix or k.startswith((prefix + "/", prefix + "#"))]:
+        del entries[key]
@@ -0,0 +1,180 @@
+import { doc, getDoc, onSnapshot } from 'firebase/firestore';
+import { db } from './firebaseConfig';
+
+// Precomputed documents written by py/read_models.py after each upload.
+// Each helper resolves to null when a model is missing or incomplete, so
+// screens can fall back to their original collectionGroup('dishes') query.
+
+export const fetchPulse = async () => {
+  try {
+    const snap = await getDoc(doc(db, 'readModels', 'pulse'));
+    return snap.exists() ? snap.data().dishes || [] : null;
+  } catch (error) {
+    console.error("Error reading pulse model:", error);
+    return null;
+  }
+};
+
+const fetchShardedModel = async (name) => {
+  try {
+    const header = await getDoc(doc(db, 'readModels', name));
+    if (!header.exists()) return null;
+
+    const shardCount = header.data().shards || 0;
+    const shards = await Promise.all(
+      Array.from({ length: shardCount }, (_, i) => getDoc(doc(db, 'readModels', name, 'shards', String(i))))
+    );
+    if (shards.some(shard => !shard.exists())) return null;
+    return shards.flatMap(shard => shard.data().dishes || []);
+  } catch (error) {
+    console.error(`Error reading ${name} model:`, error);
+    return null;
+  }
+};
+
+export const fetchComparisonPool = () => fetchShardedModel('comparisonPool');
+export const fetchSearchCatalog = () => fetchShardedModel('searchCatalog');
+
+export const fetchMoodList = async (tag) => {
+  try {
+    const snap = await getDoc(doc(db, 'readModels', `mood-${tag}`));
+    return snap.exists() ? snap.data().dishes || [] : null;
+  } catch (error) {
+    console.error(`Error reading mood model for ${tag}:`, error);
+    return null;
+  }
+};
+
+// Local YYYY-MM-DD, matching the dates the uploaders use for day documents.
+export const todayKey = () => {
+  const now = new Date();
+  const pad = (n) => String(n).padStart(2, '0');
+  return `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`;
+};
+
+// Flatten diningHalls/{id}/days/{date} into the dish shape DiningHallScreen renders:
+// one entry per dish with every meal it is served at and its (last) station.
+const flattenHallDay = (day) => {
+  const dishes = {};
+  (day.meals || []).forEach(meal => {
+    const mealInfo = { name: meal.name, startTime: meal.startTime, endTime: meal.endTime };
+    (meal.stations || []).forEach(station => {
+      (station.dishes || []).forEach(dish => {
+        const entry = dishes[dish.id] || (dishes[dish.id] = { ...dish, mealsServed: [] });
+        entry.currentStation = station.name;
+        entry.mealsServed.push(mealInfo);
+      });
+    });
+  });
+  return Object.values(dishes).sort((a, b) => (b.score || 0) - (a.score || 0));
+};
+
+// Listens to one hall's day document. onDishes receives the flattened dishes,
+// or null when there is no day document (the screen then falls back).
+export const subscribeHallDay = (hallId, dateKey, onDishes) =>
+  onSnapshot(
+    doc(db, 'diningHalls', hallId, 'days', dateKey),
+    (snap) => onDishes(snap.exists() ? flattenHallDay(snap.data()) : null),
+    (error) => {
+      console.error("Error reading hall day:", error);
+      onDishes(null);
+    }
+  );
+
+// Per-user picks written by py/recommendations.py (users/{uid}/recommendations/latest).
+// Resolves to null when there is no document yet, so TasteDNA can rank the catalog itself.
+export const fetchRecommendations = async (userId) => {
+  try {
+    const snap = await getDoc(doc(db, 'users', userId, 'recommendations', 'latest'));
+    return snap.exists() ? snap.data().dishes || [] : null;
+  } catch (error) {
+    console.error("Error reading recommendations:", error);
+    return null;
+  }
+};
+
+// Campus activity summary written by py/hotspots.py:
+// {windows: {"1h"|"3h"|"today": {total, halls}}, updatedAt: Date|null}.
+export const fetchHotspots = async () => {
+  try {
+    const snap = await getDoc(doc(db, 'readModels', 'hotspots'));
+    if (!snap.exists() || !snap.data().windows) return null;
+    const { windows, updatedAt } = snap.data();
+    return { windows, updatedAt: updatedAt ? updatedAt.toDate() : null };
+  } catch (error) {
+    console.error("Error reading hotspots model:", error);
+    return null;
+  }
+};
+
+// N-gram-sharded search index written by py/search_index.py. Tokenization must
+// match search_index.tokens(): lowercase, accents stripped, split on non-alphanumerics.
+export const normalizeSearch = (text) =>
+  (text || '').normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().match(/[a-z0-9]+/g) || [];
+
+// The header is re-read after SEARCH_HEADER_TTL_MS; a new revision means the
+// index was rebuilt, so cached shards are dropped with it.
+const SEARCH_HEADER_TTL_MS = 5 * 60 * 1000;
+let searchHeader = null;
+const searchShards = new Map();
+
+export const fetchSearchIndexHeader = async () => {
+  if (searchHeader && Date.now() - searchHeader.fetchedAt < SEARCH_HEADER_TTL_MS) return searchHeader;
+  try {
+    const snap = await getDoc(doc(db, 'readModels', 'searchIndex'));
+    if (!snap.exists()) return null;
+    const data = snap.data();
+    if (!searchHeader || searchHeader.revision !== data.revision) searchShards.clear();
+    const sizes = data.sizes || [];
+    searchHeader = {
+      sizes: new Map((data.keys || []).map((key, i) => [key, sizes[i] || 0])),
+      revision: data.revision || null,
+      fetchedAt: Date.now(),
+    };
+    return searchHeader;
+  } catch (error) {
+    console.error("Error reading search index:", error);
+    return searchHeader;
+  }
+};
+
+// Shard for a query: the smallest trigram shard of its longest token, or the
+// bigram shard for a two-letter token. '' when a trigram occurs in no dish
+// (nothing can match); null when the query is too short.
+export const searchKey = (header, term) => {
+  const token = normalizeSearch(term).sort((a, b) => b.length - a.length)[0] || '';
+  if (token.length < 2) return null;
+  if (token.length === 2) return header.sizes.has(token) ? token : '';
+  let best = null;
+  for (let i = 0; i + 3 <= token.length; i++) {
+    const gram = token.slice(i, i + 3);
+    if (!header.sizes.has(gram)) return '';
+    if (best === null || header.sizes.get(gram) < header.sizes.get(best)) best = gram;
+  }
+  return best;
+};
+
+// Dishes whose name contains the query, or where every query token appears
+// inside a name/tag token. Resolves to null if the index can't be read.
+export const searchDishes = async (term) => {
+  const header = await fetchSearchIndexHeader();
+  if (!header) return null;
+  const key = searchKey(header, term);
+  if (!key) return [];
+  try {
+    if (!searchShards.has(key)) {
+      const snap = await getDoc(doc(db, 'readModels', 'searchIndex', 'shards', key));
+      searchShards.set(key, snap.exists() ? snap.data().dishes || [] : []);
+    }
+  } catch (error) {
+    console.error(`Error reading search shard ${key}:`, error);
+    return null;
+  }
+  const queryTokens = normalizeSearch(term);
+  const lowerTerm = term.toLowerCase();
+  return searchShards.get(key).filter(dish => {
+    if ((dish.name || '').toLowerCase().includes(lowerTerm)) return true;
+    const dishTokens = [...normalizeSearch(dish.name), ...(dish.tags || []).flatMap(normalizeSearch)];
+    return queryTokens.every(q => dishTokens.some(t => t.includes(q)));
+  });
+};
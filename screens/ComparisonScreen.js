@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { View, Text, TouchableOpacity, StyleSheet, SafeAreaView, Alert, ActivityIndicator } from 'react-native';
 import { db, auth } from '../firebaseConfig';
+import { fetchComparisonPool } from '../readModels';
 import { 
     collection, 
     query, 
@@ -40,6 +41,11 @@ const fetchUserComparisons = async (userId) => {
 
 // Utility function to get all available dishes
 const fetchAllDishes = async () => {
+    const pool = await fetchComparisonPool();
+    if (pool) {
+        return pool.map(dish => ({ ...dish, score: dish.score || 1000 }));
+    }
+
     try {
         const dishesRef = collectionGroup(db, 'dishes');
         // Query dishes that have been initialized with a score (score >= 0)
@@ -62,6 +68,27 @@ const fetchAllDishes = async () => {
     }
 };
 
+// The pool is precomputed, so a dish reviewed for the first time a moment ago
+// may not be in it yet; read that one dish directly and add it.
+const withDish = async (allDishes, dishRef) => {
+    if (allDishes.some(dish => dish.dishPath === dishRef.path)) return allDishes;
+    try {
+        const snap = await firestoreGetDoc(dishRef);
+        if (!snap.exists()) return allDishes;
+        return [...allDishes, {
+            id: snap.id,
+            name: snap.data().name,
+            score: snap.data().score || 1000,
+            dishPath: dishRef.path,
+            parentId: dishRef.parent.parent.id,
+            parentCollection: dishRef.parent.parent.parent.id,
+        }];
+    } catch (error) {
+        console.error("Error fetching reviewed dish:", error);
+        return allDishes;
+    }
+};
+
 export default function ComparisonScreen({ navigation, route }) {
     let [fontsLoaded] = useFonts({ Inter_400Regular, Inter_600SemiBold, BodoniModa_700Bold });
     
@@ -181,10 +208,11 @@ export default function ComparisonScreen({ navigation, route }) {
             });
 
             // Re-fetch everything after the transaction
-            const [allDishes, excludedPairs] = await Promise.all([
+            const [pool, excludedPairs] = await Promise.all([
                 fetchAllDishes(),
                 fetchUserComparisons(userId)
             ]);
+            const allDishes = await withDish(pool, dishRef);
             setDishes(allDishes);
             loadNewPair(allDishes, excludedPairs, true); // True marks this as initial load
 
@@ -217,42 +245,33 @@ export default function ComparisonScreen({ navigation, route }) {
     }, [userId]);
 
     // --- CORE ELO LOGIC (Comparison click) ---
+    // Public scores are recomputed in batch from these comparison records
+    // (py/ratings.py); the client only records the result and updates its
+    // local copy so the next pair reflects the choice right away.
     const recordPreference = async (winner, loser) => {
-        const dishRefA = doc(db, dishes.find(d => d.id === dishA.id).dishPath);
-        const dishRefB = doc(db, dishes.find(d => d.id === dishB.id).dishPath);
-        
-        // 1. Record the preference for this user (so they don't see it again)
-        const comparisonKey = [dishA.id, dishB.id].sort().join('_');
-        await setDoc(doc(db, 'users', userId, 'comparisons', comparisonKey), {
-            winnerId: winner.id,
-            loserId: loser.id,
-            timestamp: Timestamp.now()
-        });
+        const winnerPath = dishes.find(d => d.id === winner.id).dishPath;
+        const loserPath = dishes.find(d => d.id === loser.id).dishPath;
 
-        // 2. Update the public ELO scores using a transaction
         try {
-            await runTransaction(db, async (transaction) => {
-                const winnerDoc = await transaction.get(winner.dishPath.includes(dishA.id) ? dishRefA : dishRefB);
-                const loserDoc = await transaction.get(loser.dishPath.includes(dishB.id) ? dishRefB : dishRefA);
-
-                if (!winnerDoc.exists() || !loserDoc.exists()) {
-                    throw new Error("Dish document not found during transaction.");
-                }
+            // Record the preference for this user (so they don't see it again)
+            const comparisonKey = [dishA.id, dishB.id].sort().join('_');
+            await setDoc(doc(db, 'users', userId, 'comparisons', comparisonKey), {
+                winnerId: winner.id,
+                loserId: loser.id,
+                winnerPath,
+                loserPath,
+                timestamp: Timestamp.now()
+            });
 
-                // ELO Calculation (Simplified)
-                const scoreWinner = winnerDoc.data().score || 1000;
-                const scoreLoser = loserDoc.data().score || 1000;
-                
-                const expectedScoreWinner = 1 / (1 + Math.pow(10, (scoreLoser - scoreWinner) / 400));
-                const expectedScoreLoser = 1 / (1 + Math.pow(10, (scoreWinner - scoreLoser) / 400));
+            // ELO Calculation (Simplified), local preview only
+            const scoreWinner = winner.score || 1000;
+            const scoreLoser = loser.score || 1000;
 
-                const newScoreWinner = scoreWinner + SCORE_INCREMENT * (1 - expectedScoreWinner);
-                const newScoreLoser = scoreLoser + SCORE_INCREMENT * (0 - expectedScoreLoser);
+            const expectedScoreWinner = 1 / (1 + Math.pow(10, (scoreLoser - scoreWinner) / 400));
+            const expectedScoreLoser = 1 / (1 + Math.pow(10, (scoreWinner - scoreLoser) / 400));
 
-                // Update the public dish documents
-                transaction.update(winnerDoc.ref, { score: newScoreWinner });
-                transaction.update(loserDoc.ref, { score: newScoreLoser });
-            });
+            const newScoreWinner = scoreWinner + SCORE_INCREMENT * (1 - expectedScoreWinner);
+            const newScoreLoser = scoreLoser + SCORE_INCREMENT * (0 - expectedScoreLoser);
 
             // Update local dish scores for the next comparison
             const updatedDishes = dishes.map(d => {
@@ -266,7 +285,7 @@ export default function ComparisonScreen({ navigation, route }) {
             loadNewPair(updatedDishes, newExcludedPairs, false); // Not initial load
 
         } catch (error) {
-            console.error("Transaction failed: ", error);
+            console.error("Saving comparison failed: ", error);
             Alert.alert("Error", "Could not record preference.");
         }
     };
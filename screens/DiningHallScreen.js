@@ -17,6 +17,7 @@ import { useFonts } from 'expo-font';
 import { Inter_400Regular, Inter_600SemiBold, Inter_700Bold } from '@expo-google-fonts/inter';
 import { BodoniModa_700Bold } from '@expo-google-fonts/bodoni-moda';
 import { Clock, MapPin, ExternalLink, TrendingUp, Star, Flame } from 'lucide-react-native';
+import { subscribeHallDay, todayKey } from '../readModels';
 
 // --- TIME CONSTANTS ---
 const MEALS = ["Breakfast", "Lunch", "Dinner"];
@@ -73,13 +74,30 @@ export default function DiningHallScreen({ route, navigation }) {
 
   // Fetch Dishes
   useEffect(() => {
-    const dishesCollectionRef = collection(db, collectionName, diningHallId, 'dishes');
-    const q = query(dishesCollectionRef, orderBy('score', 'desc'));
-    const unsubscribe = onSnapshot(q, (snapshot) => {
-      setRawDishes(snapshot.docs.map(doc => ({ id: doc.id, ...doc.data() })));
+    let unsubscribeDishes = null;
+    const listenToDishes = () => {
+      if (unsubscribeDishes) return;
+      const dishesCollectionRef = collection(db, collectionName, diningHallId, 'dishes');
+      const q = query(dishesCollectionRef, orderBy('score', 'desc'));
+      unsubscribeDishes = onSnapshot(q, (snapshot) => {
+        setRawDishes(snapshot.docs.map(doc => ({ id: doc.id, ...doc.data() })));
+      });
+    };
+
+    // Dining halls: today's menu is one document; fall back to the whole subcollection without it
+    if (isRetail) {
+      listenToDishes();
+      return () => unsubscribeDishes && unsubscribeDishes();
+    }
+    const unsubscribeDay = subscribeHallDay(diningHallId, todayKey(), (dishes) => {
+      if (dishes) setRawDishes(dishes);
+      else listenToDishes();
     });
-    return () => unsubscribe(); 
-  }, [diningHallId, collectionName]);
+    return () => {
+      unsubscribeDay();
+      if (unsubscribeDishes) unsubscribeDishes();
+    };
+  }, [diningHallId, collectionName, isRetail]);
 
   // Filter & Group
   useEffect(() => {
@@ -39,10 +39,18 @@ export default function DishScreen({ route, navigation }) {
       try {
         // Fetch dish data
         const dishRef = doc(db, collectionName, diningHallId, 'dishes', dishId);
-        const docSnap = await getDoc(dishRef);
-        
+        // Dining halls keep when/where each dish was last served in one index doc
+        const servedRef = collectionName === 'diningHalls' ? doc(db, 'diningHalls', diningHallId, 'meta', 'served') : null;
+        const [docSnap, servedSnap] = await Promise.all([getDoc(dishRef), servedRef ? getDoc(servedRef) : null]);
+
         if (docSnap.exists()) {
-          setDish(docSnap.data());
+          const data = docSnap.data();
+          const served = servedSnap && servedSnap.exists() ? servedSnap.data()[dishId] : null;
+          if (served && served.date >= (data.lastServedDate || '')) {
+            data.lastServedDate = served.date;
+            data.currentStation = served.station;
+          }
+          setDish(data);
         }
 
         // Fetch recent reviews (if you have a reviews collection)
@@ -20,6 +20,7 @@ import { BodoniModa_700Bold } from '@expo-google-fonts/bodoni-moda';
 import { PlusCircle, Clock, ChevronRight, XCircle } from 'lucide-react-native';
 
 import { db } from '../firebaseConfig';
+import { fetchPulse } from '../readModels';
 import { 
     collection, 
     getDocs, 
@@ -120,10 +121,13 @@ export default function HomeScreen({ navigation }) {
       const pointsSnapshot = await getDocs(collection(db, 'diningPoints'));
       setDiningPoints(pointsSnapshot.docs.map(doc => ({ id: doc.id, ...doc.data() })));
 
-      const pulseQuery = query(collectionGroup(db, 'dishes'), orderBy('score', 'desc'), limit(150));
-      const pulseSnapshot = await getDocs(pulseQuery);
-      
-      const pulseList = await enrichPulseData(pulseSnapshot);
+      // One document read; falls back to the full query if the pipeline hasn't built it yet
+      let pulseList = await fetchPulse();
+      if (!pulseList) {
+          const pulseQuery = query(collectionGroup(db, 'dishes'), orderBy('score', 'desc'), limit(150));
+          const pulseSnapshot = await getDocs(pulseQuery);
+          pulseList = await enrichPulseData(pulseSnapshot);
+      }
       setPulse(pulseList);
 
     } catch (error) {
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, SafeAreaView, ScrollView, TouchableOpacity, ActivityIndicator, Dimensions } from 'react-native';
 import { db } from '../firebaseConfig';
+import { fetchHotspots } from '../readModels';
 import { collection, getDocs, query, where, Timestamp } from 'firebase/firestore';
 import { useFonts } from 'expo-font';
 import { Inter_400Regular, Inter_600SemiBold, Inter_700Bold } from '@expo-google-fonts/inter';
@@ -49,6 +50,29 @@ export default function HotspotMapScreen({ navigation }) {
         timeThreshold.setHours(0, 0, 0, 0);
       }
 
+      // Prefer the precomputed summary: one read instead of every recent review.
+      // A summary written before the window began (aggregator down) is ignored.
+      const model = await fetchHotspots();
+      const fresh = model && model.updatedAt && model.updatedAt >= timeThreshold;
+      const summary = fresh && model.windows[timeFilter];
+      if (summary) {
+        const byHall = {};
+        (summary.halls || []).forEach(hall => { byHall[hall.id] = hall; });
+        setHotspots(Object.keys(LOCATION_COORDS).map(locationId => {
+          const activity = byHall[locationId] || { count: 0, recentDishes: [] };
+          const activityCount = Math.round(activity.count);
+          return {
+            id: locationId,
+            ...LOCATION_COORDS[locationId],
+            activityCount,
+            recentDishes: activity.recentDishes || [],
+            intensity: Math.min(activityCount / 50, 1)
+          };
+        }).sort((a, b) => b.activityCount - a.activityCount));
+        setLoading(false);
+        return;
+      }
+
       // Fetch recent reviews/comparisons to determine activity
       // This is a mock implementation - you'd query your reviews collection
       const reviewsRef = collection(db, 'reviews');
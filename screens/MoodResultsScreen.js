@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { View, Text, FlatList, TouchableOpacity, StyleSheet, SafeAreaView, Alert } from 'react-native';
 import { db } from '../firebaseConfig';
+import { fetchMoodList } from '../readModels';
 import { collectionGroup, query, where, getDocs, orderBy } from 'firebase/firestore';
 import { useFonts } from 'expo-font';
 import { Inter_400Regular, Inter_600SemiBold } from '@expo-google-fonts/inter';
@@ -69,6 +70,14 @@ export default function MoodResultsScreen({ route, navigation }) {
     const fetchDishes = async () => {
       setLoading(true);
       try {
+        // One small read of the pipeline's ranked list for this mood
+        const moodList = await fetchMoodList(moodTag);
+        if (moodList) {
+          setDishes(moodList.map(dish => ({ ...dish, diningHallId: dish.parentId })));
+          setLoading(false);
+          return;
+        }
+
         const dishesRef = collectionGroup(db, 'dishes');
         const q = query(
           dishesRef, 
@@ -1,9 +1,10 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { View, Text, StyleSheet, SafeAreaView, FlatList, TextInput, TouchableOpacity, ActivityIndicator } from 'react-native';
 import { useFonts } from 'expo-font';
 import { Inter_400Regular, Inter_600SemiBold, Inter_700Bold } from '@expo-google-fonts/inter';
 import { BodoniModa_700Bold } from '@expo-google-fonts/bodoni-moda';
 import { db } from '../firebaseConfig';
+import { fetchSearchCatalog, fetchSearchIndexHeader, searchDishes } from '../readModels';
 import { collectionGroup, getDocs } from 'firebase/firestore';
 import CustomHeader from '../components/CustomHeader';
 import { Search, Plus } from 'lucide-react-native';
@@ -31,6 +32,8 @@ export default function SearchScreen({ navigation }) {
     const [searchResults, setSearchResults] = useState([]);
     const [allDishes, setAllDishes] = useState([]);
     const [loading, setLoading] = useState(false);
+    const [useIndex, setUseIndex] = useState(false);
+    const latestTerm = useRef('');
 
     // Fetch all dishes once on mount
     useEffect(() => {
@@ -40,11 +43,25 @@ export default function SearchScreen({ navigation }) {
     // Perform search when searchTerm or selectedHall changes
     useEffect(() => {
         handleSearch();
-    }, [searchTerm, selectedHall, allDishes]);
+    }, [searchTerm, selectedHall, allDishes, useIndex]);
 
-    const fetchAllDishes = async () => {
+    const fetchAllDishes = async (tryIndex = true) => {
         setLoading(true);
         try {
+            // With the prefix index, each search reads one small shard instead of the catalog
+            if (tryIndex && await fetchSearchIndexHeader()) {
+                setUseIndex(true);
+                setLoading(false);
+                return;
+            }
+
+            const catalog = await fetchSearchCatalog();
+            if (catalog) {
+                setAllDishes(catalog);
+                setLoading(false);
+                return;
+            }
+
             const dishesRef = collectionGroup(db, 'dishes');
             const snapshot = await getDocs(dishesRef);
             
@@ -69,7 +86,8 @@ export default function SearchScreen({ navigation }) {
         setLoading(false);
     };
 
-    const handleSearch = () => {
+    const handleSearch = async () => {
+        latestTerm.current = searchTerm;
         if (searchTerm.length < 2) {
             setSearchResults([]);
             return;
@@ -77,9 +95,19 @@ export default function SearchScreen({ navigation }) {
 
         const lowerSearchTerm = searchTerm.toLowerCase();
         
-        let filtered = allDishes.filter(dish => 
-            dish.name.toLowerCase().includes(lowerSearchTerm)
-        );
+        let filtered = useIndex ? await searchDishes(searchTerm) : null;
+        if (latestTerm.current !== searchTerm) return; // a newer search is already running
+        if (useIndex && !filtered) {
+            // Index unreadable: go back to the full catalog
+            setUseIndex(false);
+            fetchAllDishes(false);
+            return;
+        }
+        if (!filtered) {
+            filtered = allDishes.filter(dish => 
+                dish.name.toLowerCase().includes(lowerSearchTerm)
+            );
+        }
 
         // Filter by selected hall if not "all"
         if (selectedHall !== 'all') {
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, SafeAreaView, ScrollView, TouchableOpacity, ActivityIndicator, Dimensions } from 'react-native';
 import { db, auth } from '../firebaseConfig';
+import { fetchRecommendations, fetchSearchCatalog } from '../readModels';
 import { collection, query, where, getDocs, collectionGroup } from 'firebase/firestore';
 import { useFonts } from 'expo-font';
 import { Inter_400Regular, Inter_600SemiBold, Inter_700Bold } from '@expo-google-fonts/inter';
@@ -121,9 +122,25 @@ export default function TasteDNAScreen({ navigation }) {
       // 1. Dishes user hasn't tried yet
       // 2. Similar flavor profiles to what they like
       // 3. Popular dishes they're missing out on
-      
-      const allDishesQuery = collectionGroup(db, 'dishes');
-      const allDishesSnap = await getDocs(allDishesQuery);
+
+      // Precomputed neighbors of the dishes this user liked: one small read
+      const precomputed = await fetchRecommendations(userId);
+      if (precomputed && precomputed.length > 0) {
+        setRecommendations(precomputed);
+        return;
+      }
+
+      // Prefer the precomputed catalog; it carries id, score, tags and parent info
+      let allDishes = await fetchSearchCatalog();
+      if (!allDishes) {
+        const allDishesSnap = await getDocs(collectionGroup(db, 'dishes'));
+        allDishes = allDishesSnap.docs.map(doc => ({
+          id: doc.id,
+          ...doc.data(),
+          parentId: doc.ref.parent.parent.id,
+          parentCollection: doc.ref.parent.parent.parent.id,
+        }));
+      }
       
       // Get user's reviewed dishes
       const reviewedQuery = query(
@@ -135,11 +152,9 @@ export default function TasteDNAScreen({ navigation }) {
 
       // Filter and score dishes
       const scoredDishes = [];
-      allDishesSnap.docs.forEach(doc => {
-        const dish = { id: doc.id, ...doc.data() };
-        
+      allDishes.forEach(dish => {
         // Skip if already reviewed
-        if (reviewedDishIds.has(doc.id)) return;
+        if (reviewedDishIds.has(dish.id)) return;
         
         // Skip if unrated
         if (!dish.score || dish.score === 1000) return;
@@ -155,12 +170,7 @@ export default function TasteDNAScreen({ navigation }) {
           recScore += matchingTags * 50;
         }
 
-        scoredDishes.push({
-          ...dish,
-          recScore,
-          parentId: doc.ref.parent.parent.id,
-          parentCollection: doc.ref.parent.parent.parent.id,
-        });
+        scoredDishes.push({ ...dish, recScore });
       });
 
       // Sort by recommendation score and take top 10